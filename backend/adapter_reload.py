@@ -0,0 +1,162 @@
+"""
+Adapter Hot Reload
+The trainer publishes each new adapter as a complete folder with a
+version.json marker; the server polls for a new version, loads it next to
+the serving model, warms it up and swaps it in between requests. A version
+that fails to load or warm up is discarded and the old one keeps serving.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import traceback
+import torch
+
+VERSION_FILE = "version.json"  # Written last: its presence marks a complete folder
+
+def read_adapter_version(path):
+    """Version string of the adapter published at path, or None"""
+    try:
+        with open(os.path.join(path, VERSION_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)['version']
+    except (OSError, ValueError, KeyError):
+        return None
+
+def write_adapter_version(path, version, **info):
+    """Atomically write the version marker into an adapter folder"""
+    marker = os.path.join(path, VERSION_FILE)
+    with open(marker + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump({'version': version, 'created_at': time.time(), **info}, f)
+    os.replace(marker + ".tmp", marker)
+
+def publish_adapter(model, tokenizer, path, **info):
+    """
+    Save model + tokenizer to a staging folder, mark it complete and move it
+    into place (the previous version is kept at <path>.previous).
+    Returns the new version string.
+    """
+    version = time.strftime("%Y%m%d-%H%M%S")
+    staging = f"{path}.staging"
+    previous = f"{path}.previous"
+
+    shutil.rmtree(staging, ignore_errors=True)
+    model.save_pretrained(staging)
+    tokenizer.save_pretrained(staging)
+    write_adapter_version(staging, version, **info)
+
+    if os.path.exists(path):
+        shutil.rmtree(previous, ignore_errors=True)
+        os.replace(path, previous)
+    os.replace(staging, path)
+    return version
+
+def check_finite_logits(model, tokenizer, prompt, **forward_kwargs):
+    """Reject weights that produce NaN/inf (e.g. a diverged training run)"""
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    with torch.no_grad():
+        logits = model(**inputs, **forward_kwargs).logits
+    if not torch.isfinite(logits).all():
+        raise ValueError("Adapter produces non-finite logits")
+
+class AdapterReloader:
+    """
+    Background poller for a published adapter folder.
+
+    On a new version: candidate = load_fn(path, version), then
+    warmup_fn(candidate), then swap_fn(candidate, version). If load or
+    warmup raises, discard_fn(candidate) is called, the version is
+    remembered as failed and the active version keeps serving.
+    """
+    def __init__(self, path, load_fn, warmup_fn, swap_fn, discard_fn=None,
+                 interval=30, active_version=None, is_ready=None):
+        self.path = path
+        self.load_fn = load_fn
+        self.warmup_fn = warmup_fn
+        self.swap_fn = swap_fn
+        self.discard_fn = discard_fn
+        self.interval = interval
+        self.is_ready = is_ready or (lambda: True)
+
+        self.active_version = active_version
+        self.failed_versions = set()
+        self.lock = threading.Lock()  # One reload at a time
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.reloads = 0
+        self.rollbacks = 0
+        self.last_error = None
+        self.last_reload_at = None
+        self.last_reload_seconds = None
+
+    def start(self):
+        """Begin polling in the background"""
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="adapter-reloader", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """Poll once; returns True if a new version was swapped in"""
+        if not self.is_ready():
+            return False
+        version = read_adapter_version(self.path)
+        if version is None or version == self.active_version or version in self.failed_versions:
+            return False
+
+        with self.lock:
+            print(f"🔁 New adapter version {version} at {self.path}", flush=True)
+            start = time.time()
+            candidate = None
+            try:
+                candidate = self.load_fn(self.path, version)
+                if read_adapter_version(self.path) != version:
+                    # Replaced again while we were loading; pick it up next poll
+                    self._discard(candidate)
+                    return False
+                self.warmup_fn(candidate)
+            except Exception as e:
+                self.rollbacks += 1
+                self.failed_versions.add(version)
+                self.last_error = f"{version}: {e}"
+                print(f"❌ Adapter {version} rejected, keeping {self.active_version}: {e}", flush=True)
+                traceback.print_exc()
+                self._discard(candidate)
+                return False
+
+            self.swap_fn(candidate, version)
+            self.active_version = version
+            self.reloads += 1
+            self.last_reload_at = time.time()
+            self.last_reload_seconds = self.last_reload_at - start
+            print(f"✅ Serving adapter {version} (loaded and warmed in {self.last_reload_seconds:.1f}s)", flush=True)
+            return True
+
+    def _discard(self, candidate):
+        if candidate is not None and self.discard_fn is not None:
+            try:
+                self.discard_fn(candidate)
+            except Exception as e:
+                print(f"⚠️  Could not discard adapter candidate: {e}", flush=True)
+
+    def snapshot(self):
+        return {
+            'active_version': self.active_version,
+            'reloads': self.reloads,
+            'rollbacks': self.rollbacks,
+            'failed_versions': sorted(self.failed_versions),
+            'last_error': self.last_error,
+            'last_reload_duration': round(self.last_reload_seconds, 2) if self.last_reload_seconds is not None else None,
+        }
@@ -0,0 +1,243 @@
+"""
+IVF Nearest-Neighbour Index
+In-process approximate inner-product search over unit vectors (numpy only).
+Vectors are bucketed by their nearest k-means centroid ("inverted lists");
+a query only scans the n_probe lists whose centroids are closest to it.
+
+Vectors can be added at any time. Until train_size of them exist the index
+is a flat exact scan; it then trains its centroids once and retrains (on a
+sample, then one pass re-assigning everything) each time it has grown
+retrain_growth times since the last training. Training runs on a
+background thread from a snapshot of the lists, so add() and search() keep
+using the current lists meanwhile; the new ones are swapped in under the
+lock together with whatever was added during training.
+"""
+import threading
+import numpy as np
+
+class GrowableArray:
+    """Row storage with amortised O(1) appends (capacity doubles)"""
+    def __init__(self, shape=(), dtype=np.float32):
+        self.data = np.empty((16,) + shape, dtype=dtype)
+        self.size = 0
+
+    def append(self, rows):
+        needed = self.size + len(rows)
+        if needed > len(self.data):
+            capacity = max(needed, 2 * len(self.data))
+            grown = np.empty((capacity,) + self.data.shape[1:], dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:needed] = rows
+        self.size = needed
+
+    def view(self):
+        return self.data[:self.size]
+
+class _InvertedList:
+    def __init__(self, dim):
+        self.vectors = GrowableArray((dim,))
+        self.ids = GrowableArray(dtype=np.int64)
+
+    def append(self, vectors, ids):
+        self.vectors.append(vectors)
+        self.ids.append(ids)
+
+def _normalise(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def spherical_kmeans(vectors, n_clusters, iterations=10, seed=0, chunk_size=65536):
+    """Unit-length centroids maximising the inner product with their members"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assign = assign_nearest(vectors, centroids, chunk_size)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=n_clusters)
+        empty = counts == 0
+        # Re-seed empty clusters with random members
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = _normalise(sums).astype(np.float32)
+    return centroids
+
+def assign_nearest(vectors, centroids, chunk_size=65536):
+    """Index of the highest-inner-product centroid for every row"""
+    return np.concatenate([
+        np.argmax(vectors[i:i + chunk_size] @ centroids.T, axis=1)
+        for i in range(0, len(vectors), chunk_size)
+    ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+def _distribute(lists, centroids, vectors, ids):
+    """Append each vector to the list of its nearest centroid"""
+    assign = assign_nearest(vectors, centroids)
+    order = np.argsort(assign, kind='stable')
+    list_numbers, starts = np.unique(assign[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
+    for list_no, start, end in zip(list_numbers, starts, ends):
+        rows = order[start:end]
+        lists[list_no].append(vectors[rows], ids[rows])
+
+class IVFIndex:
+    """
+    add() returns the ids (insertion order) of the new vectors; search()
+    returns (similarities, ids) of the top k per query, padded with -inf / -1
+    when fewer than k vectors were scanned. n_lists defaults to about
+    sqrt(size) at training time, capped at max_lists.
+    """
+    def __init__(self, dim, n_probe=16, max_lists=1024, train_size=4096,
+                 retrain_growth=8, train_sample_per_list=64, seed=0):
+        self.dim = dim
+        self.n_probe = n_probe
+        self.max_lists = max_lists
+        self.train_size = train_size
+        self.retrain_growth = retrain_growth
+        self.train_sample_per_list = train_sample_per_list
+        self.seed = seed
+
+        self.size = 0
+        self.centroids = None
+        self.lists = [_InvertedList(dim)]  # One flat list until trained
+        self.trained_at = 0
+        self.trainings = 0
+        self.lock = threading.RLock()
+        self.thread = None
+        self.added_while_training = None  # (vectors, ids) batches; None when not training
+
+    def add(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self.lock:
+            ids = np.arange(self.size, self.size + len(vectors))
+            self.size += len(vectors)
+            if self.centroids is None:
+                self.lists[0].append(vectors, ids)
+            else:
+                _distribute(self.lists, self.centroids, vectors, ids)
+
+            if self.is_training():
+                self.added_while_training.append((vectors, ids))
+            else:
+                threshold = self.train_size if self.centroids is None else self.trained_at * self.retrain_growth
+                if self.size >= threshold:
+                    self._start_training()
+        return ids
+
+    def is_training(self):
+        # A thread doesn't survive fork: a child holding a stale flag retrains itself
+        return self.added_while_training is not None and self.thread is not None and self.thread.is_alive()
+
+    def _start_training(self):
+        """Snapshot the lists and train on a background thread (lock held)"""
+        # Appends never modify rows already written, so views are a stable snapshot
+        snapshot = [(l.vectors.view(), l.ids.view()) for l in self.lists]
+        self.added_while_training = []
+        self.thread = threading.Thread(
+            target=self._train, args=(snapshot, self.size), name="ivf-train", daemon=True
+        )
+        self.thread.start()
+
+    def _train(self, snapshot, size):
+        try:
+            n_lists = int(min(self.max_lists, max(1, np.sqrt(size))))
+            rng = np.random.default_rng(self.seed + self.trainings)
+            keep = min(1.0, n_lists * self.train_sample_per_list / size)
+            sample = np.concatenate([vectors[rng.random(len(vectors)) < keep] for vectors, _ in snapshot])
+            if len(sample) < n_lists:
+                sample = np.concatenate([vectors for vectors, _ in snapshot])
+
+            centroids = spherical_kmeans(sample, n_lists, seed=self.seed + self.trainings)
+            lists = [_InvertedList(self.dim) for _ in range(n_lists)]
+            for vectors, ids in snapshot:
+                _distribute(lists, centroids, vectors, ids)
+
+            with self.lock:
+                for vectors, ids in self.added_while_training:
+                    _distribute(lists, centroids, vectors, ids)
+                self.centroids = centroids
+                self.lists = lists
+                self.trained_at = size
+                self.trainings += 1
+        except Exception as e:
+            print(f"⚠️  IVF index training failed: {e}")
+        finally:
+            with self.lock:
+                self.added_while_training = None
+
+    def train(self):
+        """(Re)build the centroids now and wait for it"""
+        with self.lock:
+            if not self.is_training():
+                self._start_training()
+        self.wait()
+
+    def wait(self, timeout=None):
+        """Block until a training in progress (if any) has been swapped in"""
+        thread = self.thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def search(self, queries, k):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        similarities = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        with self.lock:
+            if self.centroids is None:
+                probes = np.zeros((len(queries), 1), dtype=np.int64)
+            else:
+                n_probe = min(self.n_probe, len(self.centroids))
+                coarse = queries @ self.centroids.T
+                probes = np.argpartition(-coarse, n_probe - 1, axis=1)[:, :n_probe]
+
+            for q, query in enumerate(queries):
+                scanned = [self.lists[list_no] for list_no in probes[q]]
+                candidate_sims = np.concatenate([l.vectors.view() @ query for l in scanned])
+                candidate_ids = np.concatenate([l.ids.view() for l in scanned])
+                found = min(k, len(candidate_sims))
+                if found == 0:
+                    continue
+                top = np.argpartition(-candidate_sims, found - 1)[:found]
+                top = top[np.argsort(-candidate_sims[top])]
+                similarities[q, :found] = candidate_sims[top]
+                ids[q, :found] = candidate_ids[top]
+        return similarities, ids
+
+    def state(self):
+        """Arrays to persist the index (vectors in id order, centroids)"""
+        with self.lock:
+            vectors = np.empty((self.size, self.dim), dtype=np.float32)
+            for l in self.lists:
+                vectors[l.ids.view()] = l.vectors.view()
+            state = {'vectors': vectors}
+            if self.centroids is not None:
+                state['centroids'] = self.centroids
+            return state
+
+    def restore(self, vectors, centroids=None):
+        """Inverse of state(); only valid on an empty index"""
+        with self.lock:
+            ids = np.arange(len(vectors))
+            self.size = len(vectors)
+            self.centroids = centroids
+            if centroids is None:
+                self.lists = [_InvertedList(self.dim)]
+                self.lists[0].append(vectors, ids)
+                if self.size >= self.train_size:  # Saved before its first training finished
+                    self._start_training()
+            else:
+                self.lists = [_InvertedList(self.dim) for _ in range(len(centroids))]
+                _distribute(self.lists, centroids, vectors, ids)
+                self.trained_at = self.size
+                self.trainings = 1
+
+    def stats(self):
+        with self.lock:
+            sizes = [l.ids.size for l in self.lists]
+            return {
+                'size': self.size,
+                'lists': len(self.lists) if self.centroids is not None else 0,
+                'n_probe': self.n_probe,
+                'largest_list': max(sizes),
+                'trainings': self.trainings,
+                'training': self.is_training(),
+            }
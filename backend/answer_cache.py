@@ -0,0 +1,123 @@
+"""
+Answer Cache
+Size- and TTL-bounded LRU of generated answers keyed by normalised question,
+with optional JSON persistence
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+def cache_key(question, model=None):
+    """Answers from different adapters are cached separately"""
+    key = normalize_question(question)
+    return f"{model}::{key}" if model else key
+
+class AnswerCache:
+    def __init__(self, max_entries=1000, ttl_seconds=24 * 3600, path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.entries = OrderedDict()  # key -> (answer, created_at)
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, question, model=None):
+        """Return the cached answer or None"""
+        key = cache_key(question, model)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            answer, created_at = entry
+            if self.ttl_seconds and time.time() - created_at > self.ttl_seconds:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def put(self, question, answer, created_at=None, model=None):
+        self._put_key(cache_key(question, model), answer, created_at)
+
+    def _put_key(self, key, answer, created_at=None):
+        with self.lock:
+            self.entries[key] = (answer, created_at or time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def contains(self, question, model=None):
+        key = cache_key(question, model)
+        with self.lock:
+            entry = self.entries.get(key)
+        return entry is not None and not (
+            self.ttl_seconds and time.time() - entry[1] > self.ttl_seconds
+        )
+
+    def load(self):
+        """Load persisted entries (expired ones are skipped)"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        now = time.time()
+        loaded = 0
+        for item in data:
+            if self.ttl_seconds and now - item['created_at'] > self.ttl_seconds:
+                continue
+            self._put_key(item.get('key', item.get('question')), item['answer'], created_at=item['created_at'])
+            loaded += 1
+        return loaded
+
+    def save(self):
+        """Write entries to disk atomically (temp file + rename)"""
+        if not self.path:
+            return
+
+        with self.lock:
+            data = [
+                {'key': key, 'answer': answer, 'created_at': created_at}
+                for key, (answer, created_at) in self.entries.items()
+            ]
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
@@ -2,24 +2,129 @@
 Flask Backend for Phi-2 Finance AI
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from peft import PeftModel
 import time
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+import serving_config
+from answer_cache import AnswerCache
+from singleflight import SingleFlight, flight_key
+from model_loader import load_serving_model, load_draft_model, model_memory_collector
+from model_state import ModelLifecycle, warmup_model
+from inference_pool import InferencePool, QueueFullError, DeadlineExceededError, overload_response
+from batching import BatchScheduler
+from streaming import stream_generate, sse_stream
+from decoding import trim_at_stop
+from metrics import REGISTRY, ERRORS, instrument_flask, cache_collector
+from multi_adapter import BASE_ADAPTER, UnknownAdapterError, resolve_adapter, adapter_kwargs
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React
+instrument_flask(app, "chat")  # Request metrics + GET /metrics
 
 # Global variables for model
 model = None
 tokenizer = None
+model_source = None
+draft_model = None
+loaded_adapters = []  # Non-empty when several adapters share the base model
+scheduler = None
 is_loading = False
 
+SUGGESTIONS = [
+    "What is compound interest?",
+    "Should I invest in index funds or individual stocks?",
+    "How much should I save for retirement?",
+    "What is a 401k retirement account?",
+    "Explain portfolio diversification",
+    "What is the difference between Roth IRA and Traditional IRA?",
+    "How do I create an emergency fund?",
+    "What are dividends?"
+]
+
+answer_cache = AnswerCache(
+    max_entries=serving_config.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=serving_config.ANSWER_CACHE_TTL_SECONDS,
+    path=serving_config.ANSWER_CACHE_PATH
+)
+atexit.register(answer_cache.save)
+REGISTRY.register_collector(cache_collector("answer", answer_cache.stats))
+
+# Identical concurrent questions share one generation (nothing is kept afterwards)
+chat_flight = SingleFlight("chat", enabled=serving_config.COALESCE_CHAT)
+stream_flight = SingleFlight("stream", enabled=serving_config.COALESCE_STREAM)
+
+# Streaming requests bypass the batcher, so bound them with their own pool
+stream_pool = InferencePool(
+    max_workers=serving_config.INFERENCE_WORKERS,
+    max_queue=serving_config.MAX_QUEUE,
+    timeout=serving_config.REQUEST_TIMEOUT_SECONDS,
+    name="stream"
+)
+
+GENERATION_KWARGS = {
+    'max_new_tokens': 250,
+    'do_sample': True,
+    'temperature': 0.7,
+    'top_p': 0.9,
+    'repetition_penalty': 1.1,
+}
+
+def assisted_kwargs():
+    """generate() kwargs enabling speculative decoding when a draft model is loaded"""
+    return {'assistant_model': draft_model} if draft_model is not None else {}
+
+def default_adapter():
+    if serving_config.DEFAULT_ADAPTER in loaded_adapters:
+        return serving_config.DEFAULT_ADAPTER
+    return loaded_adapters[0]
+
+def select_adapter(requested):
+    """
+    Validate the request's "model" field. Returns the adapter name, or None
+    when a single model is loaded (only DEFAULT_ADAPTER is accepted then).
+    """
+    if not loaded_adapters:
+        if requested and requested != serving_config.DEFAULT_ADAPTER:
+            raise UnknownAdapterError(
+                f"Unknown model '{requested}'. Available: {serving_config.DEFAULT_ADAPTER}"
+            )
+        return None
+    return resolve_adapter(requested, loaded_adapters, default_adapter())
+
+def model_name(adapter):
+    """Name reported back to clients in the "model" field"""
+    if adapter == BASE_ADAPTER:
+        return "base"
+    return adapter or serving_config.DEFAULT_ADAPTER
+
+def start_scheduler():
+    """Start the micro-batching scheduler for the loaded model"""
+    global scheduler
+    
+    if scheduler is not None:
+        scheduler.stop()
+    
+    # Assisted generation only supports one sequence at a time
+    scheduler = BatchScheduler(
+        model,
+        tokenizer,
+        max_batch_size=1 if draft_model is not None else serving_config.BATCH_MAX_SIZE,
+        max_wait_ms=serving_config.BATCH_MAX_WAIT_MS,
+        max_queue=serving_config.MAX_QUEUE,
+        timeout=serving_config.REQUEST_TIMEOUT_SECONDS,
+        stop_strings=serving_config.STOP_STRINGS,
+        eos_token_id=tokenizer.eos_token_id,
+        **GENERATION_KWARGS,
+        **assisted_kwargs()
+    )
+    scheduler.start()
+
 def load_model():
     """Load the fine-tuned model"""
-    global model, tokenizer, is_loading
+    global model, tokenizer, model_source, draft_model, loaded_adapters, is_loading
     
     if model is not None:
         return
@@ -28,22 +133,18 @@ def load_model():
     print("🔄 Loading Phi-2 Finance AI...")
     
     try:
-        # Load base model
-        base_model = AutoModelForCausalLM.from_pretrained(
-            "microsoft/phi-2",
-            torch_dtype=torch.float16,
-            trust_remote_code=True,
-            low_cpu_mem_usage=True
-        )
+        # Prefer the merged checkpoint (see merge_adapter.py), else base + LoRA
+        # Device, dtype and quantization come from serving_config.
+        # With several adapters on disk they all share one base model.
+        model, tokenizer, model_source = load_serving_model(adapters=serving_config.ADAPTERS)
+        if model_source == "multi-adapter":
+            loaded_adapters = list(model.peft_config)
         
-        # Load LoRA adapter
-        model = PeftModel.from_pretrained(base_model, "../models/finance_phi2_model")
-        model = model.to("cuda")
-        model.eval()
+        if serving_config.SPECULATIVE_DECODING:
+            print(f"🏎️  Loading draft model: {serving_config.DRAFT_MODEL_PATH}")
+            draft_model = load_draft_model()
         
-        # Load tokenizer
-        tokenizer = AutoTokenizer.from_pretrained("microsoft/phi-2", trust_remote_code=True)
-        tokenizer.pad_token = tokenizer.eos_token
+        start_scheduler()
         
         print("✅ Model loaded successfully!")
         is_loading = False
@@ -53,29 +154,74 @@ def load_model():
         is_loading = False
         raise
 
-def generate_answer(question):
-    """Generate answer for a question"""
-    if model is None or tokenizer is None:
-        return "Model is still loading. Please try again in a moment."
+def generate_answer(question, adapter=None):
+    """Generate answer for a question; returns (answer, token metadata)"""
+    if model is None or tokenizer is None or scheduler is None:
+        return "Model is still loading. Please try again in a moment.", {}
     
     prompt = f"Instruct: {question}\nOutput:"
-    inputs = tokenizer(prompt, return_tensors="pt").to("cuda")
-    
-    with torch.no_grad():
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=250,
-            do_sample=True,
-            temperature=0.7,
-            top_p=0.9,
-            repetition_penalty=1.1,
-            pad_token_id=tokenizer.eos_token_id,
-            eos_token_id=tokenizer.eos_token_id
-        )
-    
-    response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    answer = response.split("Output:")[-1].strip()
-    return answer
+    
+    # Concurrent questions share one batched generate() call, and each
+    # stops as soon as it starts a new "Instruct:" block. Questions for
+    # different adapters can still share a batch.
+    result = scheduler.submit(prompt, adapter=adapter)
+    return result.text.strip(), result.metadata()
+
+def answer_question(question, adapter=None):
+    """Return (answer, cached, metadata), consulting the answer cache first"""
+    answer = answer_cache.get(question, model=adapter)
+    if answer is not None:
+        return answer, True, {}
+    
+    def generate():
+        answer, metadata = generate_answer(question, adapter)
+        if scheduler is not None:
+            answer_cache.put(question, answer, model=adapter)
+        return answer, metadata
+
+    # Concurrent misses for the same question attach to one generation
+    (answer, metadata), coalesced = chat_flight.do(
+        flight_key(question, adapter, GENERATION_KWARGS), generate
+    )
+    return answer, False, {**metadata, 'coalesced': coalesced}
+
+def precompute_suggestions():
+    """Answer the suggestion list up front so clicks are served from cache"""
+    adapter = default_adapter() if loaded_adapters else None
+    missing = [q for q in SUGGESTIONS if not answer_cache.contains(q, model=adapter)]
+    if not missing:
+        return
+    
+    print(f"🧮 Precomputing {len(missing)} suggestion answers...")
+    start_time = time.time()
+    
+    # Submit concurrently so the scheduler batches them
+    with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+        answers = [answer for answer, _ in pool.map(generate_answer, missing, [adapter] * len(missing))]
+    
+    for question, answer in zip(missing, answers):
+        answer_cache.put(question, answer, model=adapter)
+    answer_cache.save()
+    
+    print(f"✅ Suggestions cached in {time.time() - start_time:.1f}s")
+
+def warmup():
+    """Warm kernels for single and full batches, then precompute suggestions"""
+    warmup_model(
+        model,
+        tokenizer,
+        serving_config.WARMUP_PROMPTS,
+        batch_sizes=(1, serving_config.BATCH_MAX_SIZE),
+        max_new_tokens=serving_config.WARMUP_NEW_TOKENS
+    )
+    
+    if serving_config.PRECOMPUTE_SUGGESTIONS:
+        precompute_suggestions()
+
+# Loads in the background so the server answers probes while starting
+lifecycle = ModelLifecycle(load_model, warmup)
+
+REGISTRY.register_collector(model_memory_collector(lambda: {'finance': model, 'draft': draft_model}))
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -83,9 +229,24 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'model_loaded': model is not None,
-        'is_loading': is_loading
+        'model_source': model_source,
+        'adapters': loaded_adapters,
+        'speculative_decoding': draft_model is not None,
+        'is_loading': is_loading,
+        **lifecycle.snapshot()
     })
 
+@app.route('/api/health/live', methods=['GET'])
+def health_live():
+    """Liveness probe: the process is up and serving HTTP"""
+    return jsonify({'status': 'alive', 'state': lifecycle.state})
+
+@app.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    """Readiness probe: 200 only once the model is loaded and warmed up"""
+    snapshot = lifecycle.snapshot()
+    return jsonify(snapshot), 200 if lifecycle.is_ready() else 503
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Chat endpoint"""
@@ -96,37 +257,110 @@ def chat():
         if not question:
             return jsonify({'error': 'Question cannot be empty'}), 400
         
-        # Generate answer
+        adapter = select_adapter(data.get('model'))
+        
+        # Generate answer (or serve it from the answer cache)
         start_time = time.time()
-        answer = generate_answer(question)
+        answer, cached, metadata = answer_question(question, adapter)
         response_time = time.time() - start_time
         
         return jsonify({
             'answer': answer,
-            'response_time': round(response_time, 2)
+            'model': model_name(adapter),
+            'response_time': round(response_time, 3 if cached else 2),
+            'cached': cached,
+            **metadata
         })
         
+    except UnknownAdapterError as e:
+        return jsonify({'error': str(e)}), 400
+    except (QueueFullError, DeadlineExceededError) as e:
+        return overload_response(e)
     except Exception as e:
+        ERRORS.labels("chat", type(e).__name__).inc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming chat endpoint (Server-Sent Events)"""
+    data = request.json or {}
+    question = data.get('question', '').strip()
+    
+    if not question:
+        return jsonify({'error': 'Question cannot be empty'}), 400
+    
+    try:
+        adapter = select_adapter(data.get('model'))
+    except UnknownAdapterError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    cached_answer = answer_cache.get(question, model=adapter)
+    
+    if cached_answer is None and (model is None or tokenizer is None):
+        return jsonify({'error': 'Model is still loading. Please try again in a moment.'}), 503
+    
+    coalesced = False
+    if cached_answer is not None:
+        chunks = iter([cached_answer])
+    else:
+        prompt = f"Instruct: {question}\nOutput:"
+        try:
+            # Identical concurrent streams follow one generation
+            chunks, coalesced = stream_flight.stream(
+                flight_key(question, adapter, GENERATION_KWARGS),
+                lambda: stream_generate(
+                    model,
+                    tokenizer,
+                    prompt,
+                    pool=stream_pool,
+                    stop_strings=serving_config.STOP_STRINGS,
+                    eos_token_id=tokenizer.eos_token_id,
+                    **adapter_kwargs([adapter]),
+                    **GENERATION_KWARGS,
+                    **assisted_kwargs()
+                )
+            )
+        except QueueFullError as e:
+            return overload_response(e)
+    
+    def on_complete(answer, timing):
+        answer = trim_at_stop(answer, serving_config.STOP_STRINGS)[0].strip()
+        if cached_answer is None and not coalesced:
+            answer_cache.put(question, answer, model=adapter)
+        return {
+            'answer': answer,
+            'model': model_name(adapter),
+            'cached': cached_answer is not None,
+            'coalesced': coalesced,
+            **timing
+        }
+    
+    return Response(
+        stream_with_context(sse_stream(chunks, on_complete)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/suggestions', methods=['GET'])
 def get_suggestions():
     """Get suggested questions"""
-    suggestions = [
-        "What is compound interest?",
-        "Should I invest in index funds or individual stocks?",
-        "How much should I save for retirement?",
-        "What is a 401k retirement account?",
-        "Explain portfolio diversification",
-        "What is the difference between Roth IRA and Traditional IRA?",
-        "How do I create an emergency fund?",
-        "What are dividends?"
-    ]
-    return jsonify({'suggestions': suggestions})
+    return jsonify({'suggestions': SUGGESTIONS})
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Answer cache, batching and queue statistics"""
+    return jsonify({
+        'answer_cache': answer_cache.stats(),
+        'batching': dict(scheduler.stats) if scheduler is not None else None,
+        'queue': scheduler.queue_stats.snapshot() if scheduler is not None else None,
+        'stream_queue': stream_pool.stats.snapshot(),
+        'coalescing': {'chat': chat_flight.stats(), 'stream': stream_flight.stats()}
+    })
 
 if __name__ == '__main__':
-    # Load model on startup
-    load_model()
+    # Load model in the background; /api/health/ready turns 200 when done
+    answer_cache.load()
+    lifecycle.start()
     
     # Run Flask app
     print("\n" + "="*70)
@@ -134,6 +368,7 @@ if __name__ == '__main__':
     print("="*70)
     print("📡 Server running on: http://localhost:5000")
     print("💬 API endpoint: http://localhost:5000/api/chat")
+    print("📶 Streaming:    http://localhost:5000/api/chat/stream")
     print("="*70 + "\n")
     
     app.run(host='0.0.0.0', port=5000, debug=False)
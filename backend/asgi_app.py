@@ -0,0 +1,190 @@
+"""
+Async (ASGI) Front End for the Chat Service
+Keeps client connections on an asyncio event loop and hands generation to
+a dedicated thread pool, so slow clients no longer pin one OS thread each.
+Serves the same JSON contracts as the Flask routes in app.py.
+
+Run with:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import contextlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+import serving_config
+import rlhf_config
+import app as service
+from feedback_log import FeedbackLog, InvalidFeedbackError, feedback_record
+from inference_pool import QueueFullError, DeadlineExceededError, overload_response
+from multi_adapter import UnknownAdapterError
+from metrics import REGISTRY, ERRORS, CONTENT_TYPE
+
+# Only threads that are actually waiting on the model; idle connections cost none
+executor = ThreadPoolExecutor(
+    max_workers=serving_config.ASGI_EXECUTOR_WORKERS,
+    thread_name_prefix="generation"
+)
+
+# Ratings go to the same append-only log as chat_api_rlhf.py's; append() only
+# queues, so it is safe to call on the event loop
+feedback_log = FeedbackLog(
+    rlhf_config.FEEDBACK_LOG_PATH,
+    max_batch=rlhf_config.FEEDBACK_MAX_BATCH,
+    flush_interval=rlhf_config.FEEDBACK_FLUSH_INTERVAL_SECONDS,
+    max_pending=rlhf_config.FEEDBACK_MAX_PENDING
+)
+
+# Generations handed to the executor that no thread has picked up yet
+executor_waiting = 0
+executor_lock = threading.Lock()
+
+async def run_blocking(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, fn, *args)
+
+def _release_slot():
+    global executor_waiting
+    with executor_lock:
+        executor_waiting -= 1
+
+async def run_generation(fn, *args):
+    """
+    run_blocking() with the scheduler's admission control applied up front.
+    The executor's own queue is unbounded and its threads only reach
+    scheduler.submit() once free, so requests waiting there count against
+    MAX_QUEUE too; beyond it QueueFullError is raised on the event loop.
+    """
+    global executor_waiting
+    stats = service.scheduler.queue_stats if service.scheduler is not None else None
+    with executor_lock:
+        queued = executor_waiting + (stats.queued if stats is not None else 0)
+        full = queued >= serving_config.MAX_QUEUE
+        if not full:
+            executor_waiting += 1
+    if full:
+        if stats is not None:
+            with stats.lock:
+                stats.rejected += 1
+        raise QueueFullError(stats.retry_after() if stats is not None else 1)
+
+    def started():
+        _release_slot()
+        return fn(*args)
+
+    future = executor.submit(started)
+    # A request abandoned before a thread took it never runs started()
+    future.add_done_callback(lambda f: f.cancelled() and _release_slot())
+    return await asyncio.wrap_future(future)
+
+def overload_json(error):
+    body, status, headers = overload_response(error)
+    return JSONResponse(body, status_code=status, headers=headers)
+
+async def chat(request):
+    """Chat endpoint"""
+    try:
+        data = await request.json()
+        question = data.get('question', '').strip()
+
+        if not question:
+            return JSONResponse({'error': 'Question cannot be empty'}, status_code=400)
+
+        adapter = service.select_adapter(data.get('model'))
+
+        start_time = time.time()
+        if service.answer_cache.contains(question, model=adapter):
+            answer, cached, metadata = await run_blocking(service.answer_question, question, adapter)
+        else:
+            answer, cached, metadata = await run_generation(service.answer_question, question, adapter)
+        response_time = time.time() - start_time
+
+        return JSONResponse({
+            'answer': answer,
+            'model': service.model_name(adapter),
+            'response_time': round(response_time, 3 if cached else 2),
+            'cached': cached,
+            **metadata
+        })
+
+    except UnknownAdapterError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except (QueueFullError, DeadlineExceededError) as e:
+        return overload_json(e)
+    except Exception as e:
+        ERRORS.labels("chat", type(e).__name__).inc()
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+async def feedback(request):
+    """
+    Receive user rating. Validated like chat_api_rlhf.py's route; this
+    service keeps no conversations, so the client sends the question and
+    response it rates.
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    try:
+        record, _ = feedback_record(data)
+    except InvalidFeedbackError as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status)
+    if not feedback_log.append(record):
+        return JSONResponse({'error': 'Feedback queue is full, please retry'}, status_code=503)
+
+    print(f"⭐ Feedback Received: {record['rating']} Stars")
+    return JSONResponse({'status': 'success', 'response': None})
+
+async def get_suggestions(request):
+    """Get suggested questions"""
+    return JSONResponse({'suggestions': service.SUGGESTIONS})
+
+async def health_live(request):
+    return JSONResponse({'status': 'alive', 'state': service.lifecycle.state})
+
+async def health_ready(request):
+    status = 200 if service.lifecycle.is_ready() else 503
+    return JSONResponse(service.lifecycle.snapshot(), status_code=status)
+
+async def metrics(request):
+    """Prometheus metrics (the same registry app.py records into)"""
+    return Response(REGISTRY.render(), headers={'Content-Type': CONTENT_TYPE})
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Same startup as app.py: load in the background, probes answer at once
+    service.answer_cache.load()
+    service.lifecycle.start()
+    yield
+    service.answer_cache.save()
+    feedback_log.close()
+    executor.shutdown(wait=False)
+
+app = Starlette(
+    routes=[
+        Route('/api/chat', chat, methods=['POST']),
+        Route('/api/feedback', feedback, methods=['POST']),
+        Route('/api/suggestions', get_suggestions, methods=['GET']),
+        Route('/api/health/live', health_live, methods=['GET']),
+        Route('/api/health/ready', health_ready, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("\n" + "="*70)
+    print("🚀 FINBUD FINANCE AI - Async Backend Server")
+    print("="*70)
+    print("📡 Server running on: http://localhost:5000")
+    print("="*70 + "\n")
+
+    uvicorn.run(app, host='0.0.0.0', port=5000)
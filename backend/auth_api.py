@@ -11,9 +11,13 @@ import datetime
 from functools import wraps
 import os
 from email_service import generate_otp, send_otp_email, send_password_reset_confirmation
+from metrics import REGISTRY, instrument_flask
 
 app = Flask(__name__)
 CORS(app)
+instrument_flask(app, "auth")  # Request metrics + GET /metrics
+
+LOGINS = REGISTRY.counter("finbud_auth_logins", "Login attempts by outcome", ("result",))
 
 # Configuration
 app.config['SECRET_KEY'] = 'your-secret-key-change-this-in-production'
@@ -158,11 +162,11 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if not user:
+        if not user or not check_password_hash(user.password, password):
+            LOGINS.labels("invalid").inc()
             return jsonify({'error': 'Invalid email or password'}), 401
         
-        if not check_password_hash(user.password, password):
-            return jsonify({'error': 'Invalid email or password'}), 401
+        LOGINS.labels("success").inc()
         
         token = jwt.encode({
             'user_id': user.id,
@@ -386,6 +390,7 @@ if __name__ == '__main__':
     print("   GET    /api/me                  - Get current user")
     print("   GET    /api/users               - List all users")
     print("   GET    /api/health              - Health check")
+    print("   GET    /metrics                 - Prometheus metrics")
     print("="*70 + "\n")
     
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
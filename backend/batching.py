@@ -0,0 +1,227 @@
+"""
+Dynamic Micro-Batching
+Collects concurrent prompts and runs them through one batched model.generate()
+"""
+import queue
+import threading
+import time
+import torch
+from inference_pool import QueueStats, QueueFullError, DeadlineExceededError
+from decoding import stopping_criteria, trim_at_stop, count_generated, GenerationResult, StepTimer
+from metrics import record_generation
+from multi_adapter import adapter_kwargs
+
+class PendingRequest:
+    """A prompt waiting for its generated text"""
+    def __init__(self, prompt, timeout, adapter=None):
+        self.prompt = prompt
+        self.adapter = adapter
+        self.enqueued_at = time.time()
+        self.deadline = self.enqueued_at + timeout
+        self.cancelled = False
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class BatchScheduler:
+    """
+    Background worker that batches prompts for a causal LM.
+
+    The first prompt to arrive opens a batch; the worker then keeps
+    collecting prompts for up to max_wait_ms or until max_batch_size
+    is reached, left-pads them and generates them together.
+
+    At most max_queue prompts may wait; beyond that submit() raises
+    QueueFullError. Prompts not served within timeout seconds fail with
+    DeadlineExceededError.
+
+    Each sequence stops on its own as soon as it emits one of stop_strings;
+    submit() returns a GenerationResult with the trimmed text.
+
+    On a multi-adapter model each prompt may name its adapter; prompts for
+    different adapters still share one batch.
+    """
+    def __init__(self, model, tokenizer, max_batch_size=8, max_wait_ms=10,
+                 max_queue=None, timeout=60, stop_strings=None, **generate_kwargs):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.stop_strings = stop_strings or []
+        self.generate_kwargs = generate_kwargs
+
+        # One batch serves up to max_batch_size prompts at once
+        self.queue_stats = QueueStats(workers=max_batch_size, name="batch")
+
+        # Decoder-only models must be left-padded so new tokens line up
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        self.queue = queue.Queue()
+        self.thread = None
+        self.running = False
+
+        self.stats = {
+            'requests': 0,
+            'batches': 0,
+            'generated_tokens': 0,
+            'tokens_saved': 0,
+            'max_batch_seen': 0,
+            'mixed_adapter_batches': 0,
+        }
+
+    def start(self):
+        """Start the background worker"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the worker after the current batch"""
+        self.running = False
+        self.queue.put(None)
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def submit(self, prompt, timeout=None, adapter=None):
+        """Queue a prompt and block until its GenerationResult is ready"""
+        pending = PendingRequest(prompt, timeout or self.timeout, adapter)
+
+        stats = self.queue_stats
+        with stats.lock:
+            full = self.max_queue is not None and stats.queued >= self.max_queue
+            if full:
+                stats.rejected += 1
+            else:
+                stats.queued += 1
+                stats.admitted += 1
+        if full:
+            raise QueueFullError(stats.retry_after())
+
+        self.queue.put(pending)
+
+        if not pending.done.wait(pending.deadline - time.time()):
+            pending.cancelled = True
+            with stats.lock:
+                stats.timed_out += 1
+            raise DeadlineExceededError(stats.retry_after())
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _admit(self, pending, now):
+        """Dequeue bookkeeping; returns False for cancelled or expired prompts"""
+        stats = self.queue_stats
+        with stats.lock:
+            stats.queued -= 1
+        if pending.cancelled:
+            return False
+        if now > pending.deadline:
+            with stats.lock:
+                stats.timed_out += 1
+            pending.error = DeadlineExceededError(stats.retry_after())
+            pending.done.set()
+            return False
+        stats.record_wait(now - pending.enqueued_at)
+        return True
+
+    def _collect_batch(self):
+        """Block for one request, then gather more until full or the window closes"""
+        first = self.queue.get()
+        if first is None:
+            return []
+
+        batch = [first] if self._admit(first, time.time()) else []
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self.running = False
+                break
+            if self._admit(item, time.time()):
+                batch.append(item)
+        return batch
+
+    def _run(self):
+        while self.running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            stats = self.queue_stats
+            with stats.lock:
+                stats.in_flight += len(batch)
+            start = time.time()
+            try:
+                results = self._generate(batch)
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                with stats.lock:
+                    stats.in_flight -= len(batch)
+                for pending in batch:
+                    stats.record_service(time.time() - start)
+                    pending.done.set()
+
+    def _generate(self, batch):
+        """Run one batched generate() and return a GenerationResult per prompt"""
+        prompts = [pending.prompt for pending in batch]
+        start = time.perf_counter()
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.model.device)
+        prompt_length = inputs['input_ids'].shape[1]
+        adapters = [pending.adapter for pending in batch]
+
+        timer = StepTimer()
+        tokenized = time.perf_counter()
+        with torch.no_grad():
+            outputs = self.model.generate(
+                **inputs,
+                pad_token_id=self.tokenizer.pad_token_id,
+                stopping_criteria=stopping_criteria(self.tokenizer, self.stop_strings, prompt_length, timer),
+                **adapter_kwargs(adapters),
+                **self.generate_kwargs
+            )
+        generated_at = time.perf_counter()
+
+        # Decode only the new tokens; finished rows are padded on the right
+        new_tokens = outputs[:, prompt_length:]
+        texts = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+        generated = count_generated(new_tokens, self.tokenizer.pad_token_id)
+        first_token_at = timer.first_token_at or generated_at
+        record_generation(
+            tokenize=tokenized - start,
+            prefill=first_token_at - tokenized,
+            decode=generated_at - first_token_at,
+            detokenize=time.perf_counter() - generated_at,
+            prompt_tokens=int(inputs['attention_mask'].sum()),
+            generated_tokens=sum(generated)
+        )
+        max_new_tokens = self.generate_kwargs.get('max_new_tokens', new_tokens.shape[1])
+
+        results = []
+        for text, count in zip(texts, generated):
+            text, stopped = trim_at_stop(text, self.stop_strings)
+            results.append(GenerationResult(text, count, max_new_tokens, stopped))
+
+        self.stats['requests'] += len(batch)
+        self.stats['batches'] += 1
+        self.stats['generated_tokens'] += sum(generated)
+        self.stats['tokens_saved'] += sum(r.tokens_saved for r in results)
+        self.stats['max_batch_seen'] = max(self.stats['max_batch_seen'], len(batch))
+        if len(set(adapters)) > 1:
+            self.stats['mixed_adapter_batches'] += 1
+        return results
@@ -0,0 +1,148 @@
+"""
+Flask vs ASGI Concurrency Benchmark
+Opens many simultaneous /api/chat connections against the threaded Flask
+server (app.py) and the async front end (asgi_app.py) and reports server
+threads and resident memory while the connections are held.
+
+Generation is replaced by a stub that admits --capacity requests at a time
+and takes --hold seconds each, so the numbers isolate the cost of holding
+connections rather than the model itself.
+
+Usage:
+    python bench_asgi.py --connections 100 200 400
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+def stub_service(service, hold, capacity):
+    """Swap real generation for a bounded sleep that behaves like a busy model"""
+    slots = threading.Semaphore(capacity)
+
+    def answer_question(question, adapter=None):
+        with slots:
+            time.sleep(hold)
+        return "stub answer", False, {}
+
+    service.answer_question = answer_question
+    service.lifecycle.start = lambda: None
+    service.answer_cache.load = lambda: 0
+    service.answer_cache.save = lambda: None
+
+def serve(args):
+    import app as service
+    stub_service(service, args.hold, args.capacity)
+
+    if args.frontend == "flask":
+        from werkzeug.serving import make_server
+        server = make_server("127.0.0.1", args.port, service.app, threaded=True)
+        server.socket.listen(4096)
+        server.serve_forever()
+    else:
+        import uvicorn
+        import asgi_app
+        uvicorn.run(asgi_app.app, host="127.0.0.1", port=args.port, log_level="warning", backlog=4096)
+
+def read_proc_status(pid):
+    """(VmRSS in MB, thread count) from /proc"""
+    rss = threads = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1]) / 1024
+            elif line.startswith("Threads:"):
+                threads = int(line.split()[1])
+    return rss, threads
+
+def wait_for_port(port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+async def one_request(port, body):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        b"POST /api/chat HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response.split(b" ", 2)[1] == b"200"
+
+async def hold_connections(port, pid, connections):
+    body = json.dumps({'question': 'What is compound interest?'}).encode()
+    tasks = [asyncio.create_task(one_request(port, body)) for _ in range(connections)]
+
+    peak_rss = peak_threads = 0.0
+    start = time.time()
+    while not all(task.done() for task in tasks):
+        rss, threads = read_proc_status(pid)
+        peak_rss, peak_threads = max(peak_rss, rss), max(peak_threads, threads)
+        await asyncio.sleep(0.05)
+    results = [task.result() if not task.exception() else False for task in tasks]
+    return {
+        'connections': connections,
+        'ok': sum(results),
+        'peak_threads': int(peak_threads),
+        'peak_rss_mb': round(peak_rss, 1),
+        'seconds': round(time.time() - start, 2),
+    }
+
+def bench(frontend, connections, args, port):
+    process = subprocess.Popen(
+        [sys.executable, __file__, "serve", "--frontend", frontend, "--port", str(port),
+         "--hold", str(args.hold), "--capacity", str(args.capacity)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(port)
+        idle_rss, idle_threads = read_proc_status(process.pid)
+        result = asyncio.run(hold_connections(port, process.pid, connections))
+        result['idle_rss_mb'] = round(idle_rss, 1)
+        result['frontend'] = frontend
+        return result
+    finally:
+        process.terminate()
+        process.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", nargs="?", default="bench", choices=["bench", "serve"])
+    parser.add_argument("--frontend", default="asgi", choices=["flask", "asgi"])
+    parser.add_argument("--port", type=int, default=5100)
+    parser.add_argument("--connections", type=int, nargs="+", default=[50, 200, 400])
+    parser.add_argument("--hold", type=float, default=0.5, help="Seconds per stub generation")
+    parser.add_argument("--capacity", type=int, default=8, help="Stub generations in parallel")
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        serve(args)
+        sys.exit(0)
+
+    results = []
+    port = args.port
+    for connections in args.connections:
+        for frontend in ["flask", "asgi"]:
+            results.append(bench(frontend, connections, args, port))
+            port += 1
+
+    print("="*72)
+    print(f"{'frontend':>8} {'conns':>6} {'ok':>5} {'threads':>8} {'idle MB':>8} {'peak MB':>8} {'MB/conn':>8} {'secs':>6}")
+    print("="*72)
+    for r in results:
+        per_conn = (r['peak_rss_mb'] - r['idle_rss_mb']) / r['connections']
+        print(f"{r['frontend']:>8} {r['connections']:>6} {r['ok']:>5} {r['peak_threads']:>8} "
+              f"{r['idle_rss_mb']:>8} {r['peak_rss_mb']:>8} {per_conn:>8.3f} {r['seconds']:>6}")
+    print(json.dumps(results, indent=2))
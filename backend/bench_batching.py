@@ -0,0 +1,74 @@
+"""
+Micro-Batching Benchmark
+Compares tokens/sec of one-at-a-time generation vs the BatchScheduler
+under concurrent load, using a tiny random model on CPU
+"""
+import argparse
+import threading
+import time
+from batching import BatchScheduler
+from tiny_model import build_tiny_model
+
+QUESTIONS = [
+    "What is compound interest?",
+    "How much should I save for retirement?",
+    "Explain portfolio diversification",
+    "What are dividends?",
+]
+
+def run_load(scheduler, concurrency, requests_per_client):
+    """Fire requests from `concurrency` threads and return elapsed seconds"""
+    def client(idx):
+        for i in range(requests_per_client):
+            question = QUESTIONS[(idx + i) % len(QUESTIONS)]
+            scheduler.submit(f"Instruct: {question}\nOutput:")
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.time() - start
+
+def bench(max_batch_size, args):
+    model, tokenizer = build_tiny_model(hidden_size=args.hidden_size, num_layers=args.layers)
+    scheduler = BatchScheduler(
+        model,
+        tokenizer,
+        max_batch_size=max_batch_size,
+        max_wait_ms=args.wait_ms,
+        max_new_tokens=args.new_tokens,
+        min_new_tokens=args.new_tokens,
+        do_sample=False,
+    )
+    scheduler.start()
+    elapsed = run_load(scheduler, args.concurrency, args.requests)
+    scheduler.stop()
+
+    tokens = scheduler.stats['generated_tokens']
+    return {
+        'elapsed': elapsed,
+        'tokens_per_sec': tokens / elapsed,
+        'batches': scheduler.stats['batches'],
+        'avg_batch': scheduler.stats['requests'] / max(scheduler.stats['batches'], 1),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=4, help="Requests per client")
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--wait-ms", type=float, default=10)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--layers", type=int, default=4)
+    args = parser.parse_args()
+
+    print("="*60)
+    print(f"MICRO-BATCHING BENCHMARK ({args.concurrency} concurrent clients)")
+    print("="*60)
+    for label, size in [("unbatched", 1), ("batched", args.max_batch)]:
+        result = bench(size, args)
+        print(f"{label:>10}: {result['tokens_per_sec']:8.1f} tok/s  "
+              f"{result['elapsed']:6.2f}s  avg batch {result['avg_batch']:.1f}")
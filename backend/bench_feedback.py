@@ -0,0 +1,143 @@
+"""
+Feedback Log Benchmark
+Sustained feedback writes per second through FeedbackLog under several
+batch / flush policies, plus the latency append() adds to the request path.
+Producers call append() as fast as the queue accepts; throughput counts only
+records that were written and fsync'ed.
+
+--crash-test SIGKILLs a writing process mid-stream and checks that recover()
+leaves only complete records behind.
+
+Usage:
+    python bench_feedback.py --duration 5 --producers 8
+    python bench_feedback.py --crash-test
+"""
+import argparse
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+import numpy as np
+from feedback_log import FeedbackLog, read_log, recover, compact
+
+POLICIES = [
+    ("fsync per record", 1, 0.0),
+    ("batch 64 / 10ms", 64, 0.01),
+    ("batch 256 / 1s", 256, 1.0),
+    ("batch 1024 / 1s", 1024, 1.0),
+]
+
+def sample_record(i):
+    return {
+        'conversation_id': 722659399818752 + i,
+        'turn': 0,
+        'rating': 1 + i % 5,
+        'question': "How much should I save for retirement?",
+        'response': "A common rule of thumb is to save 15% of your pre-tax income for retirement. " * 3,
+        'model': 'rlhf',
+        'adapter_version': '20261018-120000',
+        'comment': None,
+        'received_at': time.time(),
+    }
+
+def run_policy(path, max_batch, flush_interval, producers, duration):
+    log = FeedbackLog(path, max_batch=max_batch, flush_interval=flush_interval, max_pending=max(4 * max_batch, 1024))
+    stop = threading.Event()
+    latencies = [[] for _ in range(producers)]
+
+    def produce(slot):
+        i = slot
+        while not stop.is_set():
+            start = time.perf_counter()
+            accepted = log.append(sample_record(i))
+            if accepted:
+                latencies[slot].append(time.perf_counter() - start)
+                i += producers
+            else:
+                time.sleep(0.0005)  # Queue full: back off like a client retrying
+
+    threads = [threading.Thread(target=produce, args=(slot,)) for slot in range(producers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    written = log.stats()['written']
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for t in threads:
+        t.join()
+    log.close()
+
+    values = np.concatenate([np.asarray(l) for l in latencies]) * 1e6
+    stats = log.stats()
+    return {
+        'writes_per_second': round(written / elapsed),
+        'avg_batch': stats['avg_batch'],
+        'avg_fsync_ms': stats['avg_fsync_ms'],
+        'append_p50_us': round(float(np.percentile(values, 50)), 1),
+        'append_p99_us': round(float(np.percentile(values, 99)), 1),
+        'rejected': stats['dropped'],
+    }
+
+def crash_test(folder, records=200000):
+    """Kill a writer mid-stream; recover() must leave only whole records"""
+    path = os.path.join(folder, "crash.jsonl")
+    pid = os.fork()
+    if pid == 0:
+        log = FeedbackLog(path, max_batch=512, flush_interval=0.001, max_pending=records)
+        for i in range(records):
+            while not log.append(sample_record(i)):
+                time.sleep(0.0001)
+        log.flush()
+        os._exit(0)
+
+    while not os.path.exists(path) or os.path.getsize(path) < 2 * 1024 * 1024:
+        time.sleep(0.005)
+    os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+
+    # Simulate a torn write on top of whatever the kill left behind
+    with open(path, 'ab') as f:
+        f.write(b'{"conversation_id": 1, "rating": 5, "quest')
+    removed = recover(path)
+    with open(path, 'rb') as f:
+        lines = f.read().split(b"\n")
+    complete = sum(1 for line in lines if line)
+    parsed = sum(1 for _ in read_log(path))
+    count = compact(path, os.path.join(folder, "feedback_data.json"))
+    return {
+        'removed_bytes': removed,
+        'complete_lines': complete,
+        'parsed_records': parsed,
+        'all_lines_valid': complete == parsed,
+        'compacted_records': count,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--producers", type=int, default=8)
+    parser.add_argument("--dir", help="Directory for the logs (default: a temp dir; use the data disk for real numbers)")
+    parser.add_argument("--crash-test", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as folder:
+        if args.crash_test:
+            print(json.dumps(crash_test(folder), indent=2))
+        else:
+            results = {}
+            for i, (name, max_batch, interval) in enumerate(POLICIES):
+                results[name] = run_policy(
+                    os.path.join(folder, f"feedback_{i}.jsonl"), max_batch, interval, args.producers, args.duration
+                )
+
+            print("="*84)
+            print(f"{'policy':<18} {'writes/s':>10} {'avg batch':>10} {'fsync ms':>9} "
+                  f"{'append p50':>11} {'append p99':>11} {'rejected':>9}")
+            print("="*84)
+            for name, r in results.items():
+                print(f"{name:<18} {r['writes_per_second']:>10,} {r['avg_batch']:>10} {r['avg_fsync_ms']:>9} "
+                      f"{r['append_p50_us']:>9}us {r['append_p99_us']:>9}us {r['rejected']:>9}")
+            print(json.dumps(results, indent=2))
@@ -0,0 +1,324 @@
+"""
+HTTP Load Generator for the Chat Endpoints
+Replays a question mix (dataset.json instructions + /api/suggestions)
+against app.py or chat_api_rlhf.py and reports throughput, latency
+percentiles, time-to-first-token (streaming) and error/429 rates as JSON.
+
+Closed loop (--concurrency N): N clients, each sends its next request when
+the previous one returns. Open loop (--rate R): requests arrive as a Poisson
+process at R/s regardless of how fast the server answers; latency is
+measured from the scheduled arrival, so queueing delay is not hidden.
+
+Without --url the chosen server is started in-process on a tiny random CPU
+model, so the harness runs on any Linux box.
+
+Usage:
+    python bench_load.py --server app --concurrency 8 --requests 200
+    python bench_load.py --server rlhf --endpoint stream --rate 5 --duration 30
+    python bench_load.py --url http://localhost:5000 --concurrency 16 --output load.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import numpy as np
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dataset.json")
+
+ENDPOINTS = {
+    'chat': '/api/chat',
+    'stream': '/api/chat/stream',
+}
+
+def load_questions(url, dataset_path, suggestion_ratio, seed):
+    """Question mix: dataset instructions plus the server's suggestion list"""
+    with open(dataset_path, 'r', encoding='utf-8') as f:
+        dataset = [item['instruction'] for item in json.load(f)]
+
+    try:
+        status, body = request_json(url, 'GET', '/api/suggestions')
+        suggestions = body.get('suggestions', []) if status == 200 else []
+    except OSError:
+        suggestions = []
+
+    rng = random.Random(seed)
+    def next_question():
+        if suggestions and rng.random() < suggestion_ratio:
+            return rng.choice(suggestions)
+        return rng.choice(dataset)
+    return next_question, len(dataset), len(suggestions)
+
+def connect(url, timeout):
+    parsed = urlparse(url)
+    cls = http.client.HTTPSConnection if parsed.scheme == 'https' else http.client.HTTPConnection
+    return cls(parsed.hostname, parsed.port, timeout=timeout)
+
+def request_json(url, method, path, body=None, timeout=30):
+    conn = connect(url, timeout)
+    try:
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        try:
+            return response.status, json.loads(data)
+        except ValueError:
+            return response.status, {}  # e.g. an HTML 404 page
+    finally:
+        conn.close()
+
+def send_chat(url, endpoint, question, timeout):
+    """
+    One request; returns dict(status, ttft, end, error) with times from
+    time.perf_counter(). ttft is the first SSE token (stream endpoint only).
+    """
+    conn = connect(url, timeout)
+    result = {'status': None, 'ttft': None, 'end': None, 'error': None}
+    try:
+        conn.request(
+            'POST',
+            ENDPOINTS[endpoint],
+            body=json.dumps({'question': question}),
+            headers={'Content-Type': 'application/json'}
+        )
+        response = conn.getresponse()
+        result['status'] = response.status
+
+        if endpoint == 'stream' and response.status == 200:
+            event = None
+            for line in response:
+                line = line.decode('utf-8').rstrip('\n')
+                if line.startswith('event: '):
+                    event = line[7:]
+                    if event == 'token' and result['ttft'] is None:
+                        result['ttft'] = time.perf_counter()
+                    elif event == 'error':
+                        result['error'] = 'stream error event'
+                elif line.startswith('data: ') and event == 'done':
+                    break
+        else:
+            response.read()
+    except OSError as e:
+        result['error'] = type(e).__name__
+    finally:
+        result['end'] = time.perf_counter()
+        conn.close()
+    return result
+
+def run_closed_loop(send, next_question, concurrency, total, deadline):
+    """`concurrency` clients back to back until `total` requests or the deadline"""
+    records = []
+    lock = threading.Lock()
+    issued = [0]
+
+    def client():
+        while time.perf_counter() < deadline:
+            with lock:
+                if total is not None and issued[0] >= total:
+                    return
+                issued[0] += 1
+                question = next_question()
+            start = time.perf_counter()
+            result = send(question)
+            result['start'] = start
+            with lock:
+                records.append(result)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return records
+
+def run_open_loop(send, next_question, rate, total, deadline, max_in_flight, seed):
+    """Poisson arrivals at `rate` per second; latency counts from the scheduled arrival"""
+    rng = random.Random(seed + 1)
+    records = []
+    lock = threading.Lock()
+
+    def fire(scheduled, question):
+        result = send(question)
+        result['start'] = scheduled
+        with lock:
+            records.append(result)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        scheduled = time.perf_counter()
+        issued = 0
+        while scheduled < deadline and (total is None or issued < total):
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, scheduled, next_question())
+            issued += 1
+            scheduled += rng.expovariate(rate)
+    return records
+
+def percentiles(values):
+    if not values:
+        return None
+    values = np.asarray(values) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 1),
+        'p95_ms': round(float(np.percentile(values, 95)), 1),
+        'p99_ms': round(float(np.percentile(values, 99)), 1),
+        'mean_ms': round(float(values.mean()), 1),
+        'max_ms': round(float(values.max()), 1),
+    }
+
+def summarize(records, elapsed):
+    status_counts = {}
+    for r in records:
+        key = str(r['status']) if r['status'] is not None else 'connection_error'
+        status_counts[key] = status_counts.get(key, 0) + 1
+
+    ok = [r for r in records if r['status'] == 200 and r['error'] is None]
+    errors = len(records) - len(ok)
+    rejected = sum(1 for r in records if r['status'] in (429, 503))
+    total = len(records)
+    return {
+        'requests': total,
+        'succeeded': len(ok),
+        'elapsed_seconds': round(elapsed, 2),
+        'throughput_rps': round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        'status_counts': status_counts,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'rate_429': round(status_counts.get('429', 0) / total, 4) if total else 0.0,
+        'rate_503': round(status_counts.get('503', 0) / total, 4) if total else 0.0,
+        'overload_rate': round(rejected / total, 4) if total else 0.0,
+        'latency': percentiles([r['end'] - r['start'] for r in ok]),
+        'time_to_first_token': percentiles([r['ttft'] - r['start'] for r in ok if r['ttft'] is not None]),
+    }
+
+def start_in_process(server, args):
+    """Start app.py or chat_api_rlhf.py on a tiny random CPU model; returns the base URL"""
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    from tiny_model import build_tiny_model
+
+    tiny_model, tiny_tokenizer = build_tiny_model(hidden_size=args.hidden_size, num_layers=args.layers)
+
+    if server == 'app':
+        import app as service
+        service.answer_cache.path = None
+        if args.no_answer_cache:
+            service.answer_cache.max_entries = 0
+        service.GENERATION_KWARGS['max_new_tokens'] = args.new_tokens
+
+        def load():
+            service.model, service.tokenizer, service.model_source = tiny_model, tiny_tokenizer, "tiny"
+            service.start_scheduler()
+        service.lifecycle.load_fn = load
+    else:
+        import chat_api_rlhf as service
+        service.MAX_NEW_TOKENS = args.new_tokens
+
+        def load():
+            service.model, service.tokenizer = tiny_model, tiny_tokenizer
+        service.lifecycle.load_fn = load
+
+    service.lifecycle.run_sync()
+    if not service.lifecycle.is_ready():
+        raise RuntimeError(f"In-process server failed to start: {service.lifecycle.error}")
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args):
+            pass
+
+    http_server = make_server("127.0.0.1", args.port, service.app, threaded=True, request_handler=QuietHandler)
+    http_server.socket.listen(1024)
+    threading.Thread(target=http_server.serve_forever, name="bench-server", daemon=True).start()
+    return f"http://127.0.0.1:{http_server.server_port}", http_server
+
+def wait_until_ready(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            status, _ = request_json(url, 'GET', '/api/health/ready', timeout=5)
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+def main(args):
+    http_server = None
+    if args.url:
+        url = args.url.rstrip('/')
+    else:
+        url, http_server = start_in_process(args.server, args)
+    wait_until_ready(url, args.ready_timeout)
+
+    next_question, num_dataset, num_suggestions = load_questions(
+        url, args.dataset, args.suggestion_ratio, args.seed
+    )
+    send = lambda question: send_chat(url, args.endpoint, question, args.timeout)
+    total = args.requests if args.requests > 0 else None
+    if total is None and args.duration is None:
+        total = 100
+
+    start = time.perf_counter()
+    deadline = start + args.duration if args.duration else float('inf')
+    if args.rate:
+        records = run_open_loop(send, next_question, args.rate, total, deadline, args.max_in_flight, args.seed)
+    else:
+        records = run_closed_loop(send, next_question, args.concurrency, total, deadline)
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'target': url if args.url else f"in-process {args.server} (tiny model)",
+        'endpoint': ENDPOINTS[args.endpoint],
+        'mode': f"open loop {args.rate}/s" if args.rate else f"closed loop x{args.concurrency}",
+        'question_mix': {
+            'dataset_questions': num_dataset,
+            'suggestions': num_suggestions,
+            'suggestion_ratio': args.suggestion_ratio if num_suggestions else 0.0,
+        },
+        **summarize(records, elapsed),
+    }
+    try:
+        status, server_stats = request_json(url, 'GET', '/api/stats')
+        if status == 200:
+            report['server_stats'] = server_stats
+    except OSError:
+        pass
+
+    if http_server is not None:
+        http_server.shutdown()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Running server (default: start one in-process)")
+    parser.add_argument("--server", default="app", choices=["app", "rlhf"], help="In-process server")
+    parser.add_argument("--endpoint", default="chat", choices=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed-loop clients")
+    parser.add_argument("--rate", type=float, help="Open-loop arrivals per second (overrides --concurrency)")
+    parser.add_argument("--requests", type=int, default=0, help="Total requests (default 100 without --duration)")
+    parser.add_argument("--duration", type=float, help="Stop issuing requests after this many seconds")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open-loop client threads")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request socket timeout")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--suggestion-ratio", type=float, default=0.3, help="Share of questions from /api/suggestions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON report here")
+    parser.add_argument("--ready-timeout", type=float, default=600)
+    # In-process tiny model
+    parser.add_argument("--port", type=int, default=0, help="In-process port (0 = any free port)")
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--hidden-size", type=int, default=64)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--no-answer-cache", action="store_true", help="app.py: generate every answer")
+    main(parser.parse_args())
@@ -0,0 +1,134 @@
+"""
+Model Load Time Benchmark
+Saves a random Phi-architecture model as safetensors, registers it in a
+scratch model registry and times load_causal_lm() in fresh processes:
+
+    cold  - shard pages dropped from the page cache first (posix_fadvise)
+    warm  - shards already in the page cache
+    copy  - warm, but loaded in a different dtype (forces a full copy)
+
+For each run it reports load time, RSS growth during the load and the time
+of the first forward pass (where memory-mapped pages are faulted in).
+
+Usage:
+    python bench_load_time.py --hidden-size 1024 --layers 12 --runs 3
+    python bench_load_time.py --model phi-2 --registry ../models/registry.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+def evict_from_page_cache(folder):
+    """Drop a folder's cached pages (no root needed; pages must not be mapped)"""
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fdatasync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+def measure(model, dtype):
+    """Runs in the child process: load, then one forward pass"""
+    import torch
+    import transformers.models.phi.modeling_phi  # keep import time out of the load
+    from prefork import process_memory
+    from model_registry import load_causal_lm
+
+    torch.set_num_threads(1)
+    rss_before = process_memory()['rss_mb']
+    start = time.perf_counter()
+    loaded = load_causal_lm(model, dtype=getattr(torch, dtype))
+    load_seconds = time.perf_counter() - start
+    rss_loaded = process_memory()['rss_mb']
+
+    start = time.perf_counter()
+    with torch.no_grad():
+        loaded(torch.zeros((1, 8), dtype=torch.long))
+    forward_seconds = time.perf_counter() - start
+
+    return {
+        'load_seconds': round(load_seconds, 3),
+        'load_rss_mb': round(rss_loaded - rss_before, 1),
+        'first_forward_seconds': round(forward_seconds, 3),
+        'rss_after_forward_mb': round(process_memory()['rss_mb'] - rss_before, 1),
+    }
+
+def run_child(model, dtype, registry_path):
+    env = dict(os.environ, FINBUD_MODEL_REGISTRY=registry_path, HF_HUB_OFFLINE="1")
+    output = subprocess.run(
+        [sys.executable, __file__, "measure", "--model", model, "--dtype", dtype],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def build_checkpoint(folder, hidden_size, layers):
+    from tiny_model import build_tiny_model
+
+    model, tokenizer = build_tiny_model(hidden_size=hidden_size, num_layers=layers, num_heads=max(1, hidden_size // 64))
+    model.save_pretrained(folder, safe_serialization=True)
+    tokenizer.save_pretrained(folder)
+    return model.num_parameters()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", nargs="?", default="bench", choices=["bench", "measure"])
+    parser.add_argument("--model", help="Registered model to time (default: build a random one)")
+    parser.add_argument("--registry", help="Registry manifest for --model")
+    parser.add_argument("--dtype", default="float32", help="dtype the checkpoint is stored in")
+    parser.add_argument("--copy-dtype", default="bfloat16", help="dtype for the copy run")
+    parser.add_argument("--hidden-size", type=int, default=1024)
+    parser.add_argument("--layers", type=int, default=12)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.mode == "measure":
+        print(json.dumps(measure(args.model, args.dtype)))
+        sys.exit(0)
+
+    from model_registry import ModelRegistry
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.model:
+            registry_path = os.path.abspath(args.registry or os.environ.get("FINBUD_MODEL_REGISTRY", ""))
+            registry = ModelRegistry(registry_path)
+            name = registry.find(args.model)
+            parameters = None
+        else:
+            registry_path = os.path.join(scratch, "registry.json")
+            registry = ModelRegistry(registry_path)
+            name = "bench"
+            parameters = build_checkpoint(os.path.join(scratch, name), args.hidden_size, args.layers)
+            registry.register(name, os.path.join(scratch, name), source="bench/random-phi", hash_files=False)
+            registry.save()
+
+        folder = registry.local_path(name)
+        size_mb = sum(info['size'] for info in registry.entries[name]['files'].values()) / 1024**2
+
+        results = {'cold': [], 'warm': [], 'copy': []}
+        run_child(name, args.dtype, registry_path)  # prime the page cache
+        for _ in range(args.runs):
+            evict_from_page_cache(folder)
+            results['cold'].append(run_child(name, args.dtype, registry_path))
+            results['warm'].append(run_child(name, args.dtype, registry_path))
+            results['copy'].append(run_child(name, args.copy_dtype, registry_path))
+
+    def best(runs, key):
+        return min(r[key] for r in runs)
+
+    print("="*78)
+    print(f"Checkpoint: {size_mb:.0f} MB safetensors ({args.dtype})"
+          + (f", {parameters/1e6:.0f}M parameters" if parameters else ""))
+    print("="*78)
+    print(f"{'run':<6} {'load s':>8} {'RSS after load':>15} {'1st forward s':>14} {'RSS after fwd':>14}")
+    for label, runs in results.items():
+        print(f"{label:<6} {best(runs, 'load_seconds'):>8.3f} {best(runs, 'load_rss_mb'):>14.1f}M "
+              f"{best(runs, 'first_forward_seconds'):>14.3f} {best(runs, 'rss_after_forward_mb'):>13.1f}M")
+    print("(best of", args.runs, "runs; copy = loaded as", args.copy_dtype + ")")
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,100 @@
+"""
+Merged vs Unmerged Adapter Benchmark
+Reports load time and per-token latency for base+LoRA vs a merged checkpoint.
+Runs on a tiny random model by default; pass --base/--adapter for the real one.
+"""
+import argparse
+import os
+import tempfile
+import time
+import torch
+from peft import LoraConfig, get_peft_model
+from model_loader import load_unmerged, load_merged, load_tokenizer, merge_adapter
+from tiny_model import build_tiny_model
+
+PROMPT = "Instruct: What is compound interest?\nOutput:"
+
+def make_tiny_checkpoint(workdir, hidden_size, layers):
+    """Save a tiny base model and a random (non-zero) LoRA adapter for it"""
+    base_path = os.path.join(workdir, "base")
+    adapter_path = os.path.join(workdir, "adapter")
+
+    model, tokenizer = build_tiny_model(hidden_size=hidden_size, num_layers=layers)
+    model.save_pretrained(base_path)
+    tokenizer.save_pretrained(base_path)
+
+    lora_config = LoraConfig(
+        r=8,
+        lora_alpha=16,
+        target_modules=["q_proj", "v_proj"],
+        init_lora_weights=False,
+        task_type="CAUSAL_LM"
+    )
+    peft_model = get_peft_model(model, lora_config)
+    peft_model.save_pretrained(adapter_path)
+    tokenizer.save_pretrained(adapter_path)
+    return base_path, adapter_path
+
+def per_token_latency(model, input_ids, new_tokens, repeats):
+    """Median seconds per generated token (greedy, fixed length)"""
+    timings = []
+    with torch.no_grad():
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=new_tokens,
+                min_new_tokens=new_tokens,
+                do_sample=False
+            )
+            timings.append((time.perf_counter() - start) / new_tokens)
+    timings.sort()
+    return timings[len(timings) // 2], output
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base", help="Base model name/path (default: tiny random model)")
+    parser.add_argument("--adapter", help="LoRA adapter path")
+    parser.add_argument("--dtype", default="float32", choices=["float16", "bfloat16", "float32"])
+    parser.add_argument("--hidden-size", type=int, default=512)
+    parser.add_argument("--layers", type=int, default=8)
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    dtype = getattr(torch, args.dtype)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.base:
+            base_path, adapter_path = args.base, args.adapter
+        else:
+            base_path, adapter_path = make_tiny_checkpoint(workdir, args.hidden_size, args.layers)
+        merged_path = os.path.join(workdir, "merged")
+
+        print("🔀 Merging adapter...")
+        merge_adapter(base_path, adapter_path, merged_path, dtype=dtype)
+
+        results = {}
+        for label in ["unmerged", "merged"]:
+            start = time.perf_counter()
+            if label == "merged":
+                model = load_merged(merged_path, dtype=dtype)
+            else:
+                model = load_unmerged(base_path, adapter_path, dtype=dtype)
+            model.eval()
+            load_time = time.perf_counter() - start
+
+            tokenizer = load_tokenizer(base_path)
+            input_ids = tokenizer(PROMPT, return_tensors="pt")['input_ids']
+            latency, output = per_token_latency(model, input_ids, args.new_tokens, args.repeats)
+            results[label] = (load_time, latency, output)
+            del model
+
+    print("\n" + "="*60)
+    print("MERGED vs UNMERGED LoRA")
+    print("="*60)
+    for label, (load_time, latency, _) in results.items():
+        print(f"{label:>9}: load {load_time:6.2f}s   {latency * 1000:7.2f} ms/token")
+    speedup = results["unmerged"][1] / results["merged"][1]
+    same = torch.equal(results["unmerged"][2], results["merged"][2])
+    print(f"\nPer-token speedup: {speedup:.2f}x   Greedy outputs identical: {same}")
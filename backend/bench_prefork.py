@@ -0,0 +1,107 @@
+"""
+Pre-Fork Workers Benchmark
+Starts chat_api_rlhf.py with 1..N forked workers on a tiny random CPU model
+and reports /api/chat throughput plus per-worker resident, proportional and
+shared memory. Shared memory staying flat per worker while PSS drops shows
+the weights are held once and shared copy-on-write.
+
+Usage:
+    python bench_prefork.py --workers 1 2 4 --concurrency 16 --requests 200
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from bench_load import run_closed_loop, send_chat, summarize, wait_until_ready
+from prefork import process_memory
+
+QUESTIONS = [
+    "What is compound interest?",
+    "How much should I save for retirement?",
+    "Explain portfolio diversification",
+    "What are dividends?",
+]
+
+def serve(args):
+    import chat_api_rlhf as service
+    from tiny_model import build_tiny_model
+
+    service.MAX_NEW_TOKENS = args.new_tokens
+
+    def load():
+        service.model, service.tokenizer = build_tiny_model(hidden_size=args.hidden_size, num_layers=args.layers)
+    service.lifecycle.load_fn = load
+    service.serve_workers(args.workers[0], host="127.0.0.1", port=args.port)
+
+def child_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+def bench(workers, args, port):
+    process = subprocess.Popen(
+        [sys.executable, __file__, "serve", "--workers", str(workers), "--port", str(port),
+         "--hidden-size", str(args.hidden_size), "--layers", str(args.layers),
+         "--new-tokens", str(args.new_tokens)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(url, 300)
+        while len(child_pids(process.pid)) < workers:
+            time.sleep(0.2)
+
+        counter = iter(range(10**9))
+        next_question = lambda: QUESTIONS[next(counter) % len(QUESTIONS)]
+        send = lambda question: send_chat(url, 'chat', question, 300)
+        start = time.perf_counter()
+        records = run_closed_loop(send, next_question, args.concurrency, args.requests, float('inf'))
+        summary = summarize(records, time.perf_counter() - start)
+
+        memory = [process_memory(pid) for pid in child_pids(process.pid)]
+        return {
+            'workers': workers,
+            'throughput_rps': summary['throughput_rps'],
+            'p50_ms': summary['latency']['p50_ms'] if summary['latency'] else None,
+            'error_rate': summary['error_rate'],
+            'supervisor': process_memory(process.pid),
+            'per_worker': memory,
+            'total_rss_mb': round(sum(m['rss_mb'] for m in memory), 1),
+            'total_pss_mb': round(sum(m['pss_mb'] for m in memory), 1),
+        }
+    finally:
+        process.terminate()
+        process.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", nargs="?", default="bench", choices=["bench", "serve"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=5200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--new-tokens", type=int, default=16)
+    parser.add_argument("--hidden-size", type=int, default=512)
+    parser.add_argument("--layers", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        serve(args)
+        sys.exit(0)
+
+    results = []
+    for i, workers in enumerate(args.workers):
+        results.append(bench(workers, args, args.port + i))
+
+    base = results[0]['throughput_rps'] or 1.0
+    print("="*84)
+    print(f"{'workers':>7} {'req/s':>7} {'scale':>6} {'p50 ms':>8} {'RSS/worker':>11} "
+          f"{'shared/worker':>14} {'PSS total':>10} {'RSS total':>10}")
+    print("="*84)
+    for r in results:
+        per = r['per_worker']
+        rss = sum(m['rss_mb'] for m in per) / len(per)
+        shared = sum(m['shared_mb'] for m in per) / len(per)
+        print(f"{r['workers']:>7} {r['throughput_rps']:>7} {r['throughput_rps'] / base:>5.2f}x "
+              f"{r['p50_ms']:>8} {rss:>10.1f}M {shared:>13.1f}M {r['total_pss_mb']:>9.1f}M {r['total_rss_mb']:>9.1f}M")
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,70 @@
+"""
+Serving Mode Benchmark
+Compares memory footprint and tokens/sec of CPU fp32, CPU bf16, CPU int8
+(dynamic quantization) and, when available, CUDA fp16.
+Runs on a tiny random model by default; pass --model for a real checkpoint.
+"""
+import argparse
+import copy
+import time
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+from model_loader import prepare_model, model_memory_bytes
+from tiny_model import build_tiny_model
+
+PROMPT = "Instruct: What is compound interest?\nOutput:"
+
+MODES = [
+    # (label, device, dtype, quantization)
+    ("cpu-fp32", "cpu", torch.float32, None),
+    ("cpu-bf16", "cpu", torch.bfloat16, None),
+    ("cpu-int8", "cpu", torch.float32, "int8"),
+    ("cuda-fp16", "cuda", torch.float16, None),
+]
+
+def tokens_per_sec(model, input_ids, new_tokens, repeats):
+    input_ids = input_ids.to(model.device)
+    best = 0.0
+    with torch.no_grad():
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=new_tokens,
+                min_new_tokens=new_tokens,
+                do_sample=False
+            )
+            best = max(best, new_tokens / (time.perf_counter() - start))
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", help="Model name/path (default: tiny random model)")
+    parser.add_argument("--hidden-size", type=int, default=512)
+    parser.add_argument("--layers", type=int, default=8)
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.model:
+        reference = AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32, trust_remote_code=True)
+        tokenizer = AutoTokenizer.from_pretrained(args.model, trust_remote_code=True)
+    else:
+        reference, tokenizer = build_tiny_model(hidden_size=args.hidden_size, num_layers=args.layers)
+    input_ids = tokenizer(PROMPT, return_tensors="pt")['input_ids']
+
+    print("="*60)
+    print(f"SERVING MODES ({args.new_tokens} new tokens, batch 1)")
+    print("="*60)
+    baseline = None
+    for label, device, dtype, quantization in MODES:
+        if device == "cuda" and not torch.cuda.is_available():
+            continue
+
+        model = prepare_model(copy.deepcopy(reference).to(dtype), device, quantization)
+        memory_mb = model_memory_bytes(model) / 1024**2
+        speed = tokens_per_sec(model, input_ids, args.new_tokens, args.repeats)
+        baseline = baseline or speed
+        print(f"{label:>10}: {memory_mb:9.1f} MB  {speed:8.1f} tok/s  ({speed / baseline:.2f}x)")
+        del model
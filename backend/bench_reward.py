@@ -0,0 +1,209 @@
+"""
+Reward Model Scoring Benchmark
+Score latency of TfidfRewardModel.score() as the feedback history grows.
+The centroid model does one transform and two dot products per call, so it
+should stay flat; the previous implementation (a TfidfVectorizer fit on the
+examples, re-transforming every example and averaging a cosine row per
+call) is timed alongside up to --legacy-max examples, and both scores are
+compared.
+
+--batch N instead times scoring N responses with a score() loop, one
+score_batch() call and score_batch(processes=P), and checks they agree.
+
+--knn instead builds the KNNRewardModel index over --sizes rated responses
+(added in chunks, as the live model would) and reports recall@k of the IVF
+search against an exact scan of the same embeddings, with per-query latency,
+for each --probes setting.
+
+Synthetic responses are random 30-word samples of the dataset.json answers.
+
+Usage:
+    python bench_reward.py --sizes 100 1000 10000 100000 1000000
+    python bench_reward.py --batch 200000 --processes 2 4
+    python bench_reward.py --knn --sizes 10000 100000 1000000 --probes 4 16 64
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from reward_model import TfidfRewardModel, KNNRewardModel
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dataset.json")
+
+def synthetic_responses(count, seed=0, words_per_response=30):
+    with open(DATASET_PATH, 'r', encoding='utf-8') as f:
+        words = np.array(" ".join(item['output'] for item in json.load(f)).split())
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(words), size=(count, words_per_response))
+    return [" ".join(row) for row in words[picks]]
+
+class LegacyModel:
+    """The per-call algorithm RewardModel.score() used before centroids"""
+    def __init__(self, good_examples, bad_examples):
+        self.vectorizer = TfidfVectorizer().fit(good_examples + bad_examples)
+        self.good_examples = good_examples
+        self.bad_examples = bad_examples
+
+    def score(self, response):
+        response_vec = self.vectorizer.transform([response])
+        good = cosine_similarity(response_vec, self.vectorizer.transform(self.good_examples)).mean()
+        bad = cosine_similarity(response_vec, self.vectorizer.transform(self.bad_examples)).mean()
+        return np.clip((good - bad + 1) / 2, 0, 1)
+
+def fitted_model(good_examples, bad_examples):
+    """TfidfRewardModel with the examples folded in as one batch of 5 / 1 ratings"""
+    model = TfidfRewardModel()
+    model.update_batch(good_examples + bad_examples, [5] * len(good_examples) + [1] * len(bad_examples))
+    return model
+
+def time_calls(fn, queries, min_calls):
+    calls = max(min_calls, len(queries))
+    times = []
+    for i in range(calls):
+        start = time.perf_counter()
+        fn(queries[i % len(queries)])
+        times.append(time.perf_counter() - start)
+    return np.median(times) * 1e6
+
+def bench_batch(args):
+    examples = synthetic_responses(10000, seed=2)
+    model = fitted_model(examples[:5000], examples[5000:])
+    responses = synthetic_responses(args.batch, seed=3)
+
+    start = time.perf_counter()
+    loop_scores = np.array([model.score(r) for r in responses])
+    loop_seconds = time.perf_counter() - start
+    legacy_model = LegacyModel(examples[:5000], examples[5000:])
+    legacy = np.array([legacy_model.score(r) for r in responses[:20]])
+
+    rows = [("score() loop", loop_seconds, 0.0)]
+    start = time.perf_counter()
+    batch_scores = model.score_batch(responses)
+    rows.append(("score_batch()", time.perf_counter() - start, float(np.abs(batch_scores - loop_scores).max())))
+    for processes in args.processes:
+        start = time.perf_counter()
+        scores = model.score_batch(responses, processes=processes)
+        rows.append((f"processes={processes}", time.perf_counter() - start, float(np.abs(scores - loop_scores).max())))
+
+    print("="*60)
+    print(f"{args.batch:,} responses, {os.cpu_count()} CPUs; max |diff| vs legacy (20): "
+          f"{np.abs(legacy - batch_scores[:20]).max():.1e}")
+    print("="*60)
+    print(f"{'mode':<16} {'seconds':>9} {'responses/s':>13} {'max |diff|':>11}")
+    for name, seconds, diff in rows:
+        print(f"{name:<16} {seconds:>9.2f} {args.batch / seconds:>13,.0f} {diff:>11.1e}")
+
+def bench_knn(args, k=10, chunk_size=10000):
+    model = KNNRewardModel()
+    queries = model.embed(model.vectorizer.transform(synthetic_responses(args.queries, seed=1)))
+    embeddings = []
+    results = []
+    added = 0
+    add_seconds = 0.0
+    for size in sorted(args.sizes):
+        while added < size:
+            count = min(chunk_size, size - added)
+            vectors = model.embed(model.vectorizer.transform(synthetic_responses(count, seed=100 + added)))
+            start = time.perf_counter()
+            model.index.add(vectors)
+            add_seconds += time.perf_counter() - start
+            embeddings.append(vectors)
+            added += count
+        model.index.wait()  # Measure the index as it is once background training is done
+        matrix = np.concatenate(embeddings)
+        embeddings = [matrix]
+
+        exact_times = []
+        exact_ids = []
+        for query in queries:
+            start = time.perf_counter()
+            sims = matrix @ query
+            top = np.argpartition(-sims, k - 1)[:k]
+            exact_ids.append(set(top[np.argsort(-sims[top])]))
+            exact_times.append(time.perf_counter() - start)
+
+        row = {
+            'items': size,
+            'lists': model.index.stats()['lists'],
+            'add_us_per_item': round(add_seconds / added * 1e6, 2),
+            'exact_ms': round(float(np.median(exact_times)) * 1000, 3),
+            'probes': {},
+        }
+        for n_probe in args.probes:
+            model.index.n_probe = n_probe
+            times = []
+            hits = 0
+            for query, expected in zip(queries, exact_ids):
+                start = time.perf_counter()
+                _, ids = model.index.search(query, k)
+                times.append(time.perf_counter() - start)
+                hits += len(expected & set(ids[0]))
+            row['probes'][n_probe] = {
+                'recall': round(hits / (k * len(queries)), 3),
+                'ms': round(float(np.median(times)) * 1000, 3),
+            }
+        results.append(row)
+        print(f"   {size:,} items done", flush=True)
+
+    print("="*72)
+    print(f"recall@{k} of IVF vs exact search ({len(queries)} queries, {model.index.dim}-d embeddings)")
+    print("="*72)
+    print(f"{'items':>10} {'lists':>6} {'exact ms':>9} " + " ".join(f"{f'probe {p}':>16}" for p in args.probes))
+    for r in results:
+        cells = " ".join(f"{r['probes'][p]['recall']:>7.3f} {r['probes'][p]['ms']:>6.2f}ms" for p in args.probes)
+        print(f"{r['items']:>10,} {r['lists']:>6} {r['exact_ms']:>9.2f} {cells}")
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--legacy-max", type=int, default=10000, help="Largest size to time the old scorer at")
+    parser.add_argument("--batch", type=int, help="Benchmark batch scoring of this many responses instead")
+    parser.add_argument("--processes", type=int, nargs="*", default=[2])
+    parser.add_argument("--knn", action="store_true", help="Benchmark the kNN index (recall and latency) instead")
+    parser.add_argument("--probes", type=int, nargs="+", default=[4, 16, 64])
+    args = parser.parse_args()
+
+    if args.batch:
+        bench_batch(args)
+        raise SystemExit(0)
+    if args.knn:
+        bench_knn(args)
+        raise SystemExit(0)
+
+    queries = synthetic_responses(args.queries, seed=1)
+    pool = synthetic_responses(max(args.sizes), seed=2)
+
+    results = []
+    for size in args.sizes:
+        start = time.perf_counter()
+        model = fitted_model(pool[:size // 2], pool[size // 2:size])
+        fit_seconds = time.perf_counter() - start
+
+        row = {
+            'examples': size,
+            'fit_seconds': round(fit_seconds, 2),
+            'score_us': round(time_calls(model.score, queries, args.queries), 1),
+            'legacy_score_us': None,
+            'max_abs_diff': None,
+        }
+        if size <= args.legacy_max:
+            legacy_model = LegacyModel(pool[:size // 2], pool[size // 2:size])
+            legacy_queries = queries[:max(5, args.queries * 100 // size)]
+            row['legacy_score_us'] = round(time_calls(legacy_model.score, legacy_queries, 5), 1)
+            row['max_abs_diff'] = float(max(abs(model.score(q) - legacy_model.score(q)) for q in legacy_queries))
+        results.append(row)
+        print(f"   {size:,} examples done", flush=True)
+
+    print("="*76)
+    print(f"{'examples':>10} {'fit s':>8} {'score (centroid)':>17} {'score (legacy)':>15} {'max |diff|':>11}")
+    print("="*76)
+    for r in results:
+        legacy = f"{r['legacy_score_us']:>13,.0f}us" if r['legacy_score_us'] is not None else f"{'-':>15}"
+        diff = f"{r['max_abs_diff']:>11.1e}" if r['max_abs_diff'] is not None else f"{'-':>11}"
+        print(f"{r['examples']:>10,} {r['fit_seconds']:>8} {r['score_us']:>15.1f}us {legacy} {diff}")
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,120 @@
+"""
+Speculative Decoding Benchmark
+Measures draft-token acceptance rate and end-to-end speedup of assisted
+generation vs plain decoding, using tiny stand-in models on CPU.
+
+The default draft is a truncated copy of the target (shared embeddings,
+first --draft-layers blocks, shared head). Random weights don't give a
+trained model's draft/target agreement, so the target's deeper blocks are
+scaled by --residual-scale to act as a small correction on top of the
+draft, the way a distilled draft tracks its teacher. --draft self gives
+the 100% acceptance upper bound; --draft random the no-agreement floor.
+"""
+import argparse
+import copy
+import time
+import torch
+from model_loader import configure_draft
+from tiny_model import build_tiny_model
+
+PROMPTS = [
+    "Instruct: What is compound interest?\nOutput:",
+    "Instruct: How much should I save for retirement?\nOutput:",
+    "Instruct: Explain portfolio diversification\nOutput:",
+]
+
+class ForwardCounter:
+    """Counts forward calls of a model via a hook"""
+    def __init__(self, model):
+        self.calls = 0
+        self.handle = model.register_forward_hook(self._hook)
+
+    def _hook(self, module, inputs, output):
+        self.calls += 1
+
+def damp_deep_layers(target, num_layers, scale):
+    """Shrink the residual contribution of blocks beyond the draft's depth"""
+    with torch.no_grad():
+        for layer in target.model.layers[num_layers:]:
+            layer.self_attn.dense.weight.mul_(scale)
+            layer.mlp.fc2.weight.mul_(scale)
+
+def truncated_draft(target, num_layers):
+    draft = copy.deepcopy(target)
+    draft.model.layers = draft.model.layers[:num_layers]
+    draft.config.num_hidden_layers = num_layers
+    return draft
+
+def run(target, tokenizer, draft, new_tokens):
+    """Returns (seconds, generated token ids per prompt, target calls, draft calls)"""
+    target_counter = ForwardCounter(target)
+    draft_counter = ForwardCounter(draft) if draft is not None else None
+    outputs = []
+
+    start = time.perf_counter()
+    with torch.no_grad():
+        for prompt in PROMPTS:
+            inputs = tokenizer(prompt, return_tensors="pt")
+            kwargs = {'assistant_model': draft} if draft is not None else {}
+            output = target.generate(
+                **inputs,
+                max_new_tokens=new_tokens,
+                min_new_tokens=new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.eos_token_id,
+                **kwargs
+            )
+            outputs.append(output[0, inputs['input_ids'].shape[1]:])
+    elapsed = time.perf_counter() - start
+
+    target_counter.handle.remove()
+    draft_calls = 0
+    if draft_counter is not None:
+        draft_counter.handle.remove()
+        draft_calls = draft_counter.calls
+    return elapsed, outputs, target_counter.calls, draft_calls
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hidden-size", type=int, default=512)
+    parser.add_argument("--layers", type=int, default=12)
+    parser.add_argument("--draft", default="truncated", choices=["truncated", "self", "random"])
+    parser.add_argument("--draft-layers", type=int, default=2)
+    parser.add_argument("--residual-scale", type=float, default=0.05)
+    parser.add_argument("--num-assistant-tokens", type=int, default=5)
+    parser.add_argument("--new-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    target, tokenizer = build_tiny_model(hidden_size=args.hidden_size, num_layers=args.layers)
+    if args.draft == "self":
+        draft = copy.deepcopy(target)
+    elif args.draft == "random":
+        draft, _ = build_tiny_model(hidden_size=args.hidden_size // 4, num_layers=args.draft_layers, seed=1)
+    else:
+        damp_deep_layers(target, args.draft_layers, args.residual_scale)
+        draft = truncated_draft(target, args.draft_layers)
+    configure_draft(draft, args.num_assistant_tokens)
+
+    # Warm up both paths once
+    run(target, tokenizer, None, 4)
+    run(target, tokenizer, draft, 4)
+
+    base_time, base_outputs, _, _ = run(target, tokenizer, None, args.new_tokens)
+    spec_time, spec_outputs, target_calls, draft_calls = run(target, tokenizer, draft, args.new_tokens)
+
+    generated = args.new_tokens * len(PROMPTS)
+    # Every verification step yields one token from the target itself;
+    # the rest were accepted draft proposals (one per draft forward).
+    accepted = generated - target_calls
+    acceptance = accepted / draft_calls if draft_calls else 0.0
+    identical = all(torch.equal(a, b) for a, b in zip(base_outputs, spec_outputs))
+
+    print("="*60)
+    print(f"SPECULATIVE DECODING (draft: {args.draft}, k={args.num_assistant_tokens})")
+    print("="*60)
+    print(f"Plain decoding:    {base_time:6.2f}s  {generated / base_time:7.1f} tok/s")
+    print(f"Assisted decoding: {spec_time:6.2f}s  {generated / spec_time:7.1f} tok/s")
+    print(f"Speedup:           {base_time / spec_time:.2f}x")
+    print(f"Acceptance rate:   {acceptance:.1%}  ({accepted} of {draft_calls} draft tokens)")
+    print(f"Tokens per target forward: {generated / target_calls:.2f}")
+    print(f"Greedy outputs identical:  {identical}")
@@ -3,15 +3,18 @@ Chat API with Feedback Collection for RLHF
 """
 import sys
 import os
+import argparse
+import atexit
 
 # 1. Print immediately to confirm the file is running
 print("✅ Python started. Initializing FinBud Server...", flush=True)
 
 # 2. Wrap imports in try/except to catch "Silent" crashes
 try:
-    from flask import Flask, request, jsonify
+    from flask import Flask, request, jsonify, Response, stream_with_context
     from flask_cors import CORS
     import json
+    import time
     import torch
     print("   Libraries imported successfully.", flush=True)
 except ImportError as e:
@@ -27,18 +30,134 @@ except Exception as e:
     print(f"❌ CONFIG ERROR: {e}")
     sys.exit(1)
 
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer
+from peft import PeftModel
+from streaming import stream_generate, sse_stream
+from kv_cache import ConversationKVCache
+from conversation_store import create_conversation_store, make_turn
+from feedback_log import FeedbackLog, InvalidFeedbackError, feedback_record
+from reward_model import load_reward_model
+from decoding import stopping_criteria, trim_at_stop, count_generated, kept_token_count, GenerationResult, StepTimer
+from model_loader import resolve_device, resolve_dtype, prepare_model, load_draft_model, model_memory_collector
+from metrics import REGISTRY, ERRORS, instrument_flask, cache_collector, record_generation
+from model_state import ModelLifecycle, warmup_model
+from inference_pool import InferencePool, QueueFullError, DeadlineExceededError, overload_response
+from multi_adapter import (
+    BASE_ADAPTER, UnknownAdapterError, adapter_base_model, load_multi_adapter_model,
+    resolve_adapter, adapter_kwargs
+)
+from adapter_reload import AdapterReloader, read_adapter_version, check_finite_logits
+from prefork import PreforkServer, process_memory
+from model_registry import load_causal_lm
+import serving_config
 
 app = Flask(__name__)
 CORS(app)
+instrument_flask(app, "rlhf")  # Request metrics + GET /metrics
 
 # Global variables
 model = None
 tokenizer = None
+draft_model = None
+loaded_adapters = []  # Set when SFT and RLHF adapters share one base model
+adapter_aliases = {}  # Public adapter name -> PEFT adapter currently serving it
+retired_adapter = None  # Previous RLHF version, deleted at the next swap
+adapter_version = None  # Published RLHF version in use (see adapter_reload.py)
+
+# The adapter that RLHF training republishes
+RELOADABLE_ADAPTER = next(
+    (name for name, path in config.ADAPTERS.items() if path == config.RLHF_MODEL_PATH), None
+)
+
+MAX_NEW_TOKENS = 200
+
+def assisted_kwargs():
+    """generate() kwargs enabling speculative decoding when a draft model is loaded"""
+    return {'assistant_model': draft_model} if draft_model is not None else {}
+
+def is_adapter(path):
+    return os.path.exists(os.path.join(path, "adapter_config.json"))
+
+def load_adapters(device, dtype):
+    """Attach every configured adapter to a single copy of their base model"""
+    global model, tokenizer, loaded_adapters
+    
+    base_model_name = adapter_base_model(config.BASE_MODEL_PATH)
+    print(f"\n==================================================")
+    print(f"📥 LOADING ADAPTERS: {', '.join(config.ADAPTERS)}")
+    print(f"📂 Base: {base_model_name}")
+    print(f"==================================================", flush=True)
+    
+    tokenizer = AutoTokenizer.from_pretrained(config.BASE_MODEL_PATH, trust_remote_code=True)
+    tokenizer.pad_token = tokenizer.eos_token
+    model, loaded_adapters = load_multi_adapter_model(base_model_name, config.ADAPTERS, dtype=dtype)
+    model = prepare_model(model, device, serving_config.QUANTIZATION)
+    print(f"✅ SUCCESS: Model loaded on {model.device}", flush=True)
+
+def select_adapter(requested):
+    """Validate the request's "model" field; None when a single model is loaded"""
+    if not loaded_adapters:
+        if requested:
+            raise UnknownAdapterError(f"Unknown model '{requested}'. Only one model is loaded")
+        return None
+    default = config.DEFAULT_ADAPTER if config.DEFAULT_ADAPTER in loaded_adapters else loaded_adapters[0]
+    return resolve_adapter(requested, loaded_adapters, default)
+
+def current_model():
+    """The serving model; requests pin it once since a hot reload may replace it"""
+    return model
+
+def peft_adapter(adapter):
+    """PEFT adapter name currently serving a public adapter name"""
+    return adapter_aliases.get(adapter, adapter)
+
+def served_version(adapter):
+    """Published version behind this adapter (None if it isn't reloadable)"""
+    if loaded_adapters and adapter != RELOADABLE_ADAPTER:
+        return None
+    return adapter_version
+
+def model_name(adapter):
+    """Name reported back to clients in the "model" field"""
+    if adapter is None:
+        return 'phi-2'
+    return "base" if adapter == BASE_ADAPTER else adapter
+
+def load_single_model(model_path):
+    """Load tokenizer + model from one folder onto the serving device"""
+    print("   Step 1/2: Loading Tokenizer...", flush=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
+    tokenizer.pad_token = tokenizer.eos_token
+
+    print("   Step 2/2: Loading Model (This takes 1-2 mins)...", flush=True)
+    device = resolve_device()
+    dtype = resolve_dtype(serving_config.DTYPE, device, serving_config.QUANTIZATION)
+    if is_adapter(model_path):
+        # Base weights from the local registry, not the hub name in adapter_config.json
+        model = PeftModel.from_pretrained(load_causal_lm(adapter_base_model(model_path), dtype=dtype), model_path)
+    else:
+        model = load_causal_lm(model_path, dtype=dtype)
+    model = prepare_model(model, device, serving_config.QUANTIZATION)
+    print(f"✅ SUCCESS: Model loaded on {model.device}", flush=True)
+    return model, tokenizer
 
 def load_model_safely():
     """Loads the model with explicit progress updates"""
-    global model, tokenizer
+    global model, tokenizer, draft_model, adapter_version
+    
+    # SFT and RLHF adapters side by side on one base model
+    if all(is_adapter(path) for path in config.ADAPTERS.values()):
+        try:
+            device = resolve_device()
+            load_adapters(device, resolve_dtype(serving_config.DTYPE, device, serving_config.QUANTIZATION))
+            adapter_version = reloader.active_version = read_adapter_version(config.RLHF_MODEL_PATH)
+            if serving_config.SPECULATIVE_DECODING:
+                print(f"   Loading draft model: {serving_config.DRAFT_MODEL_PATH}", flush=True)
+                draft_model = load_draft_model()
+            return
+        except Exception as e:
+            print(f"\n❌ MODEL LOAD FAILED: {str(e)}")
+            raise
     
     # Check which model to use
     if os.path.exists(config.RLHF_MODEL_PATH):
@@ -56,85 +175,471 @@ def load_model_safely():
     if not os.path.exists(model_path) and "/" not in model_path:
         print(f"❌ ERROR: The folder '{model_path}' does not exist.")
         print(f"   Make sure you updated 'rlhf_config.py' correctly.")
-        sys.exit(1)
+        raise FileNotFoundError(f"Model folder '{model_path}' does not exist")
 
     try:
-        print("   Step 1/2: Loading Tokenizer...", flush=True)
-        tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
-        tokenizer.pad_token = tokenizer.eos_token
-
-        print("   Step 2/2: Loading Model (This takes 1-2 mins)...", flush=True)
-        model = AutoModelForCausalLM.from_pretrained(
-            model_path,
-            torch_dtype=torch.float16,
-            device_map="auto",
-            trust_remote_code=True
-        )
-        print(f"✅ SUCCESS: Model loaded on {model.device}", flush=True)
+        model, tokenizer = load_single_model(model_path)
+        if model_path == config.RLHF_MODEL_PATH:
+            adapter_version = reloader.active_version = read_adapter_version(model_path)
+        
+        if serving_config.SPECULATIVE_DECODING:
+            print(f"   Loading draft model: {serving_config.DRAFT_MODEL_PATH}", flush=True)
+            draft_model = load_draft_model()
         
     except Exception as e:
         print(f"\n❌ MODEL LOAD FAILED: {str(e)}")
-        sys.exit(1)
+        raise
+
+def warmup():
+    """Short generations to warm kernels before reporting ready"""
+    warmup_model(
+        model,
+        tokenizer,
+        serving_config.WARMUP_PROMPTS,
+        max_new_tokens=serving_config.WARMUP_NEW_TOKENS
+    )
+
+# Loads in the background so the server answers probes while starting
+lifecycle = ModelLifecycle(load_model_safely, warmup)
+
+def load_rlhf_candidate(path, version):
+    """Load a newly published RLHF version next to the serving model"""
+    if loaded_adapters:
+        name = f"{RELOADABLE_ADAPTER}@{version}"
+        model.load_adapter(path, adapter_name=name)
+        return name
+    return load_single_model(path)[0]
+
+def warmup_rlhf_candidate(candidate):
+    """Reject non-finite weights, then warm the candidate up like at startup"""
+    if loaded_adapters:
+        target, kwargs = model, adapter_kwargs([candidate])
+    else:
+        target, kwargs = candidate, {}
+    check_finite_logits(target, tokenizer, serving_config.WARMUP_PROMPTS[0], **kwargs)
+    warmup_model(
+        target,
+        tokenizer,
+        serving_config.WARMUP_PROMPTS,
+        max_new_tokens=serving_config.WARMUP_NEW_TOKENS,
+        **kwargs
+    )
+
+def swap_rlhf(candidate, version):
+    """Point new requests at the candidate (a single reference assignment)"""
+    global model, retired_adapter, adapter_version
+    if loaded_adapters:
+        # Requests that started on the replaced version may still be running,
+        # so it stays resident until the next swap
+        if retired_adapter is not None:
+            model.delete_adapter(retired_adapter)
+        retired_adapter = peft_adapter(RELOADABLE_ADAPTER)
+        adapter_aliases[RELOADABLE_ADAPTER] = candidate
+    else:
+        model = candidate
+    adapter_version = version
+
+def discard_rlhf(candidate):
+    if loaded_adapters:
+        model.delete_adapter(candidate)
+
+reloader = AdapterReloader(
+    config.RLHF_MODEL_PATH,
+    load_rlhf_candidate,
+    warmup_rlhf_candidate,
+    swap_rlhf,
+    discard_rlhf,
+    interval=serving_config.ADAPTER_RELOAD_INTERVAL_SECONDS,
+    is_ready=lifecycle.is_ready
+)
 
-# In-memory storage for conversation IDs
-conversations = {}
+# Turns of live conversations (bounded), for follow-ups and feedback joins
+conversations = create_conversation_store(
+    serving_config.CONVERSATION_STORE,
+    path=serving_config.CONVERSATION_STORE_PATH,
+    max_entries=serving_config.CONVERSATION_MAX_ENTRIES,
+    ttl_seconds=serving_config.CONVERSATION_TTL_SECONDS,
+    max_turns=serving_config.CONVERSATION_MAX_TURNS
+)
+
+# Ratings go to an append-only log via a background writer
+feedback_log = FeedbackLog(
+    config.FEEDBACK_LOG_PATH,
+    max_batch=config.FEEDBACK_MAX_BATCH,
+    flush_interval=config.FEEDBACK_FLUSH_INTERVAL_SECONDS,
+    max_pending=config.FEEDBACK_MAX_PENDING
+)
+atexit.register(feedback_log.close)
+
+# Reward model that folds each rating in as it arrives (REWARD_SCORING picks
+# TF-IDF centroid, hashed centroid or kNN scoring). Starts from the last snapshot saved by
+# reward_model.py or rlhf_trainer.py and catches up with the log; the server
+# never saves it, so the snapshot stays consistent with its checkpoint.
+# With --workers the catch-up happens before forking and each worker then
+# only sees the ratings it received itself (until the next restart).
+reward_model = load_reward_model(config.REWARD_SCORING)
+reward_model.update_from_log(config.FEEDBACK_LOG_PATH)
+
+# Past-key-values of live conversations, so follow-ups only prefill the new turn
+kv_cache = ConversationKVCache(
+    max_bytes=serving_config.KV_CACHE_MAX_BYTES,
+    max_entries=serving_config.KV_CACHE_MAX_ENTRIES
+)
+
+def create_pool():
+    """Bounded worker pool: generate() never runs on more than INFERENCE_WORKERS threads"""
+    return InferencePool(
+        max_workers=serving_config.INFERENCE_WORKERS,
+        max_queue=serving_config.MAX_QUEUE,
+        timeout=serving_config.REQUEST_TIMEOUT_SECONDS
+    )
+
+pool = create_pool()
+
+REGISTRY.register_collector(cache_collector("kv", kv_cache.stats))
+REGISTRY.register_collector(model_memory_collector(lambda: {'finance': model, 'draft': draft_model}))
+
+def build_history_prompt(conversation):
+    """Re-create the prompt text of all previous turns (used on a cache miss)"""
+    if conversation is None:
+        return ""
+    return "".join(
+        f"Instruct: {turn['question']}\nOutput: {turn['answer']}\n"
+        for turn in conversation['turns']
+    )
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    """Chat endpoint"""
-    global model, tokenizer
-    
-    if model is None:
-        return jsonify({'error': 'Model is loading...'}), 503
+    """Chat endpoint (pass conversation_id to continue a conversation)"""
+    if not lifecycle.is_ready():
+        return jsonify({'error': 'Model is loading...', 'state': lifecycle.state}), 503
 
     data = request.get_json()
     question = data.get('question', '').strip()
+    conv_id = data.get('conversation_id')
+    conversation = conversations.get(conv_id) if conv_id is not None else None
     
     print(f"💬 User: {question}")
     
     try:
-        prompt = f"Instruct: {question}\nOutput:"
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+        # A conversation stays on its adapter unless the request names another
+        if conversation is not None and not data.get('model'):
+            adapter = conversation.get('adapter')
+        else:
+            adapter = select_adapter(data.get('model'))
+        
+        # Pin the weights for this request; a hot reload only affects later ones
+        model = current_model()
+        peft_name = peft_adapter(adapter)
+        version = served_version(adapter)
         
-        with torch.no_grad():
-            outputs = model.generate(
-                **inputs,
-                max_new_tokens=200,
-                do_sample=True,
-                temperature=0.7,
-                top_p=0.9
-            )
+        turn_prompt = f"Instruct: {question}\nOutput:"
+        tokenize_start = time.perf_counter()
         
-        response_text = tokenizer.decode(outputs[0][inputs['input_ids'].shape[1]:], skip_special_tokens=True)
+        cached = kv_cache.take(conv_id) if conversation is not None else None
+        if cached is not None and (conversation.get('adapter'), conversation.get('adapter_version')) != (adapter, version):
+            # Another adapter's (or version's) keys/values can't be reused
+            cached = None
+        if cached is not None:
+            # Cache hit: only the new turn needs a prefill
+            turn_ids = tokenizer("\n" + turn_prompt, return_tensors="pt")['input_ids'].to(model.device)
+            input_ids = torch.cat([cached.input_ids, turn_ids], dim=1)
+            past_key_values = cached.past_key_values
+        else:
+            prompt = build_history_prompt(conversation) + turn_prompt
+            input_ids = tokenizer(prompt, return_tensors="pt")['input_ids'].to(model.device)
+            past_key_values = None
         
-        # Save ID for feedback
-        conv_id = len(conversations) + 1
-        conversations[conv_id] = {"question": question}
+        if input_ids.shape[1] > serving_config.MAX_CONTEXT_TOKENS:
+            # History no longer fits: answer the question on its own
+            input_ids = tokenizer(turn_prompt, return_tensors="pt")['input_ids'].to(model.device)
+            past_key_values = None
+        tokenize_seconds = time.perf_counter() - tokenize_start
+        prefill_tokens = input_ids.shape[1] - (past_key_values.get_seq_length() if past_key_values is not None else 0)
+        
+        timer = StepTimer()
+        def run_generate():
+            timer.start()
+            with torch.no_grad():
+                return model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=past_key_values,
+                    max_new_tokens=MAX_NEW_TOKENS,
+                    do_sample=True,
+                    temperature=0.7,
+                    top_p=0.9,
+                    pad_token_id=tokenizer.eos_token_id,
+                    stopping_criteria=stopping_criteria(tokenizer, serving_config.STOP_STRINGS, input_ids.shape[1], timer),
+                    return_dict_in_generate=True,
+                    **adapter_kwargs([peft_name]),
+                    **assisted_kwargs()
+                )
+        
+        try:
+            outputs = pool.submit(run_generate)
+        except QueueFullError:
+            # Never started, so the cached state is untouched
+            if cached is not None:
+                kv_cache.put(conv_id, cached.input_ids, cached.past_key_values)
+            raise
+        generated_at = time.perf_counter()
+        
+        sequences = outputs.sequences
+        past_key_values = outputs.past_key_values
+        new_tokens = sequences[0][input_ids.shape[1]:]
+        response_text = tokenizer.decode(new_tokens, skip_special_tokens=True)
+        first_token_at = timer.first_token_at or generated_at
+        timings = {
+            'tokenize': tokenize_seconds,
+            'prefill': first_token_at - timer.started_at,
+            'decode': generated_at - first_token_at,
+            'detokenize': time.perf_counter() - generated_at,
+        }
+        record_generation(**timings, prompt_tokens=prefill_tokens, generated_tokens=len(new_tokens))
+        response_text, stopped = trim_at_stop(response_text, serving_config.STOP_STRINGS)
+        result = GenerationResult(
+            response_text,
+            count_generated(new_tokens, tokenizer.eos_token_id),
+            MAX_NEW_TOKENS,
+            stopped
+        )
+        
+        if stopped:
+            # Drop the stop string's tokens so the next turn continues cleanly
+            kept = input_ids.shape[1] + kept_token_count(tokenizer, new_tokens, response_text)
+            sequences = sequences[:, :kept]
+            extra = past_key_values.get_seq_length() - (kept - 1)
+            if extra > 0:
+                past_key_values.crop(-extra)
+        
+        # Save the turn for follow-ups and feedback
+        turn = make_turn(
+            question, response_text, model_name(adapter), version,
+            {stage: round(seconds, 4) for stage, seconds in timings.items()}
+        )
+        turn_number = conversations.append(conv_id, turn, adapter) if conversation is not None else None
+        if turn_number is None:
+            # New conversation (or the old one expired mid-request)
+            history_lost = conversation is not None
+            conv_id, turn_number = conversations.create(turn, adapter)
+        else:
+            history_lost = False
+        
+        # The cache covers every token except the last sampled one
+        if not history_lost:
+            kv_cache.put(conv_id, sequences, past_key_values)
         
         print(f"🤖 AI: {response_text[:50]}...")
         
         return jsonify({
             'conversation_id': conv_id,
+            'turn': turn_number,
             'answer': response_text,
-            'model': 'phi-2'
+            'model': model_name(adapter),
+            'adapter_version': version,
+            'kv_cache_hit': cached is not None,
+            **result.metadata()
         })
         
+    except UnknownAdapterError as e:
+        return jsonify({'error': str(e)}), 400
+    except (QueueFullError, DeadlineExceededError) as e:
+        print(f"⏳ Overloaded: {e}")
+        return overload_response(e)
     except Exception as e:
         print(f"❌ Error: {e}")
+        ERRORS.labels("chat", type(e).__name__).inc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming chat endpoint (Server-Sent Events)"""
+    if not lifecycle.is_ready():
+        return jsonify({'error': 'Model is loading...', 'state': lifecycle.state}), 503
+
+    data = request.get_json()
+    question = data.get('question', '').strip()
+    
+    print(f"💬 User (stream): {question}")
+    
+    try:
+        adapter = select_adapter(data.get('model'))
+    except UnknownAdapterError as e:
+        return jsonify({'error': str(e)}), 400
+    version = served_version(adapter)
+    
+    prompt = f"Instruct: {question}\nOutput:"
+    try:
+        chunks = stream_generate(
+            current_model(),
+            tokenizer,
+            prompt,
+            pool=pool,
+            stop_strings=serving_config.STOP_STRINGS,
+            max_new_tokens=MAX_NEW_TOKENS,
+            do_sample=True,
+            temperature=0.7,
+            top_p=0.9,
+            **adapter_kwargs([peft_adapter(adapter)]),
+            **assisted_kwargs()
+        )
+    except QueueFullError as e:
+        return overload_response(e)
+    
+    def on_complete(answer, timing):
+        answer = trim_at_stop(answer, serving_config.STOP_STRINGS)[0]
+        
+        # Save the turn for feedback once the full answer exists
+        conv_id, turn_number = conversations.create(
+            make_turn(question, answer, model_name(adapter), version, timing), adapter
+        )
+        print(f"🤖 AI: {answer[:50]}...")
+        return {
+            'conversation_id': conv_id,
+            'turn': turn_number,
+            'answer': answer,
+            'model': model_name(adapter),
+            'adapter_version': version,
+            **timing
+        }
+    
+    return Response(
+        stream_with_context(sse_stream(chunks, on_complete)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/health/live', methods=['GET'])
+def health_live():
+    """Liveness probe: the process is up and serving HTTP"""
+    return jsonify({'status': 'alive', 'state': lifecycle.state})
+
+@app.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    """Readiness probe: 200 only once the model is loaded and warmed up"""
+    snapshot = {
+        **lifecycle.snapshot(),
+        'adapters': loaded_adapters,
+        'adapter_version': adapter_version,
+        'adapter_reload': reloader.snapshot()
+    }
+    return jsonify(snapshot), 200 if lifecycle.is_ready() else 503
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Queue depth / wait time (for autoscaling) and KV cache statistics"""
+    result = {
+        'queue': pool.stats.snapshot(),
+        'kv_cache': kv_cache.stats(),
+        'conversations': conversations.stats(),
+        'feedback': feedback_log.stats(),
+        'reward_model': reward_model.stats()
+    }
+    if os.path.exists("/proc/self/smaps_rollup"):
+        # Per process: with --workers, shared_mb is the copy-on-write weights
+        result['process'] = {'pid': os.getpid(), **process_memory()}
+    return jsonify(result)
+
+@app.route('/api/kv_cache/stats', methods=['GET'])
+def kv_cache_stats():
+    """Hit/miss and memory statistics for the conversation KV cache"""
+    return jsonify(kv_cache.stats())
+
 @app.route('/api/feedback', methods=['POST'])
 def feedback():
-    """Receive user rating"""
+    """Receive user rating (conversation_id + optional turn, default the latest)"""
+    try:
+        record, response = feedback_record(request.get_json(silent=True), conversations)
+    except InvalidFeedbackError as e:
+        return jsonify({'error': str(e)}), e.status
+    rating = record['rating']
+    if not feedback_log.append(record):
+        return jsonify({'error': 'Feedback queue is full, please retry'}), 503
+    reward_model.update(record['response'], rating)
+    
+    print(f"⭐ Feedback Received: {rating} Stars"
+          + (f" for {response['model']} turn {response['turn']}" if response else ""))
+    return jsonify({'status': 'success', 'response': response})
+
+@app.route('/api/reward/score', methods=['POST'])
+def reward_score():
+    """Score {"response": str} or {"responses": [str, ...]} with the live reward model"""
     data = request.get_json()
-    print(f"⭐ Feedback Received: {data.get('rating')} Stars")
-    return jsonify({'status': 'success'})
+    responses = data.get('responses')
+    if responses is None and isinstance(data.get('response'), str):
+        responses = [data['response']]
+    if not isinstance(responses, list) or not all(isinstance(r, str) for r in responses):
+        return jsonify({'error': 'response (string) or responses (list of strings) required'}), 400
+    
+    scores = reward_model.score_batch(responses) if responses else []
+    return jsonify({'scores': [float(s) for s in scores], 'reward_model': reward_model.stats()})
+
+def preload():
+    """Supervisor side of --workers: load and warm up once, before forking"""
+    lifecycle.run_sync()
+    if not lifecycle.is_ready():
+        raise RuntimeError(f"Model failed to load: {lifecycle.error}")
+
+def start_worker():
+    """Runs in each forked worker: threads don't survive fork, so start them here"""
+    global pool
+    pool = create_pool()
+    if not serving_config.ADAPTER_RELOAD:
+        return
+    if loaded_adapters:
+        # Each worker loads only the small LoRA weights; the base stays shared
+        reloader.start()
+    elif os.environ.get("FINBUD_WORKER") == "0":
+        print("⚠️  Hot reload is off with --workers on a single-model load (each worker would "
+              "hold its own full copy); restart the server to pick up new versions", flush=True)
+
+def serve_workers(workers, host='0.0.0.0', port=5000):
+    """
+    Load the model once and fork `workers` processes that share its weights
+    copy-on-write. The KV cache lives in each worker. Conversations always
+    go to the SQLite store: a follow-up or rating is served by whichever
+    worker accepts it. Hot reload only runs when the RLHF model
+    is served as an adapter (each worker then loads the new LoRA weights
+    next to the shared base); a single merged model needs a restart.
+    """
+    global conversations
+    if serving_config.CONVERSATION_STORE == "memory":
+        print(f"⚠️  CONVERSATION_STORE \"memory\" is per process, so with --workers follow-ups and "
+              f"ratings would 404 on other workers; using sqlite at {serving_config.CONVERSATION_STORE_PATH}")
+        conversations = create_conversation_store(
+            "sqlite",
+            path=serving_config.CONVERSATION_STORE_PATH,
+            ttl_seconds=serving_config.CONVERSATION_TTL_SECONDS,
+            max_turns=serving_config.CONVERSATION_MAX_TURNS
+        )
+    PreforkServer(
+        app, host, port, workers,
+        preload=preload,
+        worker_init=start_worker,
+        threads_per_worker=serving_config.THREADS_PER_WORKER
+    ).serve_forever()
 
 if __name__ == '__main__':
-    load_model_safely()
+    parser = argparse.ArgumentParser(description="FinBud RLHF chat server")
+    parser.add_argument("--workers", type=int, default=serving_config.WORKERS,
+                        help="Forked worker processes sharing one copy of the weights (CPU)")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    
+    if args.workers > 1:
+        serve_workers(args.workers, port=args.port)
+        sys.exit(0)
+    
+    # Load model in the background; /api/health/ready turns 200 when done
+    lifecycle.start()
+    
+    # Pick up adapters published by rlhf_trainer.py without a restart
+    if serving_config.ADAPTER_RELOAD:
+        reloader.start()
     
     print("\n" + "="*60)
-    print("🚀 SERVER STARTED: http://localhost:5000")
+    print(f"🚀 SERVER STARTED: http://localhost:{args.port}")
     print("="*60 + "\n", flush=True)
     
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=args.port, debug=False)
\ No newline at end of file
@@ -0,0 +1,379 @@
+"""
+Conversation Store
+Bounded, thread-safe storage of chat turns (question, answer, model version,
+timings) keyed by conversation id, so /api/feedback can join a rating to the
+exact response it rates.
+
+MemoryConversationStore: per-process LRU with TTL and a per-conversation
+turn limit. SQLiteConversationStore: one file shared by forked workers that
+survives restarts, with old conversations purged by TTL.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+ID_EPOCH_MS = 1704067200000  # 2024-01-01
+WORKER_BITS = 6
+SEQUENCE_BITS = 7
+
+class IdGenerator:
+    """
+    Monotonic unique ids: milliseconds since ID_EPOCH_MS (40 bits) | worker
+    (6 bits) | sequence (7 bits). 53 bits, so ids stay exact as JavaScript
+    numbers. The worker part is the pre-fork slot (FINBUD_WORKER) or the pid,
+    re-read after a fork so forked workers never hand out the same ids.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.worker = 0
+        self.last_ms = 0
+        self.sequence = 0
+
+    def next(self):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.worker = int(os.environ.get("FINBUD_WORKER", self.pid)) % (1 << WORKER_BITS)
+                self.last_ms = 0
+                self.sequence = 0
+
+            # Never go backwards, even if the wall clock does
+            now_ms = max(int(time.time() * 1000) - ID_EPOCH_MS, self.last_ms)
+            if now_ms == self.last_ms:
+                self.sequence += 1
+                if self.sequence >= 1 << SEQUENCE_BITS:
+                    now_ms += 1  # Borrow from the next millisecond
+                    self.sequence = 0
+            else:
+                self.sequence = 0
+            self.last_ms = now_ms
+            return (now_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker << SEQUENCE_BITS) | self.sequence
+
+def make_turn(question, answer, model=None, adapter_version=None, timings=None):
+    return {
+        'question': question,
+        'answer': answer,
+        'model': model,
+        'adapter_version': adapter_version,
+        'timings': timings or {},
+        'created_at': time.time(),
+    }
+
+def _check_turn(turn):
+    if turn is not None and (isinstance(turn, bool) or not isinstance(turn, int)):
+        raise TypeError(f"turn must be an int or None, not {type(turn).__name__}")
+
+class MemoryConversationStore:
+    """
+    LRU of conversation id -> {adapter, adapter_version, model, created_at,
+    updated_at, turns}. Holds at most max_entries conversations of at most
+    max_turns turns each, so memory stays flat however long it runs.
+    Turn numbers keep counting when old turns are dropped.
+    """
+    def __init__(self, max_entries=10000, ttl_seconds=7 * 24 * 3600, max_turns=20):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.entries = OrderedDict()
+        self.ids = IdGenerator()
+        self.lock = threading.Lock()
+
+        self.created = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def create(self, turn, adapter=None):
+        """Start a conversation with its first turn; returns (id, turn number)"""
+        conv_id = self.ids.next()
+        now = time.time()
+        conversation = {
+            'adapter': adapter,
+            'adapter_version': turn['adapter_version'],
+            'model': turn['model'],
+            'created_at': now,
+            'updated_at': now,
+            'first_turn': 0,
+            'turns': [turn],
+        }
+        with self.lock:
+            self.entries[conv_id] = conversation
+            self.created += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return conv_id, 0
+
+    def append(self, conv_id, turn, adapter=None):
+        """Add a turn; returns its turn number (None if the conversation is gone)"""
+        with self.lock:
+            conversation = self._live(conv_id)
+            if conversation is None:
+                return None
+            conversation['turns'].append(turn)
+            if len(conversation['turns']) > self.max_turns:
+                conversation['turns'].pop(0)
+                conversation['first_turn'] += 1
+            conversation.update(
+                adapter=adapter,
+                adapter_version=turn['adapter_version'],
+                model=turn['model'],
+                updated_at=time.time()
+            )
+            self.entries.move_to_end(conv_id)
+            return conversation['first_turn'] + len(conversation['turns']) - 1
+
+    def get(self, conv_id):
+        """Conversation dict (a copy) or None"""
+        with self.lock:
+            conversation = self._live(conv_id)
+            if conversation is None:
+                return None
+            self.entries.move_to_end(conv_id)
+            return {**conversation, 'turns': list(conversation['turns'])}
+
+    def get_turn(self, conv_id, turn=None):
+        """One turn (default: the latest) with its conversation's id and adapter, or None"""
+        _check_turn(turn)
+        with self.lock:
+            conversation = self._live(conv_id)
+            if conversation is None:
+                return None
+            index = len(conversation['turns']) - 1 if turn is None else turn - conversation['first_turn']
+            if not 0 <= index < len(conversation['turns']):
+                return None
+            return {
+                **conversation['turns'][index],
+                'conversation_id': conv_id,
+                'turn': conversation['first_turn'] + index,
+                'adapter': conversation['adapter'],
+            }
+
+    def _live(self, conv_id):
+        conversation = self.entries.get(conv_id)
+        if conversation is None:
+            return None
+        if self.ttl_seconds and time.time() - conversation['updated_at'] > self.ttl_seconds:
+            del self.entries[conv_id]
+            self.expirations += 1
+            return None
+        return conversation
+
+    def stats(self):
+        with self.lock:
+            return {
+                'backend': 'memory',
+                'conversations': len(self.entries),
+                'turns': sum(len(c['turns']) for c in self.entries.values()),
+                'max_entries': self.max_entries,
+                'created': self.created,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    adapter TEXT,
+    adapter_version TEXT,
+    model TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    conversation_id INTEGER NOT NULL,
+    turn INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    model TEXT,
+    adapter_version TEXT,
+    timings TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (conversation_id, turn)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated_at);
+"""
+
+class SQLiteConversationStore:
+    """
+    Conversations in a SQLite file (WAL mode). Lookups go through the
+    primary keys; ids come from IdGenerator so workers writing to the same
+    file never collide. Conversations idle for ttl_seconds are purged every
+    purge_every writes, and only the latest max_turns turns are read back
+    for the prompt history. stats() counts rows with full scans, so the
+    counts are reused for stats_ttl seconds (/api/stats and /metrics
+    scrapes); per-process counters would miss the other workers' writes.
+    """
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_turns=20, purge_every=1000, stats_ttl=5.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.purge_every = purge_every
+        self.stats_ttl = stats_ttl
+        self.ids = IdGenerator()
+        self.local = threading.local()
+        self.writes = 0
+        self.counts = None  # (monotonic time, conversations, turns) of the last count
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        """One connection per thread (and per process: connections don't survive fork)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def create(self, turn, adapter=None):
+        conv_id = self.ids.next()
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT INTO conversations VALUES (?, ?, ?, ?, ?, ?)",
+                (conv_id, adapter, turn['adapter_version'], turn['model'], turn['created_at'], turn['created_at'])
+            )
+            self._insert_turn(conn, conv_id, 0, turn)
+        self._after_write()
+        return conv_id, 0
+
+    def append(self, conv_id, turn, adapter=None):
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            updated = conn.execute(
+                "UPDATE conversations SET adapter = ?, adapter_version = ?, model = ?, updated_at = ? "
+                "WHERE id = ? AND updated_at >= ?",
+                (adapter, turn['adapter_version'], turn['model'], turn['created_at'], conv_id, self._cutoff())
+            ).rowcount
+            if not updated:
+                return None
+            number = conn.execute(
+                "SELECT COALESCE(MAX(turn), -1) + 1 FROM turns WHERE conversation_id = ?", (conv_id,)
+            ).fetchone()[0]
+            self._insert_turn(conn, conv_id, number, turn)
+        self._after_write()
+        return number
+
+    def _insert_turn(self, conn, conv_id, number, turn):
+        conn.execute(
+            "INSERT INTO turns VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (conv_id, number, turn['question'], turn['answer'], turn['model'],
+             turn['adapter_version'], json.dumps(turn['timings']), turn['created_at'])
+        )
+
+    def get(self, conv_id):
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT adapter, adapter_version, model, created_at, updated_at FROM conversations "
+            "WHERE id = ? AND updated_at >= ?",
+            (conv_id, self._cutoff())
+        ).fetchone()
+        if row is None:
+            return None
+        turns = conn.execute(
+            "SELECT turn, question, answer, model, adapter_version, timings, created_at FROM turns "
+            "WHERE conversation_id = ? ORDER BY turn DESC LIMIT ?",
+            (conv_id, self.max_turns)
+        ).fetchall()
+        turns.reverse()
+        return {
+            'adapter': row[0],
+            'adapter_version': row[1],
+            'model': row[2],
+            'created_at': row[3],
+            'updated_at': row[4],
+            'first_turn': turns[0][0] if turns else 0,
+            'turns': [self._turn(t) for t in turns],
+        }
+
+    def get_turn(self, conv_id, turn=None):
+        _check_turn(turn)
+        conn = self._connection()
+        query = (
+            "SELECT t.turn, t.question, t.answer, t.model, t.adapter_version, t.timings, t.created_at, c.adapter "
+            "FROM turns t JOIN conversations c ON c.id = t.conversation_id "
+            "WHERE t.conversation_id = ? AND c.updated_at >= ? "
+        )
+        if turn is None:
+            row = conn.execute(query + "ORDER BY t.turn DESC LIMIT 1", (conv_id, self._cutoff())).fetchone()
+        else:
+            row = conn.execute(query + "AND t.turn = ?", (conv_id, self._cutoff(), turn)).fetchone()
+        if row is None:
+            return None
+        return {**self._turn(row), 'conversation_id': conv_id, 'turn': row[0], 'adapter': row[7]}
+
+    @staticmethod
+    def _turn(row):
+        return {
+            'question': row[1],
+            'answer': row[2],
+            'model': row[3],
+            'adapter_version': row[4],
+            'timings': json.loads(row[5]) if row[5] else {},
+            'created_at': row[6],
+        }
+
+    def _cutoff(self):
+        return time.time() - self.ttl_seconds if self.ttl_seconds else 0
+
+    def _after_write(self):
+        with self.lock:
+            self.writes += 1
+            due = self.purge_every and self.writes % self.purge_every == 0
+        if due:
+            self.purge()
+
+    def purge(self):
+        """Delete conversations idle for longer than the TTL; returns how many"""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cutoff = self._cutoff()
+            conn.execute(
+                "DELETE FROM turns WHERE conversation_id IN (SELECT id FROM conversations WHERE updated_at < ?)",
+                (cutoff,)
+            )
+            return conn.execute("DELETE FROM conversations WHERE updated_at < ?", (cutoff,)).rowcount
+
+    def _row_counts(self):
+        with self.lock:
+            counts = self.counts
+        if counts is None or time.monotonic() - counts[0] >= self.stats_ttl:
+            conn = self._connection()
+            counts = (
+                time.monotonic(),
+                conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM turns").fetchone()[0],
+            )
+            with self.lock:
+                self.counts = counts
+        return counts[1:]
+
+    def stats(self):
+        conversations, turns = self._row_counts()
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'conversations': conversations,
+            'turns': turns,
+            'writes': self.writes,
+        }
+
+def create_conversation_store(backend="memory", path=None, max_entries=10000,
+                              ttl_seconds=7 * 24 * 3600, max_turns=20):
+    if backend == "memory":
+        return MemoryConversationStore(max_entries, ttl_seconds, max_turns)
+    if backend == "sqlite":
+        return SQLiteConversationStore(path, ttl_seconds, max_turns)
+    raise ValueError(f"Unknown conversation store backend: {backend}")
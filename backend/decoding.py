@@ -0,0 +1,102 @@
+"""
+Stop-Sequence Aware Decoding
+Halts each sequence in a batch as soon as it produces a stop string
+(e.g. a hallucinated "\\nInstruct:" block) and decodes only new tokens
+"""
+import time
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+class StopOnStrings(StoppingCriteria):
+    """
+    Per-sequence stopping criterion for batched generate().
+
+    Only the tail of each sequence's new tokens is decoded, so the cost per
+    step is independent of how long the answer already is.
+    """
+    def __init__(self, tokenizer, stop_strings, prompt_length):
+        self.tokenizer = tokenizer
+        self.stop_strings = list(stop_strings)
+        self.prompt_length = prompt_length
+        # A stop string can never span more tokens than it has characters
+        self.tail_tokens = max(len(s) for s in self.stop_strings) + 1
+
+    def __call__(self, input_ids, scores, **kwargs):
+        new_tokens = input_ids[:, self.prompt_length:]
+        tails = self.tokenizer.batch_decode(new_tokens[:, -self.tail_tokens:], skip_special_tokens=True)
+        done = [any(stop in tail for stop in self.stop_strings) for tail in tails]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+class StepTimer(StoppingCriteria):
+    """
+    Never stops generation; notes when the first token came out, which
+    splits generate() time into prefill and decode for the metrics
+    """
+    def __init__(self):
+        self.started_at = None
+        self.first_token_at = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+class StopOnEvent(StoppingCriteria):
+    """Stops every sequence once `event` is set (e.g. the client went away)"""
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+def stopping_criteria(tokenizer, stop_strings, prompt_length, timer=None, cancel=None):
+    """StoppingCriteriaList for generate(), or None when there is nothing to check"""
+    criteria = []
+    if stop_strings:
+        criteria.append(StopOnStrings(tokenizer, stop_strings, prompt_length))
+    if timer is not None:
+        criteria.append(timer)
+    if cancel is not None:
+        criteria.append(StopOnEvent(cancel))
+    return StoppingCriteriaList(criteria) if criteria else None
+
+def trim_at_stop(text, stop_strings):
+    """Cut text at the first stop string; returns (text, stopped)"""
+    cut = min((text.find(s) for s in stop_strings if s in text), default=-1)
+    if cut == -1:
+        return text, False
+    return text[:cut], True
+
+def count_generated(new_tokens, pad_token_id):
+    """Number of generated tokens per row, excluding trailing padding"""
+    return (new_tokens != pad_token_id).sum(dim=-1).tolist()
+
+def kept_token_count(tokenizer, new_tokens, answer):
+    """How many leading new tokens decode to (a prefix of) the trimmed answer"""
+    for count in range(len(new_tokens), 0, -1):
+        text = tokenizer.decode(new_tokens[:count], skip_special_tokens=True)
+        if answer.startswith(text):
+            return count
+    return 0
+
+class GenerationResult:
+    """Decoded answer plus token accounting for one request"""
+    def __init__(self, text, generated_tokens, max_new_tokens, stopped=False):
+        self.text = text
+        self.generated_tokens = generated_tokens
+        self.max_new_tokens = max_new_tokens
+        self.stopped = stopped
+
+    @property
+    def tokens_saved(self):
+        return max(self.max_new_tokens - self.generated_tokens, 0)
+
+    def metadata(self):
+        return {
+            'tokens_generated': self.generated_tokens,
+            'tokens_saved': self.tokens_saved,
+            'stopped_on_stop_string': self.stopped,
+        }
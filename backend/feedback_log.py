@@ -0,0 +1,347 @@
+"""
+Feedback Log
+Append-only JSONL log of ratings written by a background thread with group
+commits: records are batched and fsync'ed once per batch, when max_batch
+records are waiting or flush_interval seconds after the oldest one arrived.
+/api/feedback only enqueues, so the request path does no disk I/O.
+
+A crash can leave at most one partial line at the end of the log; recover()
+truncates it on startup. FeedbackReader streams the records appended since a
+checkpointed byte offset, so reward_model.py only processes new feedback
+and rlhf_trainer.py can tell whether there is any. compact() exports the
+log as the JSON array at config.FEEDBACK_DATA_PATH. feedback_record() is
+the /api/feedback validation shared by the Flask and ASGI front ends.
+
+Usage:
+    python feedback_log.py compact    # log -> FEEDBACK_DATA_PATH
+    python feedback_log.py recover
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+def recover(path):
+    """
+    Truncate a torn last line (no trailing newline, or not valid JSON) left
+    by a crash mid-write. Returns the number of bytes removed.
+    """
+    if not os.path.exists(path):
+        return 0
+
+    with open(path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return 0
+        # Walk back to the start of the last line
+        block = min(size, 1024 * 1024)
+        f.seek(size - block)
+        tail = f.read(block)
+        end = size
+        if tail.endswith(b"\n"):
+            last_start = tail.rfind(b"\n", 0, len(tail) - 1) + 1
+            try:
+                json.loads(tail[last_start:])
+                return 0
+            except ValueError:
+                end = size - block + last_start
+        else:
+            end = size - block + tail.rfind(b"\n") + 1
+        f.truncate(end)
+        f.flush()
+        os.fsync(f.fileno())
+    return size - end
+
+def read_log(path):
+    """Yield every complete record in the log (malformed lines are skipped)"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break  # Torn or still being written
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+def load_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+class FeedbackReader:
+    """
+    Streams log records from a byte offset, one line at a time (memory does
+    not grow with the log). read() advances the offset past every complete
+    line it passes, including ones the filters skip; checkpoint() returns the
+    position to store once the consumer has durably used what it read.
+
+    A checkpoint from another file (rotated log) or past the end of the
+    current one (truncated log) is ignored and reading starts over.
+    """
+    def __init__(self, log_path, checkpoint=None):
+        self.log_path = log_path
+        self.offset = 0
+        self.records_read = 0
+        self.inode = self._inode()
+        if checkpoint and checkpoint.get('inode') == self.inode and checkpoint['offset'] <= self._size():
+            self.offset = checkpoint['offset']
+            self.records_read = checkpoint.get('records', 0)
+        elif checkpoint and checkpoint.get('offset'):
+            print(f"⚠️  Feedback checkpoint doesn't match {log_path} (rotated or truncated), reading from the start")
+
+    def _inode(self):
+        return os.stat(self.log_path).st_ino if os.path.exists(self.log_path) else None
+
+    def _size(self):
+        return os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+
+    def read(self, since=None, until=None, min_rating=None, max_rating=None):
+        """
+        Yield new records, optionally only those received in [since, until)
+        (epoch seconds) with a rating in [min_rating, max_rating]
+        """
+        if self.inode is None:
+            return
+        with open(self.log_path, 'rb') as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Still being written; picked up next time
+                self.offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self.records_read += 1
+
+                received_at = record.get('received_at', 0)
+                rating = record.get('rating')
+                if since is not None and received_at < since:
+                    continue
+                if until is not None and received_at >= until:
+                    continue
+                if min_rating is not None and (rating is None or rating < min_rating):
+                    continue
+                if max_rating is not None and (rating is None or rating > max_rating):
+                    continue
+                yield record
+
+    def checkpoint(self):
+        return {
+            'log': self.log_path,
+            'inode': self.inode,
+            'offset': self.offset,
+            'records': self.records_read,
+            'updated_at': time.time(),
+        }
+
+def write_json_atomic(data, path):
+    """Write-fsync-rename so readers only ever see a complete file"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def compact(log_path, output_path):
+    """
+    Rebuild the training dataset from the log. A response rated more than
+    once (same conversation_id and turn) keeps its latest rating. Returns
+    the number of records written.
+    """
+    latest = {}
+    unkeyed = []
+    for record in read_log(log_path):
+        if record.get('conversation_id') is None:
+            unkeyed.append(record)
+        else:
+            latest[(record['conversation_id'], record.get('turn'))] = record
+    records = sorted(unkeyed + list(latest.values()), key=lambda r: r.get('received_at', 0))
+    write_json_atomic(records, output_path)
+    return len(records)
+
+class InvalidFeedbackError(ValueError):
+    """A rejected /api/feedback body; status is the HTTP status to answer with"""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def feedback_record(data, conversations=None):
+    """
+    Validate an /api/feedback body and build its log record. Returns
+    (record, rated turn); the turn is None when the client sent the question
+    and response itself. Without a conversation store every conversation_id
+    is unknown. Raises InvalidFeedbackError.
+    """
+    if not isinstance(data, dict):
+        raise InvalidFeedbackError('JSON object body required')
+    rating = data.get('rating')
+    if isinstance(rating, bool) or not isinstance(rating, (int, float)) or not 1 <= rating <= 5:
+        raise InvalidFeedbackError('rating must be a number from 1 to 5')
+
+    conv_id = data.get('conversation_id')
+    turn = data.get('turn')
+    for name, value in (('conversation_id', conv_id), ('turn', turn)):
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+            raise InvalidFeedbackError(f"{name} must be an integer")
+    response = None
+    if conv_id is not None and conversations is not None:
+        response = conversations.get_turn(conv_id, turn)
+    if conv_id is not None and response is None:
+        raise InvalidFeedbackError(f"Unknown or expired conversation {conv_id}", 404)
+
+    # Without a conversation the client must send the rated question/answer itself
+    source = response or {'question': data.get('question'), 'answer': data.get('response')}
+    if not source['question'] or not source['answer']:
+        raise InvalidFeedbackError('conversation_id (or question and response) required')
+
+    record = {
+        'conversation_id': conv_id,
+        'turn': response['turn'] if response else None,
+        'rating': rating,
+        'question': source['question'],
+        'response': source['answer'],
+        'model': source.get('model'),
+        'adapter_version': source.get('adapter_version'),
+        'comment': data.get('comment'),
+        'received_at': time.time(),
+    }
+    return record, response
+
+class FeedbackLog:
+    """
+    append() queues a record for the writer thread and returns immediately
+    (False if max_pending records are already waiting). The writer starts on
+    first use in each process, so it also works in forked workers; their
+    batches go out as single O_APPEND writes and don't interleave.
+    """
+    def __init__(self, path, max_batch=256, flush_interval=1.0, max_pending=10000):
+        self.path = path
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self.pending = deque()
+        self.cond = threading.Condition()
+        self.thread = None
+        self.pid = None
+        self.closed = False
+        self.flush_requested = False
+
+        self.appended = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.fsync_seconds = 0.0
+        self.recovered_bytes = recover(path)
+        if self.recovered_bytes:
+            print(f"⚠️  Feedback log: dropped a torn record ({self.recovered_bytes} bytes) at the end of {path}")
+
+    def append(self, record):
+        with self.cond:
+            self._ensure_writer()
+            if len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self.pending.append((time.monotonic(), record))
+            self.appended += 1
+            if len(self.pending) == 1 or len(self.pending) >= self.max_batch:
+                self.cond.notify_all()
+        return True
+
+    def _ensure_writer(self):
+        if self.pid != os.getpid() or self.thread is None or not self.thread.is_alive():
+            # Threads don't survive fork: a child starts its own writer
+            if self.pid != os.getpid():
+                self.pending.clear()
+            self.pid = os.getpid()
+            self.closed = False
+            self.thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            while True:
+                with self.cond:
+                    while not self.pending and not self.closed:
+                        self.cond.wait()
+                    if not self.pending:
+                        return
+                    # Group commit: wait for a full batch or the oldest record's deadline
+                    deadline = self.pending[0][0] + self.flush_interval
+                    while len(self.pending) < self.max_batch and not (self.closed or self.flush_requested):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.cond.wait(remaining)
+                    batch = [self.pending.popleft()[1] for _ in range(min(self.max_batch, len(self.pending)))]
+                    if not self.pending:
+                        self.flush_requested = False
+
+                data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch).encode('utf-8')
+                start = time.perf_counter()
+                os.write(fd, data)
+                os.fsync(fd)
+                elapsed = time.perf_counter() - start
+
+                with self.cond:
+                    self.written += len(batch)
+                    self.batches += 1
+                    self.fsync_seconds += elapsed
+                    self.cond.notify_all()
+        finally:
+            os.close(fd)
+
+    def flush(self, timeout=None):
+        """Wait until everything appended so far is on disk"""
+        with self.cond:
+            target = self.appended
+            self.flush_requested = True
+            self.cond.notify_all()
+            return self.cond.wait_for(lambda: self.written >= target, timeout)
+
+    def close(self, timeout=10):
+        """Write out everything still queued and stop the writer"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self.thread is not None and self.pid == os.getpid():
+            self.thread.join(timeout)
+
+    def stats(self):
+        with self.cond:
+            return {
+                'path': self.path,
+                'pending': len(self.pending),
+                'appended': self.appended,
+                'written': self.written,
+                'dropped': self.dropped,
+                'batches': self.batches,
+                'avg_batch': round(self.written / self.batches, 1) if self.batches else 0.0,
+                'avg_fsync_ms': round(self.fsync_seconds / self.batches * 1000, 2) if self.batches else 0.0,
+            }
+
+if __name__ == "__main__":
+    import rlhf_config as config
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "compact"
+    if command == "recover":
+        print(f"✅ Removed {recover(config.FEEDBACK_LOG_PATH)} bytes from {config.FEEDBACK_LOG_PATH}")
+    elif command == "compact":
+        count = compact(config.FEEDBACK_LOG_PATH, config.FEEDBACK_DATA_PATH)
+        print(f"✅ Compacted {count} feedback records into {config.FEEDBACK_DATA_PATH}")
+    else:
+        sys.exit(f"Unknown command: {command} (use compact or recover)")
@@ -0,0 +1,156 @@
+"""
+Inference Admission Control
+Bounded worker pool for model.generate() with a queue limit and
+per-request deadlines, so bursts get a fast 429/503 instead of OOM
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from metrics import QUEUE_WAIT_SECONDS
+
+class QueueFullError(Exception):
+    """Raised when too many requests are already waiting"""
+    def __init__(self, retry_after):
+        super().__init__("Server is busy, please retry later")
+        self.retry_after = retry_after
+
+class DeadlineExceededError(Exception):
+    """Raised when a request could not be served before its deadline"""
+    def __init__(self, retry_after):
+        super().__init__("Request timed out waiting for the model")
+        self.retry_after = retry_after
+
+def overload_response(error):
+    """(body, status, headers) for a QueueFullError / DeadlineExceededError"""
+    status = 429 if isinstance(error, QueueFullError) else 503
+    retry_after = max(1, int(round(error.retry_after)))
+    return (
+        {'error': str(error), 'retry_after': retry_after},
+        status,
+        {'Retry-After': str(retry_after)}
+    )
+
+class QueueStats:
+    """Queue depth and wait-time bookkeeping shared by the pool and the batcher"""
+    def __init__(self, workers, name="inference"):
+        self.workers = workers
+        self.wait_histogram = QUEUE_WAIT_SECONDS.labels(name)
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_service = 0.0
+
+    def record_wait(self, seconds):
+        self.wait_histogram.observe(seconds)
+        with self.lock:
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def record_service(self, seconds):
+        with self.lock:
+            self.total_service += seconds
+            self.completed += 1
+
+    def retry_after(self):
+        """Rough time until the current queue drains"""
+        with self.lock:
+            avg_service = self.total_service / self.completed if self.completed else 1.0
+            return avg_service * (self.queued + self.in_flight) / max(self.workers, 1)
+
+    def snapshot(self):
+        with self.lock:
+            started = self.completed + self.in_flight
+            return {
+                'queue_depth': self.queued,
+                'in_flight': self.in_flight,
+                'workers': self.workers,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'completed': self.completed,
+                'avg_wait': round(self.total_wait / started, 4) if started else 0.0,
+                'max_wait': round(self.max_wait, 4),
+            }
+
+class InferencePool:
+    """
+    Fixed number of worker threads pulling from a bounded queue.
+
+    submit() blocks for the result; start() returns a Future for callers
+    that consume output incrementally (e.g. token streaming).
+    """
+    def __init__(self, max_workers=1, max_queue=32, timeout=60, name="inference"):
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self.stats = QueueStats(max_workers, name)
+        self.threads = []
+        for i in range(max_workers):
+            thread = threading.Thread(target=self._worker, name=f"inference-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def start(self, fn, *args, timeout=None, **kwargs):
+        """Queue fn(*args, **kwargs) and return its Future (raises QueueFullError)"""
+        deadline = time.time() + (timeout or self.timeout)
+        with self.stats.lock:
+            if self.stats.queued >= self.max_queue:
+                self.stats.rejected += 1
+                full = True
+            else:
+                self.stats.queued += 1
+                self.stats.admitted += 1
+                full = False
+        if full:
+            raise QueueFullError(self.stats.retry_after())
+
+        future = Future()
+        self.queue.put((future, fn, args, kwargs, time.time(), deadline))
+        return future
+
+    def submit(self, fn, *args, timeout=None, **kwargs):
+        """Run fn on a worker and wait for its result until the deadline"""
+        timeout = timeout or self.timeout
+        future = self.start(fn, *args, timeout=timeout, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Drop it if it has not started yet; otherwise let it finish unobserved
+            future.cancel()
+            with self.stats.lock:
+                self.stats.timed_out += 1
+            raise DeadlineExceededError(self.stats.retry_after())
+
+    def _worker(self):
+        while True:
+            future, fn, args, kwargs, enqueued_at, deadline = self.queue.get()
+            now = time.time()
+            with self.stats.lock:
+                self.stats.queued -= 1
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            if now > deadline:
+                with self.stats.lock:
+                    self.stats.timed_out += 1
+                future.set_exception(DeadlineExceededError(self.stats.retry_after()))
+                continue
+
+            self.stats.record_wait(now - enqueued_at)
+            with self.stats.lock:
+                self.stats.in_flight += 1
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self.stats.lock:
+                    self.stats.in_flight -= 1
+                self.stats.record_service(time.time() - now)
@@ -0,0 +1,104 @@
+"""
+Per-Conversation KV Cache
+Keeps past-key-values of live conversations so a follow-up turn only
+prefills the new user message. Bounded by bytes, LRU-evicted.
+"""
+import threading
+from collections import OrderedDict
+
+def cache_nbytes(past_key_values):
+    """Bytes held by a transformers cache object or legacy (key, value) tuples"""
+    if past_key_values is None:
+        return 0
+
+    layers = getattr(past_key_values, 'layers', None)
+    if layers is not None:
+        tensors = [t for layer in layers for t in (layer.keys, layer.values) if t is not None]
+    elif hasattr(past_key_values, 'key_cache'):
+        tensors = list(past_key_values.key_cache) + list(past_key_values.value_cache)
+    else:
+        tensors = [t for layer in past_key_values for t in layer]
+
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+class CachedConversation:
+    """Token ids of a conversation so far and the KV cache covering them"""
+    def __init__(self, input_ids, past_key_values):
+        self.input_ids = input_ids
+        self.past_key_values = past_key_values
+        self.nbytes = cache_nbytes(past_key_values) + input_ids.numel() * input_ids.element_size()
+
+class ConversationKVCache:
+    """
+    LRU map of conversation_id -> CachedConversation.
+
+    Entries are taken out while a turn is being generated (so two requests
+    can never extend the same cache at once) and put back afterwards.
+    """
+    def __init__(self, max_bytes, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.bytes_held = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reused_tokens = 0
+
+    def take(self, conv_id):
+        """Remove and return the cached conversation, or None on a miss"""
+        with self.lock:
+            entry = self.entries.pop(conv_id, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.bytes_held -= entry.nbytes
+            self.hits += 1
+            self.reused_tokens += entry.input_ids.shape[-1]
+            return entry
+
+    def put(self, conv_id, input_ids, past_key_values):
+        """Store a conversation's state as most recently used"""
+        entry = CachedConversation(input_ids, past_key_values)
+        if entry.nbytes > self.max_bytes:
+            return False
+
+        with self.lock:
+            old = self.entries.pop(conv_id, None)
+            if old is not None:
+                self.bytes_held -= old.nbytes
+            self.entries[conv_id] = entry
+            self.bytes_held += entry.nbytes
+            self._evict()
+        return True
+
+    def discard(self, conv_id):
+        with self.lock:
+            entry = self.entries.pop(conv_id, None)
+            if entry is not None:
+                self.bytes_held -= entry.nbytes
+
+    def _evict(self):
+        while self.entries and (
+            self.bytes_held > self.max_bytes
+            or (self.max_entries is not None and len(self.entries) > self.max_entries)
+        ):
+            _, entry = self.entries.popitem(last=False)
+            self.bytes_held -= entry.nbytes
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes_held': self.bytes_held,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'reused_tokens': self.reused_tokens,
+            }
@@ -0,0 +1,31 @@
+"""
+Merge the finance LoRA adapter into Phi-2 and write a standalone checkpoint
+
+Usage:
+    python merge_adapter.py
+    python merge_adapter.py --adapter ../models/finance_phi2_model --output ../models/finance_phi2_merged
+"""
+import argparse
+import time
+import serving_config
+from model_loader import DTYPES, merge_adapter
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge a LoRA adapter into its base model")
+    parser.add_argument("--base", default=serving_config.BASE_MODEL_NAME)
+    parser.add_argument("--adapter", default=serving_config.ADAPTER_PATH)
+    parser.add_argument("--output", default=serving_config.MERGED_MODEL_PATH)
+    parser.add_argument("--dtype", default="float16", choices=DTYPES)
+    args = parser.parse_args()
+
+    print("="*70)
+    print("🔀 MERGING LoRA ADAPTER")
+    print(f"   Base:    {args.base}")
+    print(f"   Adapter: {args.adapter}")
+    print(f"   Output:  {args.output}")
+    print("="*70)
+
+    start_time = time.time()
+    merge_adapter(args.base, args.adapter, args.output, dtype=DTYPES[args.dtype])
+
+    print(f"✅ Merged model saved to {args.output} in {time.time() - start_time:.1f}s")
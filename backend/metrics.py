@@ -0,0 +1,270 @@
+"""
+Prometheus Metrics
+Dependency-free counters, gauges and histograms rendered in the Prometheus
+text exposition format. One process-wide REGISTRY is shared by app.py,
+chat_api_rlhf.py, asgi_app.py and auth_api.py.
+
+Recording is a dict lookup, a lock and (for histograms) a bisect, so it is
+cheap enough to sit on the generation hot path.
+"""
+import bisect
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return "{" + pairs + "}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """A metric family; labels(...) returns the child that holds the values"""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self.children[()] = self._new_child()
+
+    def labels(self, *values, **kwargs):
+        key = tuple(str(v) for v in values) or tuple(str(kwargs[name]) for name in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(key, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        return self.children[()]
+
+    def samples(self):
+        """[(suffix, labels dict, value)] for rendering"""
+        result = []
+        for key, child in list(self.children.items()):
+            labels = dict(zip(self.labelnames, key))
+            result.extend((suffix, {**labels, **extra}, value) for suffix, extra, value in child.samples())
+        return result
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self):
+        return [("_total", {}, self.value)]
+
+class Counter(_Metric):
+    kind = "counter"
+    _new_child = _CounterChild
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        return [("", {}, self.value)]
+
+class Gauge(_Metric):
+    kind = "gauge"
+    _new_child = _GaugeChild
+
+    def set(self, value):
+        self._unlabelled().set(value)
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        result = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            result.append(("_bucket", {'le': _format_value(bound)}, cumulative))
+        result.append(("_sum", {}, total))
+        result.append(("_count", {}, cumulative))
+        return result
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.bucket_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bucket_bounds)
+
+    def observe(self, value):
+        self._unlabelled().observe(value)
+
+class Registry:
+    """
+    Named metrics plus collector callbacks evaluated at scrape time (for
+    values that already live elsewhere, e.g. cache stats or model memory).
+    A collector returns [(name, kind, help, [(labels dict, value), ...])].
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames=(), **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def register_collector(self, fn):
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+
+        for collector in list(self.collectors):
+            try:
+                families = collector()
+            except Exception as e:
+                lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                suffix = "_total" if kind == "counter" else ""
+                for labels, value in samples:
+                    lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# Inference stages (batching.py, streaming.py, chat_api_rlhf.py)
+STAGE_SECONDS = REGISTRY.histogram(
+    "finbud_inference_stage_seconds",
+    "Time spent per inference stage (tokenize, prefill, decode, detokenize)",
+    ("stage",)
+)
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "finbud_queue_wait_seconds",
+    "Time a request waited before generation started",
+    ("queue",)
+)
+PROMPT_TOKENS = REGISTRY.counter("finbud_prompt_tokens", "Prompt tokens prefilled")
+GENERATED_TOKENS = REGISTRY.counter("finbud_generated_tokens", "Tokens generated")
+GENERATION_SECONDS = REGISTRY.counter(
+    "finbud_generation_seconds", "Wall time inside generate(); rate(generated)/rate(this) is tokens/sec"
+)
+TOKENS_PER_SECOND = REGISTRY.gauge(
+    "finbud_generation_tokens_per_second", "Decode throughput of the most recent generate() call"
+)
+ERRORS = REGISTRY.counter("finbud_errors", "Requests that failed with an exception", ("endpoint", "error"))
+COALESCED = REGISTRY.counter(
+    "finbud_coalesced_requests", "Requests that attached to an identical in-flight generation", ("endpoint",)
+)
+
+# HTTP (instrument_flask)
+HTTP_REQUESTS = REGISTRY.counter("finbud_http_requests", "HTTP requests", ("service", "endpoint", "status"))
+HTTP_LATENCY = REGISTRY.histogram(
+    "finbud_http_request_seconds",
+    "Time until the response headers are sent (for SSE: until the stream starts)",
+    ("service", "endpoint")
+)
+
+def record_generation(tokenize, prefill, decode, detokenize, prompt_tokens, generated_tokens):
+    """Record one generate() call; stage arguments are seconds (None = not measured)"""
+    for stage, seconds in (("tokenize", tokenize), ("prefill", prefill),
+                           ("decode", decode), ("detokenize", detokenize)):
+        if seconds is not None:
+            STAGE_SECONDS.labels(stage).observe(seconds)
+    PROMPT_TOKENS.inc(prompt_tokens)
+    GENERATED_TOKENS.inc(generated_tokens)
+    generation = (prefill or 0.0) + (decode or 0.0)
+    GENERATION_SECONDS.inc(generation)
+    if decode:
+        TOKENS_PER_SECOND.set(round(generated_tokens / decode, 2))
+
+def cache_collector(name, stats_fn):
+    """Collector exposing hits/misses of a cache whose stats() has those keys"""
+    def collect():
+        stats = stats_fn()
+        labels = {'cache': name}
+        return [
+            ("finbud_cache_hits", "counter", "Cache hits", [(labels, stats['hits'])]),
+            ("finbud_cache_misses", "counter", "Cache misses", [(labels, stats['misses'])]),
+        ]
+    collect.__name__ = f"{name}_cache"
+    return collect
+
+def instrument_flask(app, service):
+    """Count and time every request of a Flask app and serve GET /metrics"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_metrics_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        HTTP_REQUESTS.labels(service, endpoint, response.status_code).inc()
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            HTTP_LATENCY.labels(service, endpoint).observe(time.perf_counter() - start)
+        return response
+
+    def metrics():
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
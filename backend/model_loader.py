@@ -0,0 +1,213 @@
+"""
+Finance Model Loader
+Prefers a merged (adapter folded into base weights) checkpoint and falls
+back to base model + LoRA adapter. Handles device, dtype and optional
+int8 dynamic quantization for CPU serving.
+"""
+import os
+import time
+import torch
+from transformers import AutoTokenizer
+from peft import PeftModel
+import serving_config
+from model_registry import load_causal_lm, resolve_model
+from multi_adapter import load_multi_adapter_model
+
+DTYPES = {"float16": torch.float16, "bfloat16": torch.bfloat16, "float32": torch.float32}
+
+ADAPTER_WEIGHT_FILES = ["adapter_model.safetensors", "adapter_model.bin", "adapter_config.json"]
+MERGED_MARKER = "config.json"
+
+def adapter_mtime(adapter_path):
+    """Newest modification time of the adapter's weight/config files"""
+    times = [
+        os.path.getmtime(os.path.join(adapter_path, name))
+        for name in ADAPTER_WEIGHT_FILES
+        if os.path.exists(os.path.join(adapter_path, name))
+    ]
+    return max(times) if times else None
+
+def merged_is_fresh(merged_path, adapter_path):
+    """True if a merged checkpoint exists and is newer than the adapter"""
+    marker = os.path.join(merged_path, MERGED_MARKER)
+    if not os.path.exists(marker):
+        return False
+
+    adapter_time = adapter_mtime(adapter_path)
+    if adapter_time is None:
+        return True
+    return os.path.getmtime(marker) >= adapter_time
+
+def load_tokenizer(path):
+    tokenizer = AutoTokenizer.from_pretrained(resolve_model(path), trust_remote_code=True)
+    tokenizer.pad_token = tokenizer.eos_token
+    return tokenizer
+
+def load_unmerged(base_model_name, adapter_path, dtype=torch.float16):
+    """Two-stage load: base weights, then the LoRA adapter on top"""
+    base_model = load_causal_lm(base_model_name, dtype=dtype)
+    return PeftModel.from_pretrained(base_model, adapter_path)
+
+def load_merged(merged_path, dtype=torch.float16):
+    return load_causal_lm(merged_path, dtype=dtype)
+
+def load_finance_model(
+    base_model_name=serving_config.BASE_MODEL_NAME,
+    adapter_path=serving_config.ADAPTER_PATH,
+    merged_path=serving_config.MERGED_MODEL_PATH,
+    dtype=torch.float16
+):
+    """
+    Load the finance model, returning (model, tokenizer, source).
+
+    source is "merged" when the merged checkpoint is used and "adapter"
+    when the LoRA adapter is applied on top of the base model.
+    """
+    start_time = time.time()
+
+    if merged_path and merged_is_fresh(merged_path, adapter_path):
+        model = load_merged(merged_path, dtype=dtype)
+        tokenizer = load_tokenizer(merged_path)
+        source = "merged"
+    else:
+        if merged_path and os.path.exists(merged_path):
+            print(f"⚠️  Merged model at {merged_path} is older than the adapter, ignoring it")
+        model = load_unmerged(base_model_name, adapter_path, dtype=dtype)
+        tokenizer = load_tokenizer(base_model_name)
+        source = "adapter"
+
+    model.eval()
+    print(f"   Loaded {source} model in {time.time() - start_time:.1f}s")
+    return model, tokenizer, source
+
+def merge_adapter(base_model_name, adapter_path, output_path, dtype=torch.float16):
+    """Fold the LoRA adapter into the base weights and save a standalone checkpoint"""
+    model = load_unmerged(base_model_name, adapter_path, dtype=dtype)
+    merged = model.merge_and_unload()
+
+    tokenizer = load_tokenizer(
+        adapter_path if os.path.exists(os.path.join(adapter_path, "tokenizer_config.json"))
+        else base_model_name
+    )
+
+    os.makedirs(output_path, exist_ok=True)
+    merged.save_pretrained(output_path, safe_serialization=True)
+    tokenizer.save_pretrained(output_path)
+    return merged
+
+def resolve_device(device=serving_config.DEVICE):
+    if device == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    if device == "cuda" and not torch.cuda.is_available():
+        raise RuntimeError("DEVICE is 'cuda' but no CUDA GPU is available")
+    return device
+
+def resolve_dtype(dtype=serving_config.DTYPE, device="cpu", quantization=None):
+    """float16 is only fast on GPU; CPU defaults to float32 (required for int8)"""
+    if quantization == "int8":
+        return torch.float32
+    if dtype == "auto":
+        return torch.float16 if device == "cuda" else torch.float32
+    return DTYPES[dtype]
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of every nn.Linear (weights int8, activations quantized on the fly)"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def prepare_model(model, device, quantization=None):
+    """Move to device and apply optional quantization"""
+    if quantization == "int8":
+        if device != "cpu":
+            raise ValueError("int8 dynamic quantization is only supported on CPU")
+        model = quantize_int8(model)
+    elif quantization is not None:
+        raise ValueError(f"Unknown quantization mode: {quantization}")
+    else:
+        model = model.to(device)
+    model.eval()
+    return model
+
+def model_memory_bytes(model):
+    """Bytes held by parameters and buffers, including packed int8 weights"""
+    total = 0
+    for value in model.state_dict().values():
+        # Quantized Linear layers store a (weight, bias) tuple
+        tensors = value if isinstance(value, tuple) else (value,)
+        for t in tensors:
+            if isinstance(t, torch.Tensor):
+                total += t.numel() * t.element_size()
+    return total
+
+def model_memory_collector(get_models):
+    """
+    Metrics collector (see metrics.Registry) reporting the bytes held by each
+    loaded model; get_models() returns {name: model or None}
+    """
+    def collect():
+        samples = [
+            ({'model': name}, model_memory_bytes(model))
+            for name, model in get_models().items() if model is not None
+        ]
+        families = [("finbud_model_memory_bytes", "gauge", "Parameter and buffer bytes of loaded models", samples)]
+        if torch.cuda.is_available():
+            families.append((
+                "finbud_cuda_memory_allocated_bytes", "gauge", "Bytes allocated by the CUDA caching allocator",
+                [({}, torch.cuda.memory_allocated())]
+            ))
+            families.append((
+                "finbud_cuda_memory_reserved_bytes", "gauge", "Bytes reserved by the CUDA caching allocator",
+                [({}, torch.cuda.memory_reserved())]
+            ))
+        return families
+    collect.__name__ = "model_memory"
+    return collect
+
+def load_serving_model(
+    device=serving_config.DEVICE,
+    dtype=serving_config.DTYPE,
+    quantization=serving_config.QUANTIZATION,
+    adapters=None,
+    **kwargs
+):
+    """
+    Device-agnostic entry point used by the servers: returns (model, tokenizer, source).
+    If more than one of `adapters` (name -> path) exists they are all attached
+    to a single base model and source is "multi-adapter".
+    """
+    device = resolve_device(device)
+    torch_dtype = resolve_dtype(dtype, device, quantization)
+
+    available = {name: path for name, path in (adapters or {}).items() if os.path.exists(path)}
+    if len(available) > 1:
+        base_model_name = kwargs.get('base_model_name', serving_config.BASE_MODEL_NAME)
+        model, _ = load_multi_adapter_model(base_model_name, available, dtype=torch_dtype)
+        tokenizer = load_tokenizer(base_model_name)
+        source = "multi-adapter"
+    else:
+        model, tokenizer, source = load_finance_model(dtype=torch_dtype, **kwargs)
+    model = prepare_model(model, device, quantization)
+
+    mode = f"{device}/{str(torch_dtype).replace('torch.', '')}"
+    if quantization:
+        mode += f"/{quantization}"
+    print(f"   Serving mode: {mode}")
+    return model, tokenizer, source
+
+def load_draft_model(
+    path=serving_config.DRAFT_MODEL_PATH,
+    device=serving_config.DEVICE,
+    dtype=serving_config.DTYPE,
+    num_assistant_tokens=serving_config.NUM_ASSISTANT_TOKENS
+):
+    """Load the draft model used for assisted generation (must share the tokenizer)"""
+    device = resolve_device(device)
+    draft = load_causal_lm(path, dtype=resolve_dtype(dtype, device))
+    configure_draft(draft, num_assistant_tokens)
+    return prepare_model(draft, device)
+
+def configure_draft(draft, num_assistant_tokens):
+    """Propose a fixed number of tokens per step instead of HF's adaptive schedule"""
+    draft.generation_config.num_assistant_tokens = num_assistant_tokens
+    draft.generation_config.num_assistant_tokens_schedule = "constant"
+    # Don't cut proposals short on low draft confidence
+    draft.generation_config.assistant_confidence_threshold = 0.0
@@ -0,0 +1,259 @@
+"""
+Local Model Registry
+A manifest (models/registry.json) of base models, adapters and merged
+checkpoints with their local paths, file sizes and SHA-256 hashes, so every
+entry point resolves "microsoft/phi-2" to a folder on disk instead of the
+Hugging Face Hub. Safetensors checkpoints in those folders are memory-mapped
+by transformers, so startup costs page faults rather than copies.
+
+Usage:
+    python model_registry.py pull phi-2 microsoft/phi-2     # download once (online node)
+    python model_registry.py add finance-sft ../models/finance_phi2_model --kind adapter --base phi-2
+    python model_registry.py list
+    python model_registry.py verify [NAME]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import struct
+import time
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models")
+REGISTRY_PATH = os.environ.get("FINBUD_MODEL_REGISTRY", os.path.join(MODELS_DIR, "registry.json"))
+
+# safetensors header dtype -> torch dtype name
+SAFETENSORS_DTYPES = {"F32": "float32", "F16": "float16", "BF16": "bfloat16", "F64": "float64"}
+
+# Only these files matter for loading; everything else in a folder is ignored
+TRACKED_SUFFIXES = (".safetensors", ".json", ".txt", ".model", ".bin", ".py")
+
+class ModelNotFoundError(Exception):
+    """Raised offline when a model is neither registered nor a local folder"""
+
+def file_sha256(path, chunk_size=8 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def tracked_files(folder):
+    return sorted(
+        name for name in os.listdir(folder)
+        if name.endswith(TRACKED_SUFFIXES) and os.path.isfile(os.path.join(folder, name))
+    )
+
+class ModelRegistry:
+    """
+    name -> {path, kind, source, base, files: {name: {size, sha256}}, registered_at}
+
+    Paths are stored relative to the manifest so the models folder can be
+    copied to another node as a whole.
+    """
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('models', {})
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'models': self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def local_path(self, name):
+        return os.path.normpath(os.path.join(self.root, self.entries[name]['path']))
+
+    def find(self, name_or_source):
+        """Registry name for a name or hub id (e.g. "microsoft/phi-2"), or None"""
+        if name_or_source in self.entries:
+            return name_or_source
+        for name, entry in self.entries.items():
+            if entry.get('source') == name_or_source:
+                return name
+        return None
+
+    def register(self, name, folder, kind="base", source=None, base=None, hash_files=True):
+        """Record a local folder (sizes always, SHA-256 unless hash_files=False)"""
+        folder = os.path.abspath(folder)
+        if not os.path.isdir(folder):
+            raise FileNotFoundError(folder)
+        files = {}
+        for file_name in tracked_files(folder):
+            file_path = os.path.join(folder, file_name)
+            files[file_name] = {
+                'size': os.path.getsize(file_path),
+                'sha256': file_sha256(file_path) if hash_files else None,
+            }
+        self.entries[name] = {
+            'path': os.path.relpath(folder, self.root),
+            'kind': kind,
+            'source': source,
+            'base': base,
+            'files': files,
+            'registered_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        return self.entries[name]
+
+    def check(self, name, full=False):
+        """
+        List of problems with a registered folder. The default check compares
+        file sizes (cheap); full=True also re-hashes every file, which reads
+        the whole checkpoint.
+        """
+        folder = self.local_path(name)
+        problems = []
+        for file_name, info in self.entries[name]['files'].items():
+            file_path = os.path.join(folder, file_name)
+            if not os.path.exists(file_path):
+                problems.append(f"missing {file_name}")
+            elif os.path.getsize(file_path) != info['size']:
+                problems.append(f"size mismatch {file_name}")
+            elif full and info.get('sha256') and file_sha256(file_path) != info['sha256']:
+                problems.append(f"hash mismatch {file_name}")
+        return problems
+
+_registry = None
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+def resolve_model(name_or_path, offline=None):
+    """
+    Local folder for a model reference: a registered name or hub id, or an
+    existing path. Anything else is returned unchanged (hub download) unless
+    offline, where it raises ModelNotFoundError. Offline defaults to the
+    HF_HUB_OFFLINE environment variable.
+    """
+    if offline is None:
+        offline = os.environ.get("HF_HUB_OFFLINE", "0") not in ("0", "", "false", "False")
+
+    registry = get_registry()
+    name = registry.find(name_or_path)
+    if name is not None:
+        problems = registry.check(name)
+        if problems:
+            raise ModelNotFoundError(f"Registered model '{name}' is incomplete: {', '.join(problems)}")
+        return registry.local_path(name)
+
+    if os.path.exists(name_or_path):
+        return name_or_path
+    if offline:
+        raise ModelNotFoundError(
+            f"'{name_or_path}' is not in {registry.path} and not a local folder "
+            f"(register it with model_registry.py)"
+        )
+    return name_or_path
+
+def checkpoint_dtypes(folder):
+    """
+    Floating-point dtypes stored in a folder's safetensors shards, read from
+    the JSON headers only (8-byte length + header; no tensor data is touched)
+    """
+    dtypes = set()
+    for shard in glob.glob(os.path.join(folder, "*.safetensors")):
+        with open(shard, 'rb') as f:
+            header_size = struct.unpack("<Q", f.read(8))[0]
+            header = json.loads(f.read(header_size))
+        for key, info in header.items():
+            if key != "__metadata__" and info['dtype'] in SAFETENSORS_DTYPES:
+                dtypes.add(SAFETENSORS_DTYPES[info['dtype']])
+    return dtypes
+
+def load_causal_lm(name_or_path, dtype=None, **kwargs):
+    """
+    AutoModelForCausalLM from the registry-resolved local folder.
+
+    transformers memory-maps safetensors shards and, on CPU, keeps parameters
+    that already have the requested dtype as views of the mapping, so loading
+    only costs page faults (and pages stay shared between processes). A dtype
+    conversion or a .bin checkpoint materialises a full private copy instead,
+    which is reported here so it can be fixed by saving in the serving dtype.
+    """
+    from transformers import AutoModelForCausalLM
+
+    path = resolve_model(name_or_path)
+    if os.path.isdir(path):
+        stored = checkpoint_dtypes(path)
+        requested = str(dtype).replace("torch.", "") if dtype is not None else None
+        if not stored:
+            print(f"⚠️  {path} has no safetensors shards; weights will be copied into RAM")
+        elif requested and stored != {requested}:
+            print(f"⚠️  {path} stores {'/'.join(sorted(stored))}, loading as {requested} "
+                  f"copies every weight instead of memory-mapping it")
+
+    if dtype is not None:
+        kwargs['torch_dtype'] = dtype
+    return AutoModelForCausalLM.from_pretrained(
+        path,
+        trust_remote_code=True,
+        low_cpu_mem_usage=True,
+        **kwargs
+    )
+
+def pull(name, repo_id, registry):
+    """Download a hub model's weights/tokenizer into models/<name> and register it"""
+    from huggingface_hub import snapshot_download
+
+    folder = os.path.join(registry.root, name)
+    snapshot_download(
+        repo_id,
+        local_dir=folder,
+        allow_patterns=["*.safetensors", "*.json", "*.txt", "*.model", "*.py"]
+    )
+    return registry.register(name, folder, kind="base", source=repo_id)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pull_cmd = commands.add_parser("pull", help="Download a hub model and register it")
+    pull_cmd.add_argument("name")
+    pull_cmd.add_argument("repo_id")
+
+    add_cmd = commands.add_parser("add", help="Register an existing local folder")
+    add_cmd.add_argument("name")
+    add_cmd.add_argument("folder")
+    add_cmd.add_argument("--kind", default="base", choices=["base", "adapter", "merged"])
+    add_cmd.add_argument("--source", help="Hub id this folder stands in for (e.g. microsoft/phi-2)")
+    add_cmd.add_argument("--base", help="Registry name of the base model (adapters)")
+    add_cmd.add_argument("--no-hash", action="store_true", help="Record sizes only")
+
+    commands.add_parser("list", help="Show registered models")
+
+    verify_cmd = commands.add_parser("verify", help="Re-hash registered files")
+    verify_cmd.add_argument("name", nargs="?")
+
+    args = parser.parse_args()
+    registry = ModelRegistry()
+
+    if args.command == "pull":
+        entry = pull(args.name, args.repo_id, registry)
+        registry.save()
+        print(f"✅ {args.name}: {len(entry['files'])} files at {registry.local_path(args.name)}")
+    elif args.command == "add":
+        entry = registry.register(args.name, args.folder, args.kind, args.source, args.base, not args.no_hash)
+        registry.save()
+        print(f"✅ {args.name}: {len(entry['files'])} files registered")
+    elif args.command == "list":
+        for name, entry in sorted(registry.entries.items()):
+            size = sum(info['size'] for info in entry['files'].values()) / 1024**2
+            print(f"{name:<20} {entry['kind']:<8} {size:>9.1f} MB  {entry['path']}"
+                  + (f"  (source {entry['source']})" if entry.get('source') else ""))
+    else:
+        names = [args.name] if args.name else sorted(registry.entries)
+        failed = False
+        for name in names:
+            problems = registry.check(name, full=True)
+            failed = failed or bool(problems)
+            print(f"{'✅' if not problems else '❌'} {name}" + (f": {', '.join(problems)}" if problems else ""))
+        raise SystemExit(1 if failed else 0)
@@ -0,0 +1,60 @@
+"""
+Multi-Adapter Serving
+Loads several LoRA adapters (e.g. SFT and RLHF) onto one resident base
+model and selects one per request, including mixed-adapter batches
+"""
+import os
+import torch
+from peft import PeftConfig, PeftModel
+from model_registry import load_causal_lm, resolve_model
+
+BASE_ADAPTER = "__base__"  # PEFT's name for "no adapter" in adapter_names
+
+class UnknownAdapterError(ValueError):
+    pass
+
+def adapter_base_model(adapter_path):
+    """Local folder (via the model registry) of the base model an adapter was trained on"""
+    return resolve_model(PeftConfig.from_pretrained(adapter_path).base_model_name_or_path)
+
+def load_multi_adapter_model(base_model_name, adapters, dtype=torch.float16):
+    """
+    Load base_model_name once and attach every adapter in `adapters`
+    (name -> path). Adapters whose folder is missing are skipped.
+    Returns (model, loaded adapter names).
+    """
+    available = {name: path for name, path in adapters.items() if os.path.exists(path)}
+    for name in adapters:
+        if name not in available:
+            print(f"⚠️  Adapter '{name}' not found at {adapters[name]}, skipping")
+    if not available:
+        raise FileNotFoundError("None of the configured adapters exist")
+
+    base_model = load_causal_lm(base_model_name, dtype=dtype)
+
+    names = list(available)
+    model = PeftModel.from_pretrained(base_model, available[names[0]], adapter_name=names[0])
+    for name in names[1:]:
+        model.load_adapter(available[name], adapter_name=name)
+    model.eval()
+
+    print(f"   Adapters loaded on one base model: {', '.join(names)}")
+    return model, names
+
+def resolve_adapter(requested, loaded, default):
+    """Validate the per-request adapter name ('base' selects the bare base model)"""
+    if not requested:
+        return default
+    if requested == "base":
+        return BASE_ADAPTER
+    if requested not in loaded:
+        raise UnknownAdapterError(
+            f"Unknown model '{requested}'. Available: {', '.join(list(loaded) + ['base'])}"
+        )
+    return requested
+
+def adapter_kwargs(adapter_names):
+    """generate() kwargs routing each row of the batch to its adapter"""
+    if not adapter_names or all(name is None for name in adapter_names):
+        return {}
+    return {'adapter_names': list(adapter_names)}
@@ -0,0 +1,166 @@
+"""
+Pre-Fork Multi-Worker Serving
+Loads the model once in a supervisor process, then forks worker processes
+that inherit the weights copy-on-write and accept on one shared socket.
+Each worker has its own GIL; the weight pages stay shared because nothing
+writes to them after the fork. The supervisor restarts workers that die.
+
+Linux/macOS only (needs os.fork).
+"""
+import gc
+import os
+import signal
+import socket
+import time
+import torch
+
+def process_memory(pid="self"):
+    """Resident / proportional / shared / private memory (MB) from /proc smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        'rss_mb': round(fields.get('Rss', 0.0), 1),
+        'pss_mb': round(fields.get('Pss', 0.0), 1),
+        'shared_mb': round(fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0), 1),
+        'private_mb': round(fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0), 1),
+    }
+
+def memory_report(pids):
+    """process_memory() for each pid that is still alive"""
+    report = {}
+    for pid in pids:
+        try:
+            report[pid] = process_memory(pid)
+        except OSError:
+            pass
+    return report
+
+def listen_socket(host, port, backlog=1024):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+class PreforkServer:
+    """
+    Supervisor for `workers` forked copies of a WSGI app.
+
+    preload() runs once in the supervisor (load weights, warm up) with
+    torch limited to one thread, so no OpenMP pool exists at fork time.
+    worker_init() runs in each child after the fork, to recreate anything
+    that owns threads (threads do not survive fork). Every child then gets
+    threads_per_worker torch threads.
+    """
+    def __init__(self, app, host, port, workers, preload=None, worker_init=None,
+                 threads_per_worker=None, min_uptime=5.0, max_backoff=30.0):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.preload = preload
+        self.worker_init = worker_init
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.min_uptime = min_uptime
+        self.max_backoff = max_backoff
+
+        self.children = {}  # pid -> (slot, started_at)
+        self.backoff = {}  # slot -> seconds to wait before the next restart
+        self.restarts = 0
+        self.stopping = False
+        self.sock = None
+
+    def serve_forever(self):
+        torch.set_num_threads(1)
+        if self.preload is not None:
+            self.preload()
+
+        # Keep the GC from touching (and so un-sharing) every pre-fork object
+        gc.collect()
+        gc.freeze()
+
+        self.sock = listen_socket(self.host, self.port)
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGUSR1, lambda *_: self.print_memory())
+
+        print(f"🍴 Forking {self.workers} workers x {self.threads_per_worker} threads "
+              f"on http://{self.host}:{self.sock.getsockname()[1]}", flush=True)
+        for slot in range(self.workers):
+            self._spawn(slot)
+        self._supervise()
+
+    def _spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(slot)  # never returns
+        self.children[pid] = (slot, time.time())
+
+    def _run_worker(self, slot):
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+            torch.set_num_threads(self.threads_per_worker)
+            os.environ["FINBUD_WORKER"] = str(slot)  # Per-worker part of conversation ids
+            if self.worker_init is not None:
+                self.worker_init()
+
+            from werkzeug.serving import make_server
+            server = make_server(self.host, self.port, self.app, threaded=True, fd=self.sock.fileno())
+            print(f"   worker {slot} ready (pid {os.getpid()})", flush=True)
+            server.serve_forever()
+        except BaseException as e:
+            print(f"❌ worker {slot} crashed: {e}", flush=True)
+            code = 1
+        finally:
+            # Skip the parent's atexit handlers (cache saves etc.)
+            os._exit(code)
+
+    def _supervise(self):
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            if pid not in self.children:
+                continue
+
+            slot, started_at = self.children.pop(pid)
+            if self.stopping:
+                continue
+
+            # Back off when a worker keeps dying right after start
+            if time.time() - started_at < self.min_uptime:
+                delay = min(self.backoff.get(slot, 0.5) * 2, self.max_backoff)
+            else:
+                delay = 0.0
+            self.backoff[slot] = delay or 0.5
+            reason = f"signal {os.WTERMSIG(status)}" if os.WIFSIGNALED(status) else f"exit {os.WEXITSTATUS(status)}"
+            print(f"⚠️  worker {slot} (pid {pid}) died ({reason}); restarting in {delay:.1f}s", flush=True)
+            time.sleep(delay)
+            if not self.stopping:
+                self.restarts += 1
+                self._spawn(slot)
+
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def print_memory(self):
+        """Per-worker memory; shared_mb is mostly the copy-on-write weights"""
+        print(f"📊 supervisor {os.getpid()}: {process_memory()}", flush=True)
+        for pid, memory in memory_report(self.children).items():
+            print(f"   worker {self.children[pid][0]} ({pid}): {memory}", flush=True)
@@ -2,92 +2,395 @@
 Lightweight Reward Model
 Scores responses based on feedback
 """
+import argparse
 import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from ann_index import IVFIndex, GrowableArray
+from feedback_log import FeedbackReader
 import rlhf_config as config
 
+# Scoring state of a forked score_batch() worker
+_worker_model = None
+
+def _init_scoring_worker(vectorizer, idf, good_centroid, bad_centroid):
+    global _worker_model
+    _worker_model = RewardModel()
+    _worker_model.vectorizer = vectorizer
+    _worker_model.idf = idf
+    _worker_model.good_centroid = good_centroid
+    _worker_model.bad_centroid = bad_centroid
+    _worker_model.is_trained = True
+
+def _score_chunk(responses):
+    return _worker_model.score_batch(responses)
+
 class RewardModel:
+    """
+    Centroid scorer: a response scores by its cosine similarity to the mean
+    good response minus that to the mean bad one. Rows are L2-normalised,
+    so the mean cosine similarity to a class equals the dot product with
+    the mean of its rows. Subclasses keep the centroids up to date from
+    feedback (see scoring_state()).
+    """
     def __init__(self):
-        self.vectorizer = TfidfVectorizer(max_features=100)
-        self.good_examples = []
-        self.bad_examples = []
+        self.vectorizer = None
+        self.idf = None  # Per-feature weights applied before normalising (None: none)
+        self.good_centroid = None
+        self.bad_centroid = None
         self.is_trained = False
-        
-    def load_feedback(self):
-        """Load feedback from JSON"""
-        try:
-            with open(config.FEEDBACK_DATA_PATH, 'r') as f:
-                data = json.load(f)
-            
-            self.good_examples = []
-            self.bad_examples = []
-            
-            for item in data:
-                if item['rating'] >= config.POSITIVE_THRESHOLD:
-                    self.good_examples.append(item['response'])
-                elif item['rating'] <= config.NEGATIVE_THRESHOLD:
-                    self.bad_examples.append(item['response'])
-            
-            print(f"✅ Loaded {len(self.good_examples)} good, {len(self.bad_examples)} bad examples")
-            return len(self.good_examples) + len(self.bad_examples)
-            
-        except FileNotFoundError:
-            print("No feedback data found")
-            return 0
-    
-    def train(self):
-        """Train reward model on feedback"""
-        count = self.load_feedback()
-        
-        if count < config.MIN_FEEDBACK_FOR_TRAINING:
-            print(f"Need {config.MIN_FEEDBACK_FOR_TRAINING - count} more feedbacks")
-            return False
-        
-        # Create training data
-        all_texts = self.good_examples + self.bad_examples
-        labels = [1] * len(self.good_examples) + [0] * len(self.bad_examples)
-        
-        # Fit vectorizer
-        self.vectorizer.fit(all_texts)
-        self.is_trained = True
-        
-        print("✅ Reward model trained")
-        return True
+    
+    def scoring_state(self):
+        """(idf, good, bad) used together by score_batch(); None for a class without examples"""
+        return self.idf, self.good_centroid, self.bad_centroid
+    
+    def centroids(self):
+        """(good, bad) mean example vectors; None for a class without examples"""
+        return self.scoring_state()[1:]
+    
+    def featurize(self, responses, idf=None):
+        """Rows of unit length (or all zeros with no known terms)"""
+        matrix = self.vectorizer.transform(responses)
+        if idf is None:
+            return matrix
+        return normalize(matrix.multiply(idf).tocsr())
     
     def score(self, response):
         """
         Score a response (0 = bad, 1 = good)
         """
+        return self.score_batch([response])[0]
+    
+    def score_batch(self, responses, processes=None, chunk_size=10000):
+        """
+        Score a list of responses at once; returns a float array. With
+        processes > 1, lists longer than chunk_size are split across worker
+        processes (for large offline jobs; only the vectorizer and centroids
+        are sent to the workers).
+        """
+        responses = list(responses)
         if not self.is_trained:
-            return 0.5  # Neutral if not trained
+            return np.full(len(responses), 0.5)  # Neutral if not trained
         
-        # Vectorize response
-        response_vec = self.vectorizer.transform([response])
+        idf, good_centroid, bad_centroid = self.scoring_state()
+        if processes and processes > 1 and len(responses) > chunk_size:
+            chunks = [responses[i:i + chunk_size] for i in range(0, len(responses), chunk_size)]
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_init_scoring_worker,
+                initargs=(self.vectorizer, idf, good_centroid, bad_centroid)
+            ) as pool:
+                return np.concatenate(list(pool.map(_score_chunk, chunks)))
         
-        # Compare to good examples
-        if self.good_examples:
-            good_vecs = self.vectorizer.transform(self.good_examples)
-            good_similarity = cosine_similarity(response_vec, good_vecs).mean()
-        else:
-            good_similarity = 0
+        matrix = self.featurize(responses, idf)
         
-        # Compare to bad examples
-        if self.bad_examples:
-            bad_vecs = self.vectorizer.transform(self.bad_examples)
-            bad_similarity = cosine_similarity(response_vec, bad_vecs).mean()
-        else:
-            bad_similarity = 0
+        # Mean cosine similarity to the good / bad examples
+        zeros = np.zeros(len(responses))
+        good_similarity = matrix @ good_centroid if good_centroid is not None else zeros
+        bad_similarity = matrix @ bad_centroid if bad_centroid is not None else zeros
         
         # Score: higher if similar to good, lower if similar to bad
-        score = (good_similarity - bad_similarity + 1) / 2
-        return np.clip(score, 0, 1)
+        scores = (good_similarity - bad_similarity + 1) / 2
+        return np.clip(scores, 0, 1)
+
+class IncrementalRewardModel(RewardModel):
+    """
+    Online centroid model that never refits: a stateless HashingVectorizer
+    (L2-normalised term counts, no IDF) and running sums of the good and bad
+    rows. update() adds one record in O(its length); a centroid is just
+    sum / count, recomputed lazily after updates. There is no minimum
+    amount of feedback: any rated example starts moving the score.
+    """
+    mode = 'hashed'
+    state_path = config.INCREMENTAL_REWARD_STATE_PATH
+    
+    def __init__(self, n_features=config.REWARD_HASH_FEATURES):
+        super().__init__()
+        self.n_features = n_features
+        self.vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm='l2')
+        self.sums = {'good': np.zeros(n_features), 'bad': np.zeros(n_features)}
+        self.counts = {'good': 0, 'bad': 0}
+        self.checkpoint = None  # Feedback log position folded into the sums
+        self.cached_state = None
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def label(rating):
+        if rating >= config.POSITIVE_THRESHOLD:
+            return 'good'
+        if rating <= config.NEGATIVE_THRESHOLD:
+            return 'bad'
+        return None
+    
+    def update(self, response, rating):
+        """Fold one rating in; returns the class it counted towards (None if neutral)"""
+        return self.update_batch([response], [rating])[0]
+    
+    def update_batch(self, responses, ratings):
+        """Fold several ratings in with one vectorizer call; returns their labels"""
+        labels = [self.label(rating) for rating in ratings]
+        kept = [i for i, label in enumerate(labels) if label]
+        if not kept:
+            return labels
+        
+        matrix = self.vectorizer.transform([responses[i] for i in kept])
+        with self.lock:
+            self._fold(matrix, np.array([labels[i] for i in kept]))
+            self.cached_state = None
+            self.is_trained = True
+        return labels
+    
+    def _fold(self, matrix, labels):
+        """Add rated rows to the model (called with the lock held)"""
+        for label in ('good', 'bad'):
+            rows = matrix[labels == label]
+            np.add.at(self.sums[label], rows.indices, rows.data)
+            self.counts[label] += rows.shape[0]
+    
+    def _idf(self):
+        """Feature weights for scoring (lock held); hashed counts are used as they are"""
+        return None
+    
+    def scoring_state(self):
+        with self.lock:
+            if self.cached_state is None:
+                idf = self._idf()
+                weights = 1 if idf is None else idf
+                self.cached_state = (idf,) + tuple(
+                    weights * self.sums[label] / self.counts[label] if self.counts[label] else None
+                    for label in ('good', 'bad')
+                )
+            return self.cached_state
+    
+    def update_from_log(self, log_path=config.FEEDBACK_LOG_PATH, batch_size=4096):
+        """Fold in every record logged after self.checkpoint; returns how many"""
+        reader = FeedbackReader(log_path, self.checkpoint)
+        new = 0
+        batch = []
+        for item in reader.read():
+            batch.append(item)
+            if len(batch) >= batch_size:
+                self.update_batch([r['response'] for r in batch], [r['rating'] for r in batch])
+                new += len(batch)
+                batch = []
+        if batch:
+            self.update_batch([r['response'] for r in batch], [r['rating'] for r in batch])
+            new += len(batch)
+        self.checkpoint = reader.checkpoint()
+        return new
+    
+    def train(self, min_feedback=0):
+        """
+        Catch up with the feedback log and save a snapshot. Only the part of
+        the log after the snapshot's checkpoint is read. Returns False while
+        fewer than min_feedback good + bad ratings exist in total.
+        """
+        new = self.update_from_log()
+        self.save()
+        count = self.counts['good'] + self.counts['bad']
+        print(f"✅ Folded in {new} new ratings ({self.counts['good']} good, {self.counts['bad']} bad)")
+        if count < max(min_feedback, 1):
+            print(f"Need {max(min_feedback, 1) - count} more feedbacks")
+            return False
+        return True
+    
+    def dims(self):
+        """Constructor arguments that fix the feature space (saved with snapshots)"""
+        return {'n_features': self.n_features}
+    
+    def _snapshot(self):
+        """(arrays, metadata) to save; called with the lock held"""
+        arrays = {f"{label}_sum": self.sums[label].copy() for label in self.sums}
+        return arrays, {'counts': dict(self.counts), 'checkpoint': self.checkpoint, 'dims': self.dims()}
+    
+    def _restore(self, data, meta):
+        self.sums = {'good': data['good_sum'], 'bad': data['bad_sum']}
+        self.counts = meta['counts']
+        self.checkpoint = meta['checkpoint']
+        self.is_trained = any(self.counts.values())
+    
+    def save(self, path=None):
+        """Snapshot the model together with the log checkpoint it covers"""
+        path = path or self.state_path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            arrays, meta = self._snapshot()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, meta=json.dumps(meta), **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path=None):
+        """
+        Model from a snapshot (empty if there is none yet). The snapshot's
+        feature dimensions win over the current config, which only applies
+        to models built from scratch.
+        """
+        path = path or cls.state_path
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            dims = meta['dims']
+            configured = {'n_features': config.REWARD_HASH_FEATURES, 'dim': config.REWARD_EMBEDDING_DIM}
+            if any(dims[name] != value for name, value in configured.items() if name in dims):
+                print(f"⚠️  {path} was built with {dims}; config changes to these apply after deleting it")
+            model = cls(**dims)
+            model._restore(data, meta)
+        return model
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'mode': self.mode,
+                'good': self.counts['good'],
+                'bad': self.counts['bad'],
+                'log_offset': self.checkpoint['offset'] if self.checkpoint else 0,
+            }
+
+class TfidfRewardModel(IncrementalRewardModel):
+    """
+    TF-IDF centroid model (the default REWARD_SCORING): hashed term counts
+    weighted by smooth IDF over the rated responses, as TfidfVectorizer
+    computes it. Document frequencies are running counts next to the class
+    sums, which are kept unweighted; the current IDF is applied to the
+    centroids and to queries at scoring time. The only approximation is
+    each row's L2 norm, taken with the IDF of the moment it was folded in,
+    so a model folded from one batch matches a TfidfVectorizer fit on it
+    (up to hash collisions).
+    """
+    mode = 'tfidf'
+    state_path = config.TFIDF_REWARD_STATE_PATH
+    
+    def __init__(self, n_features=config.REWARD_HASH_FEATURES):
+        super().__init__(n_features)
+        self.vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None)
+        self.document_frequency = np.zeros(n_features)
+    
+    def _idf(self):
+        documents = self.counts['good'] + self.counts['bad']
+        return np.log((1 + documents) / (1 + self.document_frequency)) + 1
+    
+    def _fold(self, matrix, labels):
+        # HashingVectorizer sums repeated terms, so each index is one document
+        np.add.at(self.document_frequency, matrix.indices, 1)
+        documents = self.counts['good'] + self.counts['bad'] + matrix.shape[0]
+        idf = np.log((1 + documents) / (1 + self.document_frequency)) + 1
+        norms = np.sqrt(np.asarray(matrix.multiply(idf).power(2).sum(axis=1)).ravel())
+        super()._fold(sparse.diags(1 / np.maximum(norms, 1e-12)) @ matrix, labels)
+    
+    def _snapshot(self):
+        arrays, meta = super()._snapshot()
+        arrays['document_frequency'] = self.document_frequency.copy()
+        return arrays, meta
+    
+    def _restore(self, data, meta):
+        super()._restore(data, meta)
+        self.document_frequency = data['document_frequency']
+
+class KNNRewardModel(IncrementalRewardModel):
+    """
+    Scores a response by its k most similar rated responses instead of the
+    class means: the similarity-weighted share of good ones among those at
+    least min_similarity away (0.5 if there are none).
+    Responses are embedded by a fixed sparse random projection of the hashed
+    features (stateless, so new ratings never need re-embedding) and kept
+    in an IVF index that takes new vectors at any time.
+    """
+    mode = 'knn'
+    state_path = config.KNN_REWARD_STATE_PATH
+    
+    def __init__(self, n_features=config.REWARD_HASH_FEATURES, dim=config.REWARD_EMBEDDING_DIM,
+                 projection_nonzeros=8, k=config.REWARD_KNN_K, n_probe=config.REWARD_IVF_PROBE,
+                 min_similarity=config.REWARD_KNN_MIN_SIMILARITY):
+        super().__init__(n_features)
+        self.k = k
+        self.min_similarity = min_similarity
+        # Sparse random projection: every hashed feature adds +-1/sqrt(s) to
+        # s random dims, so embedding a row costs O(s * its non-zeros)
+        rng = np.random.default_rng(0)
+        self.dim = dim
+        self.projection_nonzeros = projection_nonzeros
+        self.buckets = rng.integers(0, dim, size=(projection_nonzeros, n_features), dtype=np.int32)
+        self.signs = rng.choice(np.array([-1, 1], dtype=np.float32), size=(projection_nonzeros, n_features))
+        self.signs /= np.sqrt(projection_nonzeros)
+        self.index = IVFIndex(dim, n_probe=n_probe, max_lists=config.REWARD_IVF_MAX_LISTS)
+        self.values = GrowableArray()  # 1.0 good / 0.0 bad, by index id
+    
+    def embed(self, matrix):
+        """Unit-length dense embeddings of hashed feature rows"""
+        projected = sparse.csr_matrix((
+            (self.signs[:, matrix.indices] * matrix.data).T.ravel(),
+            self.buckets[:, matrix.indices].T.ravel(),
+            matrix.indptr * self.projection_nonzeros
+        ), shape=(matrix.shape[0], self.dim))
+        vectors = projected.toarray().astype(np.float32)  # Sums the entries that land in the same dim
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    
+    def _fold(self, matrix, labels):
+        super()._fold(matrix, labels)
+        # Values first: score_batch() reads them without the lock, so every
+        # id a search can return must already have one
+        self.values.append((labels == 'good').astype(np.float32))
+        self.index.add(self.embed(matrix))
+    
+    def score_batch(self, responses, processes=None, chunk_size=10000):
+        """Scores from the k nearest rated responses (processes is ignored)"""
+        responses = list(responses)
+        if not self.is_trained:
+            return np.full(len(responses), 0.5)
+        
+        similarities, ids = self.index.search(self.embed(self.vectorizer.transform(responses)), self.k)
+        weights = np.where((ids >= 0) & (similarities >= self.min_similarity), similarities, 0)
+        values = self.values.view()[np.maximum(ids, 0)]
+        total = weights.sum(axis=1)
+        # No neighbour similar enough to go by: neutral
+        scores = np.divide((weights * values).sum(axis=1), total, out=np.full(len(responses), 0.5), where=total > 0)
+        return np.clip(scores, 0, 1)
+    
+    def dims(self):
+        return {**super().dims(), 'dim': self.dim, 'projection_nonzeros': self.projection_nonzeros}
+    
+    def _snapshot(self):
+        arrays, meta = super()._snapshot()
+        arrays.update({f"index_{name}": array for name, array in self.index.state().items()})
+        arrays['values'] = self.values.view().copy()
+        return arrays, meta
+    
+    def _restore(self, data, meta):
+        super()._restore(data, meta)
+        self.index.restore(data['index_vectors'], data['index_centroids'] if 'index_centroids' in data else None)
+        self.values.append(data['values'])
+    
+    def stats(self):
+        return {**super().stats(), 'k': self.k, 'index': self.index.stats()}
+
+REWARD_MODELS = {model.mode: model for model in (TfidfRewardModel, IncrementalRewardModel, KNNRewardModel)}
+
+def load_reward_model(mode=config.REWARD_SCORING):
+    """Snapshot of the online reward model for `mode` ("tfidf", "hashed" or "knn")"""
+    if mode not in REWARD_MODELS:
+        raise ValueError(f"Unknown reward scoring mode: {mode}")
+    return REWARD_MODELS[mode].load()
 
 if __name__ == "__main__":
-    # Test
-    rm = RewardModel()
+    parser = argparse.ArgumentParser(description="Fold new logged feedback into the reward model snapshot")
+    parser.add_argument("--scoring", choices=sorted(REWARD_MODELS), default=config.REWARD_SCORING,
+                        help="Snapshot to update (default: REWARD_SCORING)")
+    args = parser.parse_args()
+    
+    rm = load_reward_model(args.scoring)
     if rm.train():
         test_response = "Invest in diversified index funds for long-term growth."
         score = rm.score(test_response)
-        print(f"Score: {score:.2f}")
\ No newline at end of file
+        print(f"Score: {score:.2f}")
@@ -4,7 +4,13 @@ import torch
 # Paths
 BASE_MODEL_PATH = "./models/finance_phi2_model"
 RLHF_MODEL_PATH = "./models/finance_phi2_rlhf"
-FEEDBACK_DATA_PATH = "./data/feedback_data.json"
+FEEDBACK_DATA_PATH = "./data/feedback_data.json"  # JSON export of the log (feedback_log.py compact)
+FEEDBACK_LOG_PATH = "./data/feedback_log.jsonl"  # Append-only, written by chat_api_rlhf.py
+# Consumers read the log incrementally from these checkpoints
+TRAINER_CHECKPOINT_PATH = "./data/trainer_checkpoint.json"
+TFIDF_REWARD_STATE_PATH = "./data/reward_model_tfidf.npz"  # Snapshot + log checkpoint
+INCREMENTAL_REWARD_STATE_PATH = "./data/reward_model_incremental.npz"  # Same, "hashed" scoring
+KNN_REWARD_STATE_PATH = "./data/reward_model_knn.npz"  # Same, plus the nearest-neighbour index
 
 # Training settings (optimized for RTX 4060 8GB)
 BATCH_SIZE = 2
@@ -16,8 +22,33 @@ LORA_ALPHA = 16
 
 # Feedback thresholds
 MIN_FEEDBACK_FOR_TRAINING = 20  # Start training after 20 feedbacks
+FEEDBACK_WINDOW_DAYS = None  # Trainer: only use ratings from the last N days (None = all new ones)
 POSITIVE_THRESHOLD = 4  # Rating >= 4 is good
 NEGATIVE_THRESHOLD = 2  # Rating <= 2 is bad
+REWARD_HASH_FEATURES = 2 ** 18  # Incremental reward model feature space
+# Reward model of chat_api_rlhf.py and rlhf_trainer.py, all updated from the
+# feedback log without refitting: "tfidf" (distance to the mean good / bad
+# response, TF-IDF weighted), "hashed" (the same on plain term frequencies,
+# no IDF) or "knn" (the REWARD_KNN_K most similar rated responses)
+REWARD_SCORING = "tfidf"
+REWARD_KNN_K = 10
+REWARD_KNN_MIN_SIMILARITY = 0.2  # Cosine; below this a neighbour is ignored
+REWARD_EMBEDDING_DIM = 128  # Random projection of the hashed features
+REWARD_IVF_PROBE = 64  # Index lists scanned per query (recall vs latency)
+REWARD_IVF_MAX_LISTS = 1024
+
+# Feedback log writer: one fsync per batch of up to FEEDBACK_MAX_BATCH
+# records, at most FEEDBACK_FLUSH_INTERVAL_SECONDS after a rating arrives
+FEEDBACK_MAX_BATCH = 256
+FEEDBACK_FLUSH_INTERVAL_SECONDS = 1.0
+FEEDBACK_MAX_PENDING = 10000  # Ratings beyond this get 503 instead of queueing
 
 # Device
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
\ No newline at end of file
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# Multi-adapter serving (chat_api_rlhf.py): when both folders hold LoRA
+# adapters they are attached to one base model and chosen per request
+ADAPTERS = {
+    "sft": BASE_MODEL_PATH,
+    "rlhf": RLHF_MODEL_PATH,
+}
+DEFAULT_ADAPTER = "rlhf"
@@ -2,33 +2,44 @@
 Lightweight RLHF Trainer
 Fine-tunes Phi-2 with LoRA based on feedback
 """
-import json
+import time
 import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM
 from peft import LoraConfig, get_peft_model, prepare_model_for_kbit_training
 from trl import PPOTrainer, PPOConfig, AutoModelForCausalLMWithValueHead
-from reward_model import RewardModel
+from reward_model import load_reward_model
+from adapter_reload import publish_adapter
+from feedback_log import FeedbackReader, load_json, write_json_atomic
 import rlhf_config as config
 
 class RLHFTrainer:
     def __init__(self):
-        self.reward_model = RewardModel()
+        self.reward_model = load_reward_model(config.REWARD_SCORING)
         self.model = None
         self.tokenizer = None
+        self.feedback_reader = None
+        self.new_examples = 0
         
     def prepare_data(self):
-        """Prepare training data from feedback"""
-        with open(config.FEEDBACK_DATA_PATH, 'r') as f:
-            data = json.load(f)
+        """
+        All good examples in the log (within FEEDBACK_WINDOW_DAYS, if set):
+        each run trains a fresh LoRA on base, so it needs the whole history.
+        The checkpoint only records how far the last published version got;
+        self.new_examples counts the good ratings logged after it.
+        """
+        since = time.time() - config.FEEDBACK_WINDOW_DAYS * 86400 if config.FEEDBACK_WINDOW_DAYS else None
+        
+        new_reader = FeedbackReader(config.FEEDBACK_LOG_PATH, load_json(config.TRAINER_CHECKPOINT_PATH))
+        self.new_examples = sum(1 for _ in new_reader.read(since=since, min_rating=config.POSITIVE_THRESHOLD))
         
         # Filter good examples for training
+        self.feedback_reader = FeedbackReader(config.FEEDBACK_LOG_PATH)
         training_data = [
             {"prompt": item['question'], "response": item['response']}
-            for item in data
-            if item['rating'] >= config.POSITIVE_THRESHOLD
+            for item in self.feedback_reader.read(since=since, min_rating=config.POSITIVE_THRESHOLD)
         ]
         
-        print(f"📊 Training samples: {len(training_data)}")
+        print(f"📊 Training samples: {len(training_data)} ({self.new_examples} new)")
         return training_data
     
     def simple_rlhf_training(self):
@@ -38,12 +49,22 @@ class RLHFTrainer:
         """
         print("\n🚀 Starting RLHF Training...")
         
-        # 1. Train reward model
-        if not self.reward_model.train():
+        # 1. Update the reward model with new ratings
+        if not self.reward_model.train(min_feedback=config.MIN_FEEDBACK_FOR_TRAINING):
             print("❌ Not enough feedback data")
             return False
         
-        # 2. Load model
+        # 2. Prepare training data
+        training_data = self.prepare_data()
+        
+        if not self.new_examples:
+            print("❌ No new good examples since the last published version")
+            return False
+        if len(training_data) < 10:
+            print("❌ Need at least 10 good examples")
+            return False
+        
+        # 3. Load model
         print("📥 Loading base model...")
         self.tokenizer = AutoTokenizer.from_pretrained(config.BASE_MODEL_PATH)
         self.model = AutoModelForCausalLM.from_pretrained(
@@ -52,7 +73,7 @@ class RLHFTrainer:
             device_map="auto"
         )
         
-        # 3. Add LoRA adapters
+        # 4. Add LoRA adapters
         print("🔧 Adding LoRA adapters...")
         lora_config = LoraConfig(
             r=config.LORA_R,
@@ -64,13 +85,6 @@ class RLHFTrainer:
         )
         self.model = get_peft_model(self.model, lora_config)
         
-        # 4. Prepare training data
-        training_data = self.prepare_data()
-        
-        if len(training_data) < 10:
-            print("❌ Need at least 10 good examples")
-            return False
-        
         # 5. Fine-tune on high-reward examples
         print("🎓 Fine-tuning model...")
         self.model.train()
@@ -99,10 +113,16 @@ class RLHFTrainer:
             if step % 10 == 0:
                 print(f"Step {step}/{config.MAX_STEPS}, Loss: {loss.item():.4f}")
         
-        # 6. Save model
+        # 6. Save model (published as a new version; a running server hot-reloads it)
         print("💾 Saving RLHF model...")
-        self.model.save_pretrained(config.RLHF_MODEL_PATH)
-        self.tokenizer.save_pretrained(config.RLHF_MODEL_PATH)
+        version = publish_adapter(
+            self.model,
+            self.tokenizer,
+            config.RLHF_MODEL_PATH,
+            training_samples=len(training_data)
+        )
+        print(f"   Published version {version}")
+        write_json_atomic(self.feedback_reader.checkpoint(), config.TRAINER_CHECKPOINT_PATH)
         
         print("✅ RLHF training complete!")
         return True
@@ -117,6 +137,7 @@ class RLHFTrainer:
             "What's a good emergency fund?"
         ]
         
+        responses = []
         for question in test_questions:
             prompt = f"Question: {question}\nAnswer:"
             inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
@@ -128,9 +149,10 @@ class RLHFTrainer:
                 do_sample=True
             )
             
-            response = self.tokenizer.decode(outputs[0][inputs['input_ids'].shape[1]:], skip_special_tokens=True)
-            score = self.reward_model.score(response)
-            
+            responses.append(self.tokenizer.decode(outputs[0][inputs['input_ids'].shape[1]:], skip_special_tokens=True))
+        
+        scores = self.reward_model.score_batch(responses)
+        for question, response, score in zip(test_questions, responses, scores):
             print(f"\nQ: {question}")
             print(f"A: {response[:100]}...")
             print(f"Score: {score:.2f}")
@@ -0,0 +1,84 @@
+# Serving Configuration
+
+# Micro-batching (app.py /api/chat)
+BATCH_MAX_SIZE = 8  # Max questions per model.generate() call
+BATCH_MAX_WAIT_MS = 10  # How long the first request waits for company
+
+# Multi-turn KV cache (chat_api_rlhf.py)
+KV_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB of past-key-values across conversations
+KV_CACHE_MAX_ENTRIES = 256
+MAX_CONTEXT_TOKENS = 1800  # Phi-2 has 2048 positions; leave room for the answer
+
+# Conversation store (chat_api_rlhf.py): turns kept for follow-ups and feedback
+CONVERSATION_STORE = "memory"  # "memory" (per process) or "sqlite" (survives restarts; always used with --workers)
+CONVERSATION_STORE_PATH = "./data/conversations.db"
+CONVERSATION_MAX_ENTRIES = 10000  # memory backend only
+CONVERSATION_TTL_SECONDS = 7 * 24 * 3600  # Idle conversations are dropped after this
+CONVERSATION_MAX_TURNS = 20  # Turns kept per conversation in memory (older ones exceed the context anyway)
+
+# Answer cache (app.py)
+ANSWER_CACHE_MAX_ENTRIES = 1000
+ANSWER_CACHE_TTL_SECONDS = 24 * 3600
+ANSWER_CACHE_PATH = "./cache/answer_cache.json"  # None disables persistence
+PRECOMPUTE_SUGGESTIONS = True  # Answer the /api/suggestions list at startup
+
+# Request coalescing (app.py): concurrent requests for the same question,
+# adapter and generation parameters share one in-flight generation
+COALESCE_CHAT = True
+COALESCE_STREAM = True
+
+# Model locations (relative to backend/)
+BASE_MODEL_NAME = "microsoft/phi-2"
+ADAPTER_PATH = "../models/finance_phi2_model"
+MERGED_MODEL_PATH = "../models/finance_phi2_merged"  # Written by merge_adapter.py
+
+# Adapters served side by side on one base model; requests pick one with
+# the "model" field ("base" selects the bare base model). When more than
+# one of these exists the merged checkpoint is not used.
+ADAPTERS = {
+    "sft": ADAPTER_PATH,
+    "rlhf": "../models/finance_phi2_rlhf",
+}
+DEFAULT_ADAPTER = "sft"
+
+# Device / precision
+DEVICE = "auto"  # "auto" (cuda if available), "cuda" or "cpu"
+DTYPE = "auto"  # "auto" (float16 on GPU, float32 on CPU), "float16", "bfloat16", "float32"
+QUANTIZATION = None  # CPU only: None or "int8" (dynamic quantization of Linear layers)
+
+# Startup warmup (run before /api/health/ready reports ready)
+WARMUP_PROMPTS = [
+    "Instruct: What is compound interest?\nOutput:",
+    "Instruct: How much should I save for retirement?\nOutput:",
+    "Instruct: Explain portfolio diversification\nOutput:",
+]
+WARMUP_NEW_TOKENS = 16
+
+# Admission control
+INFERENCE_WORKERS = 1  # Concurrent generate() calls (chat_api_rlhf.py and streaming)
+MAX_QUEUE = 32  # Requests waiting beyond this get 429 + Retry-After
+REQUEST_TIMEOUT_SECONDS = 60  # Deadline from arrival; expired requests get 503
+
+# Speculative (assisted) decoding: a small draft model proposes tokens
+# and the finance model verifies them. Generation runs at batch size 1.
+SPECULATIVE_DECODING = False
+DRAFT_MODEL_PATH = None  # Small causal LM that shares Phi-2's tokenizer
+NUM_ASSISTANT_TOKENS = 5  # Tokens proposed per verification step
+
+# Stop generation as soon as the model starts a new prompt block
+STOP_STRINGS = ["\nInstruct:", "\nQuestion:"]
+
+# Hot reload of the RLHF adapter (chat_api_rlhf.py): poll for a newly
+# published version, warm it up and swap it in without a restart. With
+# --workers this only applies to the multi-adapter path (see serve_workers)
+ADAPTER_RELOAD = True
+ADAPTER_RELOAD_INTERVAL_SECONDS = 30
+
+# Pre-fork workers (chat_api_rlhf.py --workers N): the model is loaded once
+# and forked processes share its weights copy-on-write
+WORKERS = 1
+THREADS_PER_WORKER = None  # None: cpu_count // WORKERS torch threads each
+
+# ASGI front end (asgi_app.py)
+ASGI_EXECUTOR_WORKERS = BATCH_MAX_SIZE + MAX_QUEUE  # Threads that may wait on the model at once
+# Requests still waiting for an executor thread count against MAX_QUEUE (429 beyond it)
@@ -0,0 +1,206 @@
+"""
+Single-Flight Request Coalescing
+Concurrent requests with the same key attach to the one generation already
+in flight and all receive its result. Unlike the answer cache nothing is kept
+once the generation finishes; the next request with that key starts afresh.
+"""
+import threading
+from answer_cache import cache_key
+from metrics import COALESCED
+
+def flight_key(question, model=None, generation_kwargs=None):
+    """Normalised question + adapter + generation parameters"""
+    params = tuple(sorted((generation_kwargs or {}).items()))
+    return (cache_key(question, model), params)
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+class _SharedStream:
+    """
+    Buffers the chunks of one streamed generation so every attached request
+    replays them from the start and then follows live. Whichever consumer
+    needs the next chunk first pulls it from the source, so the stream keeps
+    going if the request that started it disconnects; once every reader has
+    been closed the source is closed, which cancels the generation.
+    """
+    def __init__(self, on_finish):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.followers = 0
+        self.closed_readers = 0
+        self.source = None
+        self.ready = threading.Event()  # set once the source exists (or failed to start)
+        self.lock = threading.Lock()
+        self.on_finish = on_finish
+
+    def reader(self):
+        self.ready.wait()
+        index = 0
+        while True:
+            if index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+                continue
+            with self.lock:
+                if index < len(self.chunks):
+                    continue
+                if self.error is not None:
+                    raise self.error
+                if self.finished:
+                    return
+                try:
+                    self.chunks.append(next(self.source))
+                except StopIteration:
+                    self._finish()
+                except Exception as e:
+                    self.error = e
+                    self._finish()
+
+    def _finish(self):
+        self.finished = True
+        self.on_finish()
+
+    def close(self):
+        """Stop the source generation (only when no reader is left)"""
+        with self.lock:
+            if self.finished:
+                return
+            self.finished = True
+            # Under the lock: no reader is inside next(self.source) now
+            close = getattr(self.source, 'close', None)
+            if close is not None:
+                close()
+
+class _StreamReader:
+    """One request's iterator over a _SharedStream; on_close runs once when it ends or is closed"""
+    def __init__(self, shared, on_close):
+        self.chunks = shared.reader()
+        self.on_close = on_close
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.chunks.close()
+        self.on_close()
+
+class SingleFlight:
+    """
+    In-flight generations keyed by flight_key(). `name` labels the
+    finbud_coalesced_requests counter (one instance per endpoint).
+    """
+    def __init__(self, name, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self.calls = {}
+        self.lock = threading.Lock()
+
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _attach(self, key, factory):
+        """(entry, is_leader) for key, creating the entry if none is in flight"""
+        with self.lock:
+            entry = self.calls.get(key)
+            if entry is not None:
+                entry.followers += 1
+                self.coalesced += 1
+                COALESCED.labels(self.name).inc()
+                return entry, False
+            entry = self.calls[key] = factory()
+            self.leaders += 1
+            return entry, True
+
+    def _forget(self, key, entry):
+        with self.lock:
+            if self.calls.get(key) is entry:
+                del self.calls[key]
+
+    def do(self, key, fn):
+        """Return (fn() result, coalesced); followers re-raise the leader's error"""
+        if not self.enabled:
+            return fn(), False
+
+        call, leader = self._attach(key, _Call)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._forget(key, call)
+            call.done.set()
+
+    def stream(self, key, start_fn):
+        """
+        Return (chunk iterator, coalesced). start_fn() starts the generation
+        and returns its chunk iterator; only the leader calls it, so an
+        admission error (e.g. QueueFullError) is raised to the leader here
+        and to followers when they start reading.
+        """
+        if not self.enabled:
+            return start_fn(), False
+
+        shared, leader = self._attach(key, lambda: _SharedStream(None))
+        if not leader:
+            return _StreamReader(shared, lambda: self._release(key, shared, False)), True
+
+        shared.on_finish = lambda: self._forget(key, shared)
+        try:
+            shared.source = iter(start_fn())
+        except Exception as e:
+            shared.error = e
+            shared.finished = True
+            self._forget(key, shared)
+            raise
+        finally:
+            shared.ready.set()
+        return _StreamReader(shared, lambda: self._release(key, shared, True)), False
+
+    def _release(self, key, shared, leader):
+        """
+        A reader ended or its client went away. Once the leader is gone the
+        entry is dropped so later requests start afresh; once every reader
+        is gone the generation itself is cancelled.
+        """
+        with self.lock:
+            if leader and self.calls.get(key) is shared:
+                del self.calls[key]
+            shared.closed_readers += 1
+            # No follower can attach after the leader left, so this only reaches 0 once
+            remaining = 1 + shared.followers - shared.closed_readers
+        if remaining == 0:
+            shared.close()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'enabled': self.enabled,
+                'in_flight': len(self.calls),
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+            }
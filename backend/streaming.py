@@ -0,0 +1,144 @@
+"""
+Token Streaming Helpers
+Runs model.generate() in a background thread (or an InferencePool worker)
+and yields decoded text as it is produced, plus Server-Sent-Events formatting
+"""
+import json
+import threading
+import time
+from concurrent.futures import Future
+import torch
+from transformers import TextIteratorStreamer
+from decoding import stopping_criteria, StepTimer
+from metrics import record_generation, ERRORS
+
+class GenerationStream:
+    """
+    Iterator of decoded text chunks from stream_generate(). close() (which
+    sse_stream() calls when the client goes away) sets the cancel event, so
+    generate() stops at its next step and frees its worker.
+    """
+    def __init__(self, chunks, cancel):
+        self.chunks = chunks
+        self.cancel = cancel
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.chunks)
+
+    def close(self):
+        self.cancel.set()
+        self.chunks.close()
+
+def stream_generate(model, tokenizer, prompt, pool=None, stop_strings=None, cancel=None, **generate_kwargs):
+    """
+    Start generating `prompt` and return a GenerationStream of decoded text
+    chunks.
+
+    With an InferencePool the generation is admitted eagerly, so a full
+    queue raises QueueFullError here rather than mid-stream. Generation
+    halts on any of stop_strings (the caller trims them from the answer) or
+    once `cancel` (a threading.Event, created if not given) is set.
+    """
+    cancel = cancel or threading.Event()
+    start = time.perf_counter()
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    prompt_length = inputs['input_ids'].shape[1]
+    tokenize_seconds = time.perf_counter() - start
+    timer = StepTimer()
+    criteria = stopping_criteria(tokenizer, stop_strings, prompt_length, timer, cancel)
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+    def run():
+        if cancel.is_set():
+            streamer.end()  # Abandoned while queued: don't start at all
+            return
+        started = time.perf_counter()
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs,
+                streamer=streamer,
+                stopping_criteria=criteria,
+                pad_token_id=tokenizer.eos_token_id,
+                **generate_kwargs
+            )
+        finished = time.perf_counter()
+        first_token_at = timer.first_token_at or finished
+        # Detokenization happens incrementally in the streamer, so it is not split out
+        record_generation(
+            tokenize=tokenize_seconds,
+            prefill=first_token_at - started,
+            decode=finished - first_token_at,
+            detokenize=None,
+            prompt_tokens=prompt_length,
+            generated_tokens=outputs.shape[1] - prompt_length
+        )
+
+    if pool is not None:
+        future = pool.start(run)
+    else:
+        future = Future()
+
+        def run_in_thread():
+            try:
+                future.set_result(run())
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run_in_thread, daemon=True).start()
+
+    # Unblock the consumer if generation fails or never starts
+    future.add_done_callback(lambda f: streamer.end() if f.cancelled() or f.exception() else None)
+
+    return GenerationStream(_iterate(streamer, future), cancel)
+
+def _iterate(streamer, future):
+    for text in streamer:
+        if text:
+            yield text
+
+    error = future.exception()
+    if error is not None:
+        raise error
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event carrying a JSON payload"""
+    message = ""
+    if event:
+        message += f"event: {event}\n"
+    message += f"data: {json.dumps(data)}\n\n"
+    return message
+
+def sse_stream(chunks, on_complete):
+    """
+    Turn text chunks into SSE 'token' events followed by one 'done' event.
+
+    on_complete(answer, timing) returns the payload for the final event.
+    """
+    start_time = time.time()
+    first_token_time = None
+    parts = []
+
+    try:
+        for text in chunks:
+            if first_token_time is None:
+                first_token_time = time.time() - start_time
+            parts.append(text)
+            yield sse_event({'token': text}, event='token')
+    except Exception as e:
+        ERRORS.labels("stream", type(e).__name__).inc()
+        yield sse_event({'error': str(e)}, event='error')
+        return
+    finally:
+        # Also runs when the client disconnects: stops a generation nobody reads
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+    timing = {
+        'time_to_first_token': round(first_token_time or 0.0, 3),
+        'response_time': round(time.time() - start_time, 2),
+    }
+    yield sse_event(on_complete("".join(parts), timing), event='done')
@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import rlhf_config
+import serving_config
+
+# The servers open their feedback log, reward snapshot, conversation
+# database and answer cache at import time: keep them out of the tree
+DATA_DIR = tempfile.mkdtemp(prefix="finbud-tests-")
+rlhf_config.FEEDBACK_LOG_PATH = os.path.join(DATA_DIR, "feedback_log.jsonl")
+rlhf_config.TFIDF_REWARD_STATE_PATH = os.path.join(DATA_DIR, "reward_model_tfidf.npz")
+rlhf_config.INCREMENTAL_REWARD_STATE_PATH = os.path.join(DATA_DIR, "reward_model_incremental.npz")
+rlhf_config.KNN_REWARD_STATE_PATH = os.path.join(DATA_DIR, "reward_model_knn.npz")
+serving_config.CONVERSATION_STORE_PATH = os.path.join(DATA_DIR, "conversations.db")
+serving_config.ANSWER_CACHE_PATH = os.path.join(DATA_DIR, "answer_cache.json")
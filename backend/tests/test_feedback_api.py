@@ -0,0 +1,79 @@
+import pytest
+from conversation_store import make_turn
+from feedback_log import read_log
+
+@pytest.fixture(scope="module")
+def rlhf():
+    import chat_api_rlhf
+    return chat_api_rlhf
+
+@pytest.fixture
+def client(rlhf):
+    return rlhf.app.test_client()
+
+@pytest.fixture
+def conversation(rlhf):
+    conv_id, _ = rlhf.conversations.create(make_turn("What is an ETF?", "A fund traded on an exchange.", "rlhf"))
+    rlhf.conversations.append(conv_id, make_turn("And fees?", "Usually low.", "rlhf"))
+    return conv_id
+
+@pytest.mark.parametrize("body, status", [
+    ({}, 400),
+    ({'rating': 0}, 400),
+    ({'rating': 6}, 400),
+    ({'rating': "5"}, 400),
+    ({'rating': True}, 400),
+    ({'rating': 5}, 400),
+    ({'rating': 5, 'question': "q"}, 400),
+    ({'rating': 5, 'conversation_id': "1"}, 400),
+    ({'rating': 5, 'conversation_id': 1, 'turn': "1"}, 400),
+    ({'rating': 5, 'conversation_id': 1, 'turn': 1.0}, 400),
+    ({'rating': 5, 'conversation_id': 1, 'turn': True}, 400),
+    ({'rating': 5, 'conversation_id': 1}, 404),
+    ([5], 400),
+])
+def test_invalid_feedback_is_rejected(client, body, status):
+    response = client.post('/api/feedback', json=body)
+    assert response.status_code == status
+    assert 'error' in response.get_json()
+
+def test_feedback_joins_the_rated_turn(rlhf, client, conversation):
+    response = client.post('/api/feedback', json={'rating': 2, 'conversation_id': conversation, 'turn': 0})
+    assert response.status_code == 200
+    assert response.get_json()['response']['answer'] == "A fund traded on an exchange."
+
+    latest = client.post('/api/feedback', json={'rating': 5, 'conversation_id': conversation}).get_json()
+    assert latest['response']['turn'] == 1
+
+    assert client.post('/api/feedback', json={'rating': 5, 'conversation_id': conversation, 'turn': 2}).status_code == 404
+
+    assert rlhf.feedback_log.flush(timeout=5)
+    logged = [r for r in read_log(rlhf.feedback_log.path) if r['conversation_id'] == conversation]
+    assert [(r['turn'], r['rating'], r['model']) for r in logged] == [(0, 2, "rlhf"), (1, 5, "rlhf")]
+
+def test_feedback_without_conversation(client):
+    response = client.post('/api/feedback', json={'rating': 4.5, 'question': "q", 'response': "a"})
+    assert response.status_code == 200
+    assert response.get_json()['response'] is None
+
+def test_full_feedback_queue_answers_503(rlhf, client, monkeypatch):
+    monkeypatch.setattr(rlhf.feedback_log, 'max_pending', 0)
+    response = client.post('/api/feedback', json={'rating': 5, 'question': "q", 'response': "a"})
+    assert response.status_code == 503
+
+def test_asgi_feedback_is_validated_and_logged(monkeypatch):
+    from starlette.testclient import TestClient
+    import asgi_app
+
+    client = TestClient(asgi_app.app)
+    assert client.post('/api/feedback', json={'rating': 9}).status_code == 400
+    assert client.post('/api/feedback', json={'rating': 5, 'turn': "1", 'conversation_id': 1}).status_code == 400
+    assert client.post('/api/feedback', json={'rating': 5, 'conversation_id': 1}).status_code == 404
+
+    response = client.post('/api/feedback', json={'rating': 1, 'question': "asgi q", 'response': "asgi a"})
+    assert response.status_code == 200
+    assert asgi_app.feedback_log.flush(timeout=5)
+    assert any(r['question'] == "asgi q" for r in read_log(asgi_app.feedback_log.path))
+
+    monkeypatch.setattr(asgi_app.feedback_log, 'max_pending', 0)
+    assert client.post('/api/feedback', json={'rating': 1, 'question': "q", 'response': "a"}).status_code == 503
@@ -0,0 +1,124 @@
+import json
+import os
+import pytest
+from feedback_log import FeedbackLog, FeedbackReader, recover, read_log, compact
+
+def record(n, rating=5, received_at=None):
+    return {'conversation_id': None, 'turn': None, 'rating': rating, 'question': f"q{n}",
+            'response': f"a{n}", 'received_at': received_at if received_at is not None else n}
+
+def write_lines(path, records, tail=b""):
+    with open(path, 'wb') as f:
+        for r in records:
+            f.write(json.dumps(r).encode() + b"\n")
+        f.write(tail)
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / "feedback_log.jsonl")
+
+def test_recover_leaves_a_clean_log_alone(log_path):
+    write_lines(log_path, [record(1), record(2)])
+    assert recover(log_path) == 0
+    assert [r['question'] for r in read_log(log_path)] == ["q1", "q2"]
+    assert recover(str(log_path) + ".missing") == 0
+
+def test_recover_truncates_a_torn_last_line(log_path):
+    torn = b'{"rating": 5, "question": "q3'
+    write_lines(log_path, [record(1), record(2)], tail=torn)
+    size = os.path.getsize(log_path)
+    assert recover(log_path) == len(torn)
+    assert os.path.getsize(log_path) == size - len(torn)
+    assert [r['question'] for r in read_log(log_path)] == ["q1", "q2"]
+
+def test_recover_drops_a_complete_but_invalid_last_line(log_path):
+    write_lines(log_path, [record(1)], tail=b'{"rating": 5, "que\n')
+    assert recover(log_path) == len(b'{"rating": 5, "que\n')
+    assert [r['question'] for r in read_log(log_path)] == ["q1"]
+
+def test_feedback_log_writes_batches_and_recovers_on_open(log_path):
+    write_lines(log_path, [record(1)], tail=b'{"torn')
+    log = FeedbackLog(log_path, max_batch=4, flush_interval=0.05)
+    assert log.recovered_bytes == len(b'{"torn')
+    for n in range(2, 12):
+        assert log.append(record(n))
+    assert log.flush(timeout=5)
+    log.close()
+    assert [r['question'] for r in read_log(log_path)] == [f"q{n}" for n in range(1, 12)]
+    assert log.stats()['written'] == 10
+
+def test_feedback_log_refuses_records_beyond_max_pending(log_path):
+    log = FeedbackLog(log_path, max_pending=0)
+    assert not log.append(record(1))
+    assert log.stats()['dropped'] == 1
+    log.close()
+
+def test_reader_resumes_from_its_checkpoint(log_path):
+    write_lines(log_path, [record(1), record(2)])
+    reader = FeedbackReader(log_path)
+    assert [r['question'] for r in reader.read()] == ["q1", "q2"]
+    checkpoint = reader.checkpoint()
+
+    with open(log_path, 'ab') as f:
+        f.write(json.dumps(record(3)).encode() + b"\n")
+    reader = FeedbackReader(log_path, checkpoint)
+    assert [r['question'] for r in reader.read()] == ["q3"]
+    assert reader.checkpoint()['records'] == 3
+
+def test_reader_stops_before_a_line_still_being_written(log_path):
+    write_lines(log_path, [record(1)], tail=b'{"rating": 4, "question": "q2"')
+    reader = FeedbackReader(log_path)
+    assert [r['question'] for r in reader.read()] == ["q1"]
+
+    with open(log_path, 'ab') as f:
+        f.write(b', "response": "a2", "received_at": 2}\n')
+    reader = FeedbackReader(log_path, reader.checkpoint())
+    assert [r['question'] for r in reader.read()] == ["q2"]
+
+def test_reader_starts_over_after_the_log_is_replaced(log_path):
+    write_lines(log_path, [record(1), record(2)])
+    reader = FeedbackReader(log_path)
+    list(reader.read())
+    checkpoint = reader.checkpoint()
+
+    # Rotated: a new file (new inode) that happens to be longer than the offset
+    replacement = log_path + ".new"
+    write_lines(replacement, [record(10), record(11), record(12)])
+    os.replace(replacement, log_path)
+    assert os.stat(log_path).st_ino != checkpoint['inode']
+    assert [r['question'] for r in FeedbackReader(log_path, checkpoint).read()] == ["q10", "q11", "q12"]
+
+def test_reader_starts_over_after_the_log_is_truncated(log_path):
+    write_lines(log_path, [record(1), record(2)])
+    reader = FeedbackReader(log_path)
+    list(reader.read())
+    checkpoint = reader.checkpoint()
+
+    with open(log_path, 'r+b') as f:
+        f.truncate(0)
+        f.write(json.dumps(record(5)).encode() + b"\n")
+    assert [r['question'] for r in FeedbackReader(log_path, checkpoint).read()] == ["q5"]
+
+def test_reader_filters_by_time_and_rating(log_path):
+    write_lines(log_path, [record(1, rating=5), record(2, rating=1), record(3, rating=4), record(4, rating=5)])
+    reader = FeedbackReader(log_path)
+    assert [r['question'] for r in reader.read(since=2, until=4, min_rating=4)] == ["q3"]
+    # Skipped records still move the checkpoint
+    assert reader.checkpoint()['offset'] == os.path.getsize(log_path)
+
+def test_reader_of_a_missing_log_yields_nothing(log_path):
+    reader = FeedbackReader(log_path)
+    assert list(reader.read()) == []
+    assert reader.checkpoint()['offset'] == 0
+
+def test_compact_keeps_the_latest_rating_per_turn(log_path, tmp_path):
+    rated = [
+        {**record(1, rating=2), 'conversation_id': 7, 'turn': 0},
+        record(2, rating=3),
+        {**record(3, rating=5), 'conversation_id': 7, 'turn': 0},
+    ]
+    write_lines(log_path, rated)
+    output = str(tmp_path / "feedback_data.json")
+    assert compact(log_path, output) == 2
+    with open(output) as f:
+        assert [r['rating'] for r in json.load(f)] == [3, 5]
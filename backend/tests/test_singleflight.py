@@ -0,0 +1,115 @@
+import threading
+import time
+import pytest
+from singleflight import SingleFlight
+from inference_pool import InferencePool
+from streaming import stream_generate, sse_stream
+from tiny_model import build_tiny_model
+
+class FakeSource:
+    """Endless chunk iterator that records being closed"""
+    def __init__(self):
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.produced += 1
+        return f"chunk{self.produced} "
+
+    def close(self):
+        self.closed.set()
+
+@pytest.fixture(scope="module")
+def tiny():
+    return build_tiny_model()
+
+@pytest.fixture
+def pool():
+    return InferencePool(max_workers=1, max_queue=4, name="test")
+
+def start_long_generation(tiny, pool):
+    """A few seconds of generation; the byte-level tiny tokenizer may emit it all as one chunk at the end"""
+    model, tokenizer = tiny
+    return stream_generate(
+        model, tokenizer, "Instruct: hi\nOutput:", pool=pool,
+        max_new_tokens=1500, min_new_tokens=1500, do_sample=False
+    )
+
+def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def busy(pool):
+    return pool.stats.snapshot()['in_flight'] > 0
+
+def test_followers_replay_the_leaders_chunks():
+    sf = SingleFlight("test")
+    source = FakeSource()
+    leader, coalesced = sf.stream("key", lambda: source)
+    assert not coalesced
+    first = [next(leader), next(leader)]
+
+    follower, coalesced = sf.stream("key", lambda: pytest.fail("followers must not start a generation"))
+    assert coalesced
+    assert [next(follower), next(follower), next(follower)] == first + ["chunk3 "]
+    assert sf.stats()['coalesced'] == 1
+
+def test_source_is_closed_once_the_last_reader_is():
+    sf = SingleFlight("test")
+    source = FakeSource()
+    leader, _ = sf.stream("key", lambda: source)
+    follower, _ = sf.stream("key", lambda: source)
+    next(leader)
+
+    leader.close()
+    assert not source.closed.is_set()
+    assert sf.stats()['in_flight'] == 0  # New requests start afresh
+    assert next(follower) == "chunk1 "
+
+    follower.close()
+    assert source.closed.is_set()
+    follower.close()  # Idempotent
+
+def test_leader_start_error_is_raised_and_forgotten():
+    sf = SingleFlight("test")
+
+    def fail():
+        raise RuntimeError("queue full")
+
+    with pytest.raises(RuntimeError):
+        sf.stream("key", fail)
+    assert sf.stats()['in_flight'] == 0
+
+def test_client_disconnect_closes_the_sse_source():
+    source = FakeSource()
+    events = sse_stream(source, lambda answer, timing: {})
+    assert next(events).startswith("event: token")
+    events.close()  # What Flask does when the client goes away
+    assert source.closed.is_set()
+
+def test_closing_a_plain_stream_stops_generate(tiny, pool):
+    stream = start_long_generation(tiny, pool)
+    assert wait_for(lambda: busy(pool), timeout=2)
+    stream.close()
+    assert wait_for(lambda: not busy(pool), timeout=1)
+
+def test_coalesced_generation_runs_until_its_last_reader_leaves(tiny, pool):
+    sf = SingleFlight("test")
+    leader, _ = sf.stream("key", lambda: start_long_generation(tiny, pool))
+    follower, coalesced = sf.stream("key", lambda: start_long_generation(tiny, pool))
+    assert coalesced
+    assert wait_for(lambda: busy(pool), timeout=2)
+
+    leader.close()
+    assert not wait_for(lambda: not busy(pool), timeout=0.3)
+
+    follower.close()
+    assert wait_for(lambda: not busy(pool), timeout=1)
+    assert sf.stats()['in_flight'] == 0
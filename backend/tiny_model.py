@@ -0,0 +1,48 @@
+"""
+Tiny Stand-in Model
+Randomly initialised Phi-architecture causal LM for CPU benchmarks
+"""
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers, decoders
+from transformers import PreTrainedTokenizerFast, PhiConfig, PhiForCausalLM
+
+EOS_TOKEN = "<|endoftext|>"
+
+def build_tiny_tokenizer():
+    """Byte-level tokenizer with no merges (one token per byte) plus EOS"""
+    alphabet = sorted(pre_tokenizers.ByteLevel.alphabet())
+    vocab = {char: idx for idx, char in enumerate(alphabet)}
+    vocab[EOS_TOKEN] = len(vocab)
+
+    backend = Tokenizer(models.BPE(vocab=vocab, merges=[]))
+    backend.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    backend.decoder = decoders.ByteLevel()
+
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, eos_token=EOS_TOKEN)
+    tokenizer.pad_token = tokenizer.eos_token
+    return tokenizer
+
+def build_tiny_model(hidden_size=64, num_layers=2, num_heads=4, seed=0):
+    """Return (model, tokenizer) for a small random Phi model on CPU"""
+    tokenizer = build_tiny_tokenizer()
+
+    config = PhiConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 4,
+        num_hidden_layers=num_layers,
+        num_attention_heads=num_heads,
+        max_position_embeddings=2048,
+        bos_token_id=tokenizer.eos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.eos_token_id,
+    )
+
+    torch.manual_seed(seed)
+    model = PhiForCausalLM(config)
+    model.eval()
+    return model, tokenizer
+
+if __name__ == "__main__":
+    model, tokenizer = build_tiny_model()
+    print(f"✅ Tiny model: {model.num_parameters():,} parameters, vocab {len(tokenizer)}")
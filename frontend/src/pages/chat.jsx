@@ -9,6 +9,8 @@ function Chat() {
   const [messages, setMessages] = useState([])
   const [input, setInput] = useState('')
   const [isLoading, setIsLoading] = useState(false)
+  const [isStreaming, setIsStreaming] = useState(false)
+  const streamingRef = useRef(false)
   const [suggestions, setSuggestions] = useState([])
   const messagesEndRef = useRef(null)
 
@@ -42,18 +44,65 @@ function Chat() {
     setIsLoading(true)
 
     try {
-      const response = await axios.post(`${API_URL}/chat`, {
-        question: text.trim()
+      const response = await fetch(`${API_URL}/chat/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ question: text.trim() })
       })
 
-      const aiMessage = {
-        type: 'ai',
-        text: response.data.answer,
-        timestamp: new Date(),
-        responseTime: response.data.response_time
+      if (!response.ok || !response.body) {
+        throw new Error(`Request failed with status ${response.status}`)
       }
 
-      setMessages(prev => [...prev, aiMessage])
+      // Read Server-Sent Events and grow the AI message as tokens arrive
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+
+      const handleEvent = (raw) => {
+        let event = 'message'
+        let data = ''
+        for (const line of raw.split('\n')) {
+          if (line.startsWith('event:')) event = line.slice(6).trim()
+          else if (line.startsWith('data:')) data += line.slice(5).trim()
+        }
+        if (!data) return
+        const payload = JSON.parse(data)
+
+        if (event === 'token') {
+          if (!streamingRef.current) {
+            streamingRef.current = true
+            setIsStreaming(true)
+            setMessages(prev => [...prev, { type: 'ai', text: '', timestamp: new Date() }])
+          }
+          setMessages(prev => {
+            const last = prev[prev.length - 1]
+            return [...prev.slice(0, -1), { ...last, text: last.text + payload.token }]
+          })
+        } else if (event === 'done') {
+          const finalMessage = {
+            type: 'ai',
+            text: payload.answer,
+            timestamp: new Date(),
+            responseTime: payload.response_time,
+            conversationId: payload.conversation_id
+          }
+          setMessages(prev => streamingRef.current
+            ? [...prev.slice(0, -1), finalMessage]
+            : [...prev, finalMessage])
+        } else if (event === 'error') {
+          throw new Error(payload.error)
+        }
+      }
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const events = buffer.split('\n\n')
+        buffer = events.pop()
+        events.forEach(handleEvent)
+      }
     } catch (error) {
       const errorMessage = {
         type: 'error',
@@ -62,6 +111,8 @@ function Chat() {
       }
       setMessages(prev => [...prev, errorMessage])
     } finally {
+      streamingRef.current = false
+      setIsStreaming(false)
       setIsLoading(false)
     }
   }
@@ -113,7 +164,7 @@ function Chat() {
               </div>
             ))}
             
-            {isLoading && (
+            {isLoading && !isStreaming && (
               <div className="message ai">
                 <div className="avatar ai-avatar">
                   <TrendingUp size={20} />
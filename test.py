@@ -2,39 +2,47 @@
 Interactive Phi-2 Finance AI Chatbot
 """
 
+import os
+import sys
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer
 from peft import PeftModel
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from model_registry import load_causal_lm, resolve_model
+
 print("="*70)
 print("PHI-2 FINANCE AI - INTERACTIVE MODE")
 print("="*70)
 
 print("\n🔄 Loading model...")
 
-# Load base model
-base_model = AutoModelForCausalLM.from_pretrained(
-    "microsoft/phi-2",
-    torch_dtype=torch.float16,
-    trust_remote_code=True,
-    low_cpu_mem_usage=True
-)
+# fp16 only pays off on GPU; use fp32 on CPU
+device = "cuda" if torch.cuda.is_available() else "cpu"
+dtype = torch.float16 if device == "cuda" else torch.float32
+print(f"   Device: {device}")
+
+# Load base model (local registry copy, memory-mapped)
+base_model = load_causal_lm("microsoft/phi-2", dtype=dtype)
 
 # Load LoRA adapter
 model = PeftModel.from_pretrained(base_model, "./models/finance_phi2_model")
-model = model.to("cuda")
+model = model.to(device)
 model.eval()
 
 # Load tokenizer
-tokenizer = AutoTokenizer.from_pretrained("microsoft/phi-2", trust_remote_code=True)
+tokenizer = AutoTokenizer.from_pretrained(resolve_model("microsoft/phi-2"), trust_remote_code=True)
 tokenizer.pad_token = tokenizer.eos_token
 
 print("✅ Model loaded and ready!\n")
 
+# Stop as soon as the model starts inventing a new prompt block
+STOP_STRINGS = ["\nInstruct:", "\nQuestion:"]
+
 def ask_question(question):
     """Generate answer for a question"""
     prompt = f"Instruct: {question}\nOutput:"
-    inputs = tokenizer(prompt, return_tensors="pt").to("cuda")
+    inputs = tokenizer(prompt, return_tensors="pt").to(device)
     
     with torch.no_grad():
         outputs = model.generate(
@@ -45,11 +53,16 @@ def ask_question(question):
             top_p=0.9,
             repetition_penalty=1.1,
             pad_token_id=tokenizer.eos_token_id,
-            eos_token_id=tokenizer.eos_token_id
+            eos_token_id=tokenizer.eos_token_id,
+            stop_strings=STOP_STRINGS,
+            tokenizer=tokenizer
         )
     
-    response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    answer = response.split("Output:")[-1].strip()
+    # Decode only the newly generated tokens
+    response = tokenizer.decode(outputs[0][inputs['input_ids'].shape[1]:], skip_special_tokens=True)
+    for stop in STOP_STRINGS:
+        response = response.split(stop)[0]
+    answer = response.strip()
     return answer
 
 # Interactive Loop
@@ -2,6 +2,8 @@
 Phi-2 Finance Model Training - RTX 4060 8GB
 """
 
+import os
+import sys
 import torch
 import json
 from datasets import Dataset
@@ -14,6 +16,9 @@ from transformers import (
 )
 from peft import LoraConfig, get_peft_model, TaskType
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from model_registry import resolve_model
+
 print("="*70)
 print("PHI-2 FINANCE TRAINING - RTX 4060 8GB")
 print("="*70)
@@ -51,10 +56,14 @@ dataset = Dataset.from_list(data)
 print(f"✅ Loaded {len(data)} examples")
 print(f"   Sample: {data[0]['instruction'][:50]}...")
 
+# Local copy from models/registry.json when registered (required offline)
+model_path = resolve_model(CONFIG["model_name"])
+print(f"\n📂 Model source: {model_path}")
+
 # Load Tokenizer
 print("\n🔤 Loading tokenizer...")
 tokenizer = AutoTokenizer.from_pretrained(
-    CONFIG["model_name"],
+    model_path,
     trust_remote_code=True
 )
 tokenizer.pad_token = tokenizer.eos_token
@@ -71,7 +80,7 @@ gc.collect()
 torch.cuda.empty_cache()
 
 model = AutoModelForCausalLM.from_pretrained(
-    CONFIG["model_name"],
+    model_path,
     torch_dtype=torch.float16,
     trust_remote_code=True,
     low_cpu_mem_usage=True